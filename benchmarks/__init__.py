@@ -0,0 +1,15 @@
+"""Benchmarks for Duvet.
+
+The benchmarks generate synthetic projects at several scales, and time
+the stages of loading and displaying their coverage data. Run them from
+the root of the repository with:
+
+    $ python -m benchmarks --output results.json
+
+The GUI benchmarks need a display; on a headless machine, run them
+under Xvfb (``xvfb-run python -m benchmarks``), or use ``--headless``
+to only time the loading pipeline. A previous set of results can be
+compared against the current code with ``--compare results.json``.
+
+``python -m benchmarks.startup`` checks that Duvet starts quickly.
+"""
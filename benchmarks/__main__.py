@@ -0,0 +1,336 @@
+'''
+Run the Duvet benchmarks.
+'''
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+import coverage
+
+from duvet import get_version
+from duvet.analysis import coverage_str
+from duvet.cache import CACHE_DIRNAME
+from duvet.loader import load_coverage
+
+from benchmarks.startup import measure_startup
+from benchmarks.synthetic import WIDE_DIRNAME, generate
+
+
+# The project sizes (in files) to benchmark.
+SCALES = [100, 1000, 10000, 50000]
+
+# Benchmarks that are more than this much slower than the baseline
+# are flagged when comparing results.
+REGRESSION_THRESHOLD = 1.25
+
+
+def timed(fn, repeat, setup=None):
+    "Time repeat calls to fn, returning the duration of each call in seconds."
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.time()
+        fn()
+        runs.append(time.time() - start)
+    return runs
+
+
+def summarize(runs):
+    "Summarize the durations of a set of runs."
+    return {
+        'runs': runs,
+        'best': min(runs),
+        'mean': sum(runs) / len(runs),
+    }
+
+
+def clear_cache(project):
+    "Remove any cached analysis results for a project."
+    shutil.rmtree(os.path.join(project, CACHE_DIRNAME), ignore_errors=True)
+
+
+def consume(jobs, use_cache):
+    "Run the headless loading pipeline to completion."
+    for message in load_coverage(jobs=jobs, use_cache=use_cache):
+        if message[0] in ('nodata', 'error'):
+            raise RuntimeError('Unable to load coverage data: %s' % (message,))
+
+
+def headless_benchmarks(project, options):
+    "Time the loading pipeline, without a GUI."
+    return {
+        # Load and analyze every file, without the cache.
+        'load': timed(lambda: consume(options.jobs, False), options.repeat),
+        # Load, populating an empty cache.
+        'load_cold_cache': timed(
+            lambda: consume(options.jobs, True), options.repeat,
+            setup=lambda: clear_cache(project)
+        ),
+        # Reload when nothing has changed.
+        'refresh': timed(lambda: consume(options.jobs, True), options.repeat),
+    }
+
+
+def gui_benchmarks(project, large, wide, options):
+    """Time loading and displaying coverage in the GUI.
+
+    wide is a project with every module in a single directory.
+    """
+    try:
+        import tkinter as tk
+    except ImportError:
+        import Tkinter as tk
+
+    from duvet.analysis import filename_normalizer
+    from duvet.scanner import ProjectScanner
+    from duvet.view import MainWindow
+    from duvet.widgets import FileView
+
+    root = tk.Tk()
+    root.withdraw()
+    results = {}
+    try:
+        window_options = Namespace(
+            path=project, jobs=options.jobs, no_cache=False, eager=False,
+            ignore=[], watch=False, watch_sources=False,
+        )
+        views = []
+
+        def load():
+            view = MainWindow(root, window_options)
+            view.load_coverage()
+            while view.loader is not None:
+                root.update()
+            views.append(view)
+
+        def refresh():
+            view = views[-1]
+            view.load_coverage()
+            while view.loader is not None:
+                root.update()
+
+        def reset():
+            for child in root.winfo_children():
+                child.destroy()
+            clear_cache(project)
+
+        # Load coverage into a new window.
+        results['gui_load'] = timed(load, options.repeat, setup=reset)
+        # Reload into the same window when nothing has changed.
+        results['gui_refresh'] = timed(refresh, options.repeat)
+
+        # Display a large file, and highlight its coverage.
+        view = views[-1]
+        result = view.coverage_data['files'][os.path.normcase(large)]
+
+        def show_file():
+            view.code.filename = None
+            view.show_file(large)
+            root.update_idletasks()
+
+        def highlight():
+            view.code.highlight_coverage(result.missing, result.excluded, result.partial)
+            root.update_idletasks()
+
+        results['show_file'] = timed(show_file, options.repeat)
+        results['highlight_missing'] = timed(highlight, options.repeat)
+
+        # Build file trees outside the main window.
+        normalizer = filename_normalizer(os.path.normcase(project))
+        trees = []
+
+        def eager_tree():
+            trees.append(FileView(root, normalizer=normalizer, root=project, scanner=ProjectScanner(project)))
+
+        def insert_files():
+            tree = FileView(root, normalizer=normalizer, root=project, lazy=True)
+            for filename, result in view.coverage_data['files'].items():
+                if result.numbers is None:
+                    continue
+                dirname, basename = os.path.split(filename)
+                tree.insert_filename(dirname, basename)
+                tree.set_coverage(filename, coverage_str(result.numbers), ['file', 'code'], result.numbers)
+            trees.append(tree)
+
+        def destroy_trees():
+            while trees:
+                trees.pop().destroy()
+
+        results['file_tree_scan'] = timed(eager_tree, options.repeat, setup=destroy_trees)
+        results['file_tree_inserts'] = timed(insert_files, options.repeat, setup=destroy_trees)
+
+        # Build file trees for a single, very large directory.
+        wide_normalizer = filename_normalizer(os.path.normcase(wide))
+        wide_dirname = os.path.join(wide, WIDE_DIRNAME)
+        wide_filenames = sorted(
+            name for name in os.listdir(wide_dirname)
+            if name.endswith('.py')
+        )
+        # Insert in a fixed, shuffled order, so that every insert isn't
+        # at the end of the directory.
+        random.Random(42).shuffle(wide_filenames)
+
+        def wide_tree_scan():
+            trees.append(FileView(root, normalizer=wide_normalizer, root=wide, scanner=ProjectScanner(wide)))
+
+        def wide_tree_inserts():
+            tree = FileView(root, normalizer=wide_normalizer, root=wide, lazy=True)
+            for filename in wide_filenames:
+                tree.insert_filename(wide_dirname, filename)
+            trees.append(tree)
+
+        results['file_tree_wide_scan'] = timed(wide_tree_scan, options.repeat, setup=destroy_trees)
+        results['file_tree_wide_inserts'] = timed(wide_tree_inserts, options.repeat, setup=destroy_trees)
+        destroy_trees()
+    finally:
+        root.destroy()
+
+    return results
+
+
+def git_revision():
+    "The git revision of the code being benchmarked, if known."
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT,
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    "Print a comparison of two sets of results."
+    print('%-8s %-20s %10s %10s %8s' % ('Files', 'Benchmark', 'Baseline', 'Current', 'Ratio'))
+    if 'startup' in baseline:
+        before = baseline['startup']['best']
+        ratio = current['startup']['best'] / before
+        print('%-8s %-20s %9.3fs %9.3fs %7.2fx%s' % (
+            '-', 'startup', before, current['startup']['best'], ratio,
+            '  SLOWER' if ratio > REGRESSION_THRESHOLD else ''
+        ))
+    for scale, benchmarks in sorted(current['results'].items(), key=lambda item: int(item[0])):
+        for name, result in sorted(benchmarks.items()):
+            try:
+                before = baseline['results'][scale][name]['best']
+            except KeyError:
+                continue
+            ratio = result['best'] / before if before else float('inf')
+            print('%-8s %-20s %9.3fs %9.3fs %7.2fx%s' % (
+                scale, name, before, result['best'], ratio,
+                '  SLOWER' if ratio > REGRESSION_THRESHOLD else ''
+            ))
+
+
+def main():
+    parser = ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark Duvet against synthetic projects.',
+    )
+    parser.add_argument(
+        '-s', '--scales',
+        metavar='N,N,...',
+        default=','.join(str(scale) for scale in SCALES),
+        help='The project sizes (in files) to benchmark (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        metavar='N',
+        type=int,
+        default=3,
+        help='The number of times to run each benchmark (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        metavar='N',
+        type=int,
+        default=1,
+        help='The number of processes to use when analyzing files (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='Only run the benchmarks that don\'t need a display'
+    )
+    parser.add_argument(
+        '--workdir',
+        default=os.path.join(tempfile.gettempdir(), 'duvet-benchmarks'),
+        help='The directory for the synthetic projects (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        metavar='results.json',
+        help='Write the results to a JSON file'
+    )
+    parser.add_argument(
+        '--compare',
+        metavar='baseline.json',
+        help='Compare the results with an earlier set of results'
+    )
+    options = parser.parse_args()
+
+    output = {
+        'meta': {
+            'duvet': get_version(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'coverage': coverage.__version__,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'jobs': options.jobs,
+        },
+        'startup': summarize([measure_startup()[0] for _ in range(options.repeat)]),
+        'results': {},
+    }
+    sys.stderr.write('Startup imports took %.3fs\n' % output['startup']['best'])
+
+    cwd = os.getcwd()
+    for scale in [int(scale) for scale in options.scales.split(',')]:
+        project = os.path.join(os.path.abspath(options.workdir), 'files-%d' % scale)
+        sys.stderr.write('Generating %d files in %s...\n' % (scale, project))
+        large = generate(project, scale)
+
+        os.chdir(project)
+        try:
+            sys.stderr.write('Running benchmarks for %d files...\n' % scale)
+            results = headless_benchmarks(project, options)
+            if not options.headless:
+                # Every module in one directory, for the wide-directory
+                # file tree benchmarks.
+                wide = os.path.join(os.path.abspath(options.workdir), 'wide-%d' % scale)
+                sys.stderr.write('Generating %d files in %s...\n' % (scale, wide))
+                generate(wide, scale, layout='wide')
+                try:
+                    results.update(gui_benchmarks(project, large, wide, options))
+                except Exception as e:
+                    # Most likely, there's no display.
+                    sys.stderr.write('Skipping GUI benchmarks: %s\n' % e)
+        finally:
+            os.chdir(cwd)
+
+        output['results'][str(scale)] = dict(
+            (name, summarize(runs)) for name, runs in results.items()
+        )
+        for name, runs in sorted(results.items()):
+            sys.stderr.write('  %-20s %9.3fs\n' % (name, min(runs)))
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+Check how long it takes Duvet to start.
+
+The modules needed to display the main window should import quickly.
+In particular, starting Duvet mustn't run git (to compute the version),
+or import modules that are only needed once coverage data is loaded.
+Run the check from the root of the repository with:
+
+    $ python -m benchmarks.startup
+
+The exit status is non-zero if a deferred module is imported at startup,
+or if startup takes longer than the --budget.
+'''
+import json
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+
+# The modules imported to display the main window.
+STARTUP_MODULES = ['duvet.__main__', 'duvet.view']
+
+# Modules that are slow to import, and shouldn't be imported until
+# they are needed. subprocess is a proxy for running git.
+DEFERRED_MODULES = [
+    'coverage',
+    'subprocess',
+    'multiprocessing',
+    'concurrent.futures.process',
+    'webbrowser',
+]
+
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.time()
+import %s
+print(json.dumps({'seconds': time.time() - start, 'modules': sorted(sys.modules)}))
+''' % ', '.join(STARTUP_MODULES)
+
+
+def _run(args):
+    "Run Python in a fresh process, with this checkout on the path."
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(
+        [sys.executable] + args,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=env, universal_newlines=True,
+    )
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise RuntimeError(stderr)
+    return stdout, stderr
+
+
+def measure_startup():
+    "Return (seconds, modules) for importing the startup modules."
+    stdout, _ = _run(['-c', STARTUP_SCRIPT])
+    result = json.loads(stdout)
+    return result['seconds'], set(result['modules'])
+
+
+def import_times(limit=10):
+    """Return the slowest top-level imports at startup, as (module, seconds).
+
+    Requires Python 3.7+ (for `-X importtime`); returns an empty list
+    on older versions.
+    """
+    if sys.version_info < (3, 7):
+        return []
+    _, stderr = _run(['-X', 'importtime', '-c', 'import %s' % ', '.join(STARTUP_MODULES)])
+
+    times = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        # Only report the imports made directly by the startup modules
+        # (and the startup modules themselves).
+        name = parts[2].rstrip()
+        if len(name) - len(name.lstrip()) <= 3:
+            times.append((name.strip(), cumulative / 1e6))
+
+    times.sort(key=lambda item: -item[1])
+    return times[:limit]
+
+
+def main():
+    parser = ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description='Check how long it takes Duvet to start.',
+    )
+    parser.add_argument(
+        '--budget',
+        metavar='MS',
+        type=float,
+        help='Fail if the startup modules take longer than MS milliseconds to import'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        metavar='N',
+        type=int,
+        default=5,
+        help='The number of times to measure startup (default: %(default)s)'
+    )
+    options = parser.parse_args()
+
+    runs = []
+    for _ in range(options.repeat):
+        seconds, modules = measure_startup()
+        runs.append(seconds)
+    best = min(runs)
+
+    print('Startup imports took %.1fms (best of %d)' % (best * 1000, options.repeat))
+    for name, seconds in import_times():
+        print('  %-30s %7.1fms' % (name, seconds * 1000))
+
+    status = 0
+    imported = [module for module in DEFERRED_MODULES if module in modules]
+    if imported:
+        print('Deferred modules were imported at startup: %s' % ', '.join(imported))
+        status = 1
+    if options.budget is not None and best * 1000 > options.budget:
+        print('Startup is over budget (%.1fms)' % options.budget)
+        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Generation of synthetic projects and coverage data for benchmarks.
+
+A synthetic project is a tree of packages, each containing a number of
+modules with a known mix of covered and uncovered lines, plus a single
+very large module for display benchmarks. A "wide" project puts every
+module in a single directory instead, for benchmarks of very large
+directories. The coverage data file for the project is written
+directly, rather than by running anything.
+"""
+import os
+import random
+
+import coverage
+
+
+# The number of modules in each package, and packages in each parent.
+MODULES_PER_PACKAGE = 20
+PACKAGES_PER_PARENT = 10
+
+# The directory that holds every module in a wide project.
+WIDE_DIRNAME = 'wide'
+
+# The number of functions in each module.
+FUNCTIONS_PER_MODULE = 10
+
+# The number of lines in the large module.
+LARGE_MODULE_LINES = 20000
+
+# A marker file, recording that a project has been completely generated.
+MARKER = '.duvet_benchmark'
+
+FUNCTION = '''
+def function_%(n)d(x):
+    """A function with a branch."""
+    if x > %(n)d:
+        y = x - %(n)d
+    else:
+        y = x + %(n)d
+    return y
+'''
+
+
+def module_source(n_functions):
+    "Return the source of a module, and the lines that are statements."
+    lines = ['"""A synthetic module."""', 'import os']
+    statements = [2]
+    for n in range(n_functions):
+        start = len(lines) + 2
+        lines.extend((FUNCTION % {'n': n}).split('\n'))
+        # def, if, y =, y =, return
+        statements.extend([start, start + 2, start + 3, start + 5, start + 6])
+    return '\n'.join(lines) + '\n', statements
+
+
+def package_path(root, index, layout='deep'):
+    """Return the directory for the package containing module `index`.
+
+    layout is 'deep' (a tree of packages) or 'wide' (a single directory).
+    """
+    if layout == 'wide':
+        return os.path.join(root, WIDE_DIRNAME)
+
+    package = index // MODULES_PER_PACKAGE
+    parts = []
+    while True:
+        parts.append('pkg%d' % (package % PACKAGES_PER_PARENT))
+        package //= PACKAGES_PER_PARENT
+        if not package:
+            break
+    return os.path.join(root, *reversed(parts))
+
+
+def write_data_file(filename, measured):
+    "Write a coverage data file recording the measured lines of each file."
+    lines = dict((path, dict.fromkeys(executed)) for path, executed in measured.items())
+    try:
+        # coverage 5+
+        data = coverage.CoverageData(basename=filename)
+    except TypeError:
+        data = coverage.CoverageData()
+
+    data.add_lines(lines)
+    if hasattr(data, 'write_file'):
+        data.write_file(filename)
+    else:
+        data.write()
+
+
+def generate(root, n_files, seed=42, layout='deep'):
+    """Generate a project of (about) n_files modules, with coverage data.
+
+    layout is 'deep' (a tree of packages) or 'wide' (every module in a
+    single directory). If the project has already been generated, it is
+    reused. Returns the path of the large module.
+    """
+    large = os.path.join(root, 'large.py')
+    if os.path.exists(os.path.join(root, MARKER)):
+        return large
+
+    rng = random.Random(seed)
+    source, statements = module_source(FUNCTIONS_PER_MODULE)
+    measured = {}
+    for index in range(n_files - 1):
+        dirname = package_path(root, index, layout)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        filename = os.path.join(dirname, 'module%d.py' % index)
+        with open(filename, 'w') as f:
+            f.write(source)
+
+        # Most files are mostly covered; a few are barely covered.
+        fraction = rng.choice([1.0, 0.95, 0.9, 0.85, 0.75, 0.5, 0.1])
+        measured[os.path.abspath(filename)] = [
+            line for line in statements if rng.random() < fraction
+        ]
+
+    source, statements = module_source(LARGE_MODULE_LINES // 9)
+    with open(large, 'w') as f:
+        f.write(source)
+    measured[os.path.abspath(large)] = [line for line in statements if rng.random() < 0.8]
+
+    write_data_file(os.path.join(root, '.coverage'), measured)
+
+    with open(os.path.join(root, MARKER), 'w') as f:
+        f.write('%d\n' % n_files)
+    return large
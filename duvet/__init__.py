@@ -1,3 +1,5 @@
+import sys
+
 # Examples of valid version strings
 # NUM_VERSION = (0, 1, 3, 'dev')
 # NUM_VERSION = (0, 1, 3, ('a', 1))
@@ -63,4 +65,30 @@ def part_string(part, i):
             s = '.' + s
     return s
 
-VERSION = "".join(part_string(nv, i) for i, nv in enumerate(NUM_VERSION))
+
+def get_version():
+    """Return the version string.
+
+    Installed copies of Duvet have the version recorded in
+    `duvet._version` at build time. Otherwise (e.g., in a git checkout),
+    the version is computed, which can mean asking git for the date of
+    the latest changeset.
+    """
+    try:
+        from duvet._version import VERSION
+    except ImportError:
+        VERSION = "".join(part_string(nv, i) for i, nv in enumerate(NUM_VERSION))
+    return VERSION
+
+
+# The version isn't computed at import time, as that can mean running
+# git; use get_version(). On Python 3.7+, VERSION is still available as
+# an attribute, and is computed on first use.
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        "Compute VERSION on first use."
+        global VERSION
+        if name == 'VERSION':
+            VERSION = get_version()
+            return VERSION
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -1,29 +1,93 @@
 '''
 This is the main entry point for the Duvet GUI.
-'''
-try:
-    from tkinter import *
-except ImportError:
-    from Tkinter import *
 
+`duvet report` produces a report without a GUI; in that case, Tk is
+never imported, so the report can run on machines without a display.
+'''
 import sys
-from argparse import ArgumentParser
+from argparse import Action, ArgumentParser, SUPPRESS
+
+from duvet import get_version, timing
+
 
-from duvet import VERSION
-from duvet.view import MainWindow
+class VersionAction(Action):
+    """Display the version, and exit.
+
+    Unlike argparse's own version action, the version is only computed
+    if it is requested.
+    """
+    def __init__(self, option_strings, dest=SUPPRESS, default=SUPPRESS, help="show program's version number and exit"):
+        Action.__init__(self, option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message=get_version() + '\n')
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'report':
+        from duvet.report import main as report
+        sys.exit(report(sys.argv[2:]))
+
     parser = ArgumentParser(
         prog='duvet',
         description='A GUI tool to visualize coverage data.',
     )
-    parser.add_argument('--version', action='version', version=VERSION)
+    parser.add_argument('--version', action=VersionAction)
     parser.add_argument(
         '-p', '--path',
         metavar='application_path/',
         help='The PATH to visualize the code coverage'
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        metavar='N',
+        type=int,
+        default=1,
+        help='The number of processes to use when analyzing files (0 to use one per CPU)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Don't cache analysis results between loads"
+    )
+    parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help="Don't record the results of each load in the coverage history"
+    )
+    parser.add_argument(
+        '--eager',
+        action='store_true',
+        help='Scan the whole project tree on startup, rather than as directories are expanded'
+    )
+    parser.add_argument(
+        '-i', '--ignore',
+        metavar='GLOB',
+        action='append',
+        default=[],
+        help='Exclude files and directories matching GLOB from the project tree (can be used multiple times)'
+    )
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='Reload whenever the coverage data file changes'
+    )
+    parser.add_argument(
+        '--watch-sources',
+        action='store_true',
+        help='Reload whenever the coverage data file or a project source file changes'
+    )
+    parser.add_argument(
+        '--diff',
+        metavar='BASE',
+        dest='diff_base',
+        help='Only show files that have changed against the git revision BASE (e.g., main)'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='On exit, write a trace of where time was spent to FILE (in Chrome trace format)'
+    )
     # parser.add_argument(
     #     'filename',
     #     metavar='script.py',
@@ -36,22 +100,37 @@ def main():
 
     options = parser.parse_args()
 
+    try:
+        from tkinter import Tk
+    except ImportError:
+        from Tkinter import Tk
+
+    from duvet.view import MainWindow
+
+    # Time the phases of each load, so they can be reported.
+    timing.enable(trace=bool(options.profile))
+
     # Set up the root Tk context
     root = Tk()
 
     # Construct a window debugging the nominated program
     view = MainWindow(root, options)
 
-    # Load initial coverage data:
-    success = view.load_coverage()
-    if not success:
-        sys.exit(1)
+    # Start loading the initial coverage data; the window will be
+    # populated as the results become available.
+    view.load_coverage()
 
     # Run the main loop
     try:
         view.mainloop()
     except KeyboardInterrupt:
-        view.on_quit()
+        view.cmd_quit()
+
+    if options.profile:
+        timing.timer().write_trace(options.profile)
+
+    # If the initial coverage data couldn't be loaded, report failure.
+    sys.exit(view.exit_status)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,318 @@
+"""The analysis engine.
+
+Analyzing a file means parsing its source and comparing the statements
+that were found with the lines that coverage data says were executed.
+That work is CPU bound, so on large projects the measured files are
+split into chunks and analyzed across a pool of worker processes.
+
+coverage and multiprocessing are slow to import, and this module is
+used by the GUI as it starts, so they are only imported when analysis
+begins.
+"""
+import os
+from collections import namedtuple
+
+try:
+    from concurrent.futures import as_completed
+except ImportError:
+    as_completed = None
+
+from duvet import timing
+from duvet.lines import LineSet
+
+
+# The result of analyzing a single file. statements, missing, excluded
+# and partial (lines with a branch that was never taken) are LineSets;
+# numbers is a coverage `Numbers` instance. If the source for the file
+# couldn't be found, numbers will be None.
+FileResult = namedtuple('FileResult', [
+    'filename', 'statements', 'missing', 'excluded', 'partial', 'numbers'
+])
+
+
+# The largest number of files to send to a worker process at once.
+MAX_CHUNK_SIZE = 64
+
+# The number of decimal places shown in coverage percentages.
+PRECISION = 1
+
+# The coverage buckets, and the lowest coverage percentage for each.
+BUCKETS = [
+    ('perfect', 99.9),
+    ('good', 90.0),
+    ('ok', 80.0),
+    ('poor', 70.0),
+    ('bad', 0.0),
+]
+
+# The color used to display each coverage bucket.
+BUCKET_COLORS = {
+    'bad': 'red',
+    'poor': 'orange',
+    'ok': 'blue',
+    'good': 'cyan',
+    'perfect': 'green',
+}
+
+
+def percent_str(n_covered, n_total):
+    """Format a percentage covered, with PRECISION decimal places.
+
+    As in coverage's own reports, a percentage is never rounded to 0 or
+    100 unless it is exactly 0 or 100. duvet formats percentages itself,
+    rather than using `Numbers.pc_covered_str`, because the precision
+    used by coverage is global and is reset by some versions whenever a
+    file is analyzed.
+    """
+    if n_total:
+        percent = 100.0 * n_covered / n_total
+    else:
+        percent = 100.0
+    near_zero = 1.0 / 10 ** PRECISION
+    if 0 < percent < near_zero:
+        percent = near_zero
+    elif 100 - near_zero < percent < 100:
+        percent = 100 - near_zero
+    return '%.*f' % (PRECISION, percent)
+
+
+def coverage_str(numbers):
+    "Return the percentage of statements (and branches) covered, as a string."
+    return percent_str(
+        numbers.n_executed + numbers.n_executed_branches,
+        numbers.n_statements + numbers.n_branches
+    )
+
+
+def coverage_bucket(percent):
+    "Classify a coverage percentage into one of the coverage BUCKETS."
+    for bucket, minimum in BUCKETS:
+        if percent >= minimum:
+            return bucket
+    return 'bad'
+
+
+def branch_coverage_str(numbers):
+    """Return the percentage of branches covered, as a string.
+
+    Returns '' if no branches were measured (e.g., if coverage wasn't
+    run with branch measurement).
+    """
+    if numbers is None or not numbers.n_branches:
+        return ''
+    return percent_str(numbers.n_branches - numbers.n_missing_branches, numbers.n_branches)
+
+
+def filename_normalizer(base_path):
+    """Generate a function that will normalize a full path into a
+    display name, by removing a common prefix.
+
+    In most situations, this will be removing the current working
+    directory.
+    """
+    def _normalizer(filename):
+        if filename.startswith(base_path) and filename[len(base_path)] == os.sep:
+            return filename[len(base_path)+1:]
+        else:
+            return filename
+    return _normalizer
+
+
+def line_ranges(lines):
+    """Collapse a sorted list of line numbers into contiguous ranges.
+
+    Returns a list of (first, last) tuples.
+    """
+    ranges = []
+    for line in lines:
+        if ranges and ranges[-1][1] == line - 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return [tuple(r) for r in ranges]
+
+
+def analyze_file(cov, filename):
+    """Analyze a single file, returning a FileResult.
+
+    The filename on the result will be normalized for case.
+    """
+    import coverage
+
+    try:
+        analysis = cov._analyze(filename)
+    except coverage.misc.NoSource:
+        # could mean the file was deleted after running coverage
+        return FileResult(os.path.normcase(filename), LineSet(), LineSet(), LineSet(), LineSet(), None)
+
+    if analysis.has_arcs():
+        partial = LineSet(set(analysis.missing_branch_arcs()) - analysis.missing)
+    else:
+        partial = LineSet()
+
+    return FileResult(
+        os.path.normcase(filename),
+        LineSet(analysis.statements),
+        LineSet(analysis.missing),
+        LineSet(analysis.excluded),
+        partial,
+        analysis.numbers,
+    )
+
+
+def _analyze_chunk(has_arcs, chunk):
+    """Analyze a chunk of files in a worker process.
+
+    chunk is a list of (filename, measured, file_tracer) tuples, where
+    measured is the list of lines (or arcs) that were executed in that
+    file. Returns a list of FileResult-like tuples, with numbers
+    flattened into a list of arguments for the `Numbers` constructor
+    (or None if the source couldn't be found).
+    """
+    import coverage
+    from duvet.shards import new_data, use_data
+
+    data = new_data()
+    measured = dict((filename, dict.fromkeys(lines)) for filename, lines, _ in chunk)
+    if has_arcs:
+        data.add_arcs(measured)
+    else:
+        data.add_lines(measured)
+    data.add_file_tracers(dict(
+        (filename, tracer)
+        for filename, _, tracer in chunk
+        if tracer
+    ))
+
+    cov = coverage.coverage(data_file=None)
+    use_data(cov, data)
+
+    results = []
+    for filename, _, _ in chunk:
+        result = analyze_file(cov, filename)
+        results.append(result._replace(
+            numbers=result.numbers.init_args() if result.numbers else None
+        ))
+    return results
+
+
+def _executor(jobs):
+    "Construct a process pool with the given number of workers."
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Prefer fresh interpreters for the workers; forking a process that
+    # is running a Tk event loop (and other threads) isn't safe.
+    try:
+        return ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    except (AttributeError, TypeError):
+        return ProcessPoolExecutor(max_workers=jobs)
+
+
+def measured_lines(data, filename):
+    "Return the lines (or arcs) that were measured in a file."
+    if data.has_arcs():
+        return data.arcs(filename) or []
+    else:
+        return data.lines(filename) or []
+
+
+def analyze(cov, filenames, jobs=1, cancelled=None, cache=None):
+    """Analyze a list of files, yielding a FileResult for each file.
+
+    cov is a coverage instance that has already loaded its data. If jobs
+    is more than 1, the files will be analyzed by that many worker
+    processes, and results will be yielded in the order they complete.
+    If jobs is 0, one worker will be used for each CPU.
+
+    cancelled is an optional callable; if it returns True, analysis will
+    stop as soon as possible.
+
+    cache is an optional `AnalysisCache`. Files whose cached analysis is
+    still valid will be yielded first, without being analyzed again.
+    """
+    filenames = list(filenames)
+    if cache is None:
+        for result in _analyze(cov, filenames, jobs, cancelled):
+            yield result
+        return
+
+    # Use the cached analysis for any file that hasn't changed.
+    data = cov.data
+    stale = {}
+    for filename in filenames:
+        if cancelled and cancelled():
+            return
+        with timing.span('cache'):
+            result = cache.get(filename, measured_lines(data, filename))
+        if result is None:
+            stale[os.path.normcase(filename)] = filename
+        else:
+            yield result
+
+    # Analyze everything else, and cache the results.
+    try:
+        for result in _analyze(cov, list(stale.values()), jobs, cancelled):
+            with timing.span('cache'):
+                cache.put(result, measured_lines(data, stale[result.filename]))
+            yield result
+    finally:
+        with timing.span('cache'):
+            cache.prune()
+
+
+def _analyze(cov, filenames, jobs, cancelled):
+    "Analyze a list of files, using a process pool if requested."
+    import coverage
+
+    if jobs == 0:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+
+    # Don't bother starting a pool if there isn't enough work to share.
+    if as_completed is None or jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            if cancelled and cancelled():
+                return
+            with timing.span('analyze'):
+                result = analyze_file(cov, filename)
+            yield result
+        return
+
+    # Split the files into enough chunks to keep every worker busy,
+    # without paying the cost of a round trip for every file.
+    data = cov.data
+    has_arcs = data.has_arcs()
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, len(filenames) // (jobs * 4)))
+
+    executor = _executor(jobs)
+    try:
+        futures = []
+        with timing.span('analyze'):
+            for i in range(0, len(filenames), chunk_size):
+                chunk = [
+                    (
+                        filename,
+                        measured_lines(data, filename),
+                        data.file_tracer(filename),
+                    )
+                    for filename in filenames[i:i + chunk_size]
+                ]
+                futures.append(executor.submit(_analyze_chunk, has_arcs, chunk))
+
+        # The time spent waiting for workers is the time spent analyzing.
+        for future in timing.timed_iter('analyze', as_completed(futures)):
+            if cancelled and cancelled():
+                return
+            for result in future.result():
+                yield result._replace(
+                    numbers=coverage.results.Numbers(*result.numbers) if result.numbers else None
+                )
+    finally:
+        # Don't wait for outstanding work if analysis was abandoned.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,266 @@
+"""A persistent, on-disk cache of analysis results.
+
+Analyzing a file is expensive, but the result only depends on the
+source of the file, the lines that were measured in it, and the coverage
+options that affect analysis (e.g., `exclude_lines`). The cache stores
+the result for each file in a small binary entry, keyed on the file's
+path, modification time, size and content hash, plus a hash of the
+measured lines and the analysis options. If none of those have changed,
+the cached result can be used instead of analyzing the file again.
+
+Each entry is a fixed size header, followed by the statement, missing,
+excluded and partial line numbers as arrays of unsigned ints. When the cache grows
+beyond its size budget, the least recently used entries are discarded.
+"""
+import hashlib
+import os
+import struct
+from array import array
+
+import coverage
+
+from duvet.analysis import FileResult
+from duvet.lines import LineSet
+
+
+# The default directory (relative to the coverage data file) for the cache.
+CACHE_DIRNAME = '.duvet_cache'
+
+# The default size budget for the cache, in bytes.
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# The layout of the header of a cache entry:
+#  * a magic number/format version
+#  * the mtime and size of the source file
+#  * the SHA1 hash of the source file's content
+#  * the SHA1 hash of the measured lines (and the coverage version and
+#    analysis options)
+#  * the number of statement, missing, excluded and partial lines
+#    that follow the header
+#  * the 7 arguments required to reconstruct the file's `Numbers`
+HEADER = struct.Struct('<4sdQ20s20sIIII7Q')
+MAGIC = b'DVT2'
+
+
+def _replace(src, dst):
+    "Atomically replace dst with src"
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2 doesn't have os.replace
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _to_bytes(values):
+    "Convert an array into bytes"
+    try:
+        return values.tobytes()
+    except AttributeError:
+        # Python 2
+        return values.tostring()
+
+
+def _from_bytes(typecode, data):
+    "Construct an array from bytes"
+    values = array(typecode)
+    try:
+        values.frombytes(data)
+    except AttributeError:
+        # Python 2
+        values.fromstring(data)
+    return values
+
+
+def content_hash(filename):
+    "Return the SHA1 hash of the content of a file."
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def config_hash(config, has_arcs):
+    """Return a hash of the coverage options that affect analysis.
+
+    config is a coverage configuration; has_arcs is true if the data
+    was measured in branch mode.
+    """
+    options = [
+        has_arcs,
+        sorted(config.exclude_list),
+        sorted(config.partial_list),
+        sorted(config.partial_always_list),
+    ]
+    return hashlib.sha1(repr(options).encode('utf-8')).digest()
+
+
+def measured_hash(measured, config=b''):
+    """Return a hash of the lines (or arcs) measured in a file.
+
+    The version of coverage is included in the hash, because the
+    analysis of a file may change between versions. config is a hash of
+    the analysis options (see `config_hash`).
+    """
+    digest = hashlib.sha1(coverage.__version__.encode('ascii'))
+    digest.update(config)
+    measured = sorted(measured)
+    if measured and isinstance(measured[0], tuple):
+        # Arcs are pairs of line numbers; flatten them.
+        measured = [line for arc in measured for line in arc]
+    digest.update(_to_bytes(array('i', measured)))
+    return digest.digest()
+
+
+class AnalysisCache(object):
+    """The cache of analysis results in a directory.
+
+    config is a hash of the analysis options (see `config_hash`); entries
+    cached with different options are treated as stale.
+    """
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, config=b''):
+        self.directory = directory
+        self.max_size = max_size
+        self.config = config
+
+    def _entry_path(self, filename):
+        "Return the path of the cache entry for a file."
+        name = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name[:2], name[2:])
+
+    def _read_header(self, path):
+        "Read the header of a cache entry, returning None if it is invalid."
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except (IOError, OSError):
+            return None, None
+
+        if len(content) < HEADER.size or content[:4] != MAGIC:
+            return None, None
+        return HEADER.unpack_from(content), content
+
+    def get(self, filename, measured):
+        """Retrieve the cached analysis of a file.
+
+        measured is the list of lines (or arcs) that were measured in the
+        file. Returns a FileResult, or None if there is no valid entry.
+        """
+        filename = os.path.normcase(filename)
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+
+        path = self._entry_path(filename)
+        header, content = self._read_header(path)
+        if header is None:
+            return None
+
+        (_, mtime, size, source_digest, measured_digest) = header[:5]
+        counts = header[5:9]
+        numbers = header[9:]
+
+        if measured_digest != measured_hash(measured, self.config):
+            return None
+
+        # If the file has been touched, it may still have the same content.
+        # If so, update the entry with the new mtime and size; otherwise, the
+        # entry is stale.
+        if mtime != stat.st_mtime or size != stat.st_size:
+            if source_digest != content_hash(filename):
+                return None
+            content = HEADER.pack(*(
+                (MAGIC, stat.st_mtime, stat.st_size, source_digest, measured_digest)
+                + counts + numbers
+            )) + content[HEADER.size:]
+            self._write(path, content)
+        else:
+            # Mark the entry as recently used.
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+        lines = _from_bytes('I', content[HEADER.size:])
+        if len(lines) != sum(counts):
+            return None
+
+        line_sets = []
+        offset = 0
+        for count in counts:
+            line_sets.append(LineSet.from_sorted(lines[offset:offset + count]))
+            offset += count
+
+        return FileResult(filename, *line_sets, numbers=coverage.results.Numbers(*numbers))
+
+    def put(self, result, measured):
+        "Store the analysis of a file in the cache."
+        # Don't cache files that couldn't be analyzed.
+        if result.numbers is None:
+            return
+
+        try:
+            stat = os.stat(result.filename)
+            source_digest = content_hash(result.filename)
+        except (IOError, OSError):
+            return
+
+        line_sets = [result.statements, result.missing, result.excluded, result.partial]
+        lines = array('I')
+        for line_set in line_sets:
+            lines.extend(line_set.lines)
+
+        content = HEADER.pack(*(
+            [MAGIC, stat.st_mtime, stat.st_size, source_digest, measured_hash(measured, self.config)]
+            + [len(line_set) for line_set in line_sets]
+            + result.numbers.init_args()
+        )) + _to_bytes(lines)
+
+        self._write(self._entry_path(result.filename), content)
+
+    def _write(self, path, content):
+        "Write a cache entry, replacing any existing entry."
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        try:
+            dirname = os.path.dirname(path)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            _replace(tmp_path, path)
+        except (IOError, OSError):
+            # The cache is an optimization; if it can't be written,
+            # carry on without it.
+            pass
+
+    def prune(self):
+        "Discard the least recently used entries until the cache is within budget."
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            return
+
+        # Prune back to 90% of the budget, so that we don't need
+        # to prune again on the next load.
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
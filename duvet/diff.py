@@ -0,0 +1,88 @@
+"""Comparison of successive coverage loads.
+
+When coverage data is refreshed, most files usually haven't changed.
+Rather than rewriting the display for every file, the results of the
+new load are compared with the results of the previous load, producing
+a minimal set of changes that need to be applied to the display.
+"""
+from collections import namedtuple
+
+from duvet.analysis import coverage_bucket, coverage_str
+
+
+# A change to the coverage of a single file.
+#  * old and new are the previous and current FileResult for the file;
+#    old is None if the file has been added, and new is None if the file
+#    has been removed.
+#  * coverage_changed is True if the displayed percentage has changed.
+#  * bucket_changed is True if the coverage bucket has changed.
+#  * lines_changed is True if the statement, missing, excluded or partial
+#    lines have changed.
+FileChange = namedtuple('FileChange', [
+    'filename', 'old', 'new',
+    'coverage_changed', 'bucket_changed', 'lines_changed'
+])
+
+
+def result_coverage(result):
+    "Return the displayed coverage percentage for a FileResult."
+    if result is None or result.numbers is None:
+        return ''
+    return coverage_str(result.numbers)
+
+
+def result_bucket(result):
+    """Return the coverage bucket for a FileResult.
+
+    If the file has no coverage data, the bucket is None; if the source
+    for the file couldn't be found, the bucket is 'nosource'.
+    """
+    if result is None:
+        return None
+    elif result.numbers is None:
+        return 'nosource'
+    return coverage_bucket(result.numbers.pc_covered)
+
+
+def compare(filename, old, new):
+    "Compare two results for a file, returning a FileChange (or None if they're the same)."
+    coverage_changed = result_coverage(old) != result_coverage(new)
+    bucket_changed = result_bucket(old) != result_bucket(new)
+    lines_changed = (
+        old is None
+        or new is None
+        or old.statements != new.statements
+        or old.missing != new.missing
+        or old.excluded != new.excluded
+        or old.partial != new.partial
+    )
+
+    if old is None or new is None or coverage_changed or bucket_changed or lines_changed:
+        return FileChange(filename, old, new, coverage_changed, bucket_changed, lines_changed)
+    return None
+
+
+class CoverageDiff(object):
+    """An incremental comparison between two coverage loads.
+
+    The new results are provided one at a time as they are produced.
+    Once every new result has been provided, the files that have no new
+    result are the files that have been removed.
+    """
+    def __init__(self, previous):
+        # A snapshot of the results from the previous load.
+        self.previous = dict(previous)
+        self.seen = set()
+
+    def update(self, result):
+        "Record a new result, returning the FileChange it causes (if any)."
+        self.seen.add(result.filename)
+        return compare(result.filename, self.previous.get(result.filename), result)
+
+    def removed(self):
+        "Return the FileChanges for files that weren't in the new load."
+        return [
+            FileChange(filename, old, None, True, True, True)
+            for filename, old in self.previous.items()
+            if filename not in self.seen
+        ]
@@ -0,0 +1,123 @@
+"""Finding the lines that have changed against a git base.
+
+In diff mode, only the files that have changed against a base revision
+(e.g., `main`) are analyzed, and the lines of those files that are both
+changed and not covered are reported as "new uncovered lines". The
+changes are read from `git diff` against the working tree, so changes
+that haven't been committed yet are included.
+"""
+import os
+import re
+
+from duvet.lines import LineSet
+
+
+# The header of each hunk in a unified diff; only the position of the
+# hunk in the new version of the file is needed.
+HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+class GitDiffError(Exception):
+    "The changes against the base couldn't be found."
+
+
+def _git(args, cwd):
+    "Run a git command, returning its output."
+    import subprocess
+
+    try:
+        process = subprocess.Popen(
+            ['git'] + args,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except OSError as e:
+        raise GitDiffError("Couldn't run git: %s" % e)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise GitDiffError(stderr.decode('utf-8', 'replace').strip())
+    return stdout.decode('utf-8', 'replace')
+
+
+def parse_diff(diff, root):
+    """Parse a unified diff (with no context lines).
+
+    Returns a dictionary mapping the (absolute, normalized for case)
+    path of each changed file to a `LineSet` of the lines that were added
+    or changed. Paths in the diff are relative to root. Deleted files are
+    not included; a file with only deleted lines has no changed lines.
+
+    File headers are only recognized between a `diff --git` line and the
+    first hunk of the file, so an added line that starts with `++` isn't
+    mistaken for the header of another file.
+    """
+    changed = {}
+    lines = None
+    in_header = False
+    for line in diff.splitlines():
+        if line.startswith('diff --git '):
+            in_header = True
+            lines = None
+        elif in_header and line.startswith('+++ '):
+            path = line[4:]
+            if path == '/dev/null':
+                lines = None
+            else:
+                if path.startswith('b/'):
+                    path = path[2:]
+                lines = []
+                changed[os.path.normcase(os.path.join(root, path))] = lines
+        elif line.startswith('@@'):
+            in_header = False
+            if lines is None:
+                continue
+            match = HUNK_RE.match(line)
+            if match:
+                start = int(match.group(1))
+                count = int(match.group(2)) if match.group(2) is not None else 1
+                lines.extend(range(start, start + count))
+
+    return dict((path, LineSet(lines)) for path, lines in changed.items())
+
+
+def changed_path(filename):
+    """Return the key for a file in the dictionary returned by `changed_lines`.
+
+    git reports the top level of the repository with any symlinks
+    resolved, so filenames are compared by their real path.
+    """
+    return os.path.normcase(os.path.realpath(filename))
+
+
+def changed_lines(base, cwd=None):
+    """Find the lines that have changed against a base revision.
+
+    cwd is a directory in the git repository (e.g., the project root);
+    if it isn't given, the current directory is used. Returns a
+    dictionary mapping the real path of each changed file (see
+    `changed_path`) to a `LineSet` of its changed lines (see
+    `parse_diff`).
+    """
+    cwd = cwd or os.getcwd()
+    try:
+        root = os.path.realpath(_git(['rev-parse', '--show-toplevel'], cwd).strip())
+        diff = _git(
+            ['diff', '--no-color', '--no-ext-diff', '--no-renames', '--unified=0', base, '--'],
+            root
+        )
+    except GitDiffError as e:
+        raise GitDiffError("Couldn't find the changes against %s: %s" % (base, e))
+    return parse_diff(diff, root)
+
+
+def changed_coverage(result, changed):
+    """Return the changed statements, and new uncovered lines, of a `FileResult`.
+
+    changed is the dictionary returned by `changed_lines`. Both values
+    are `LineSet`s; they are empty if the file hasn't changed.
+    """
+    lines = changed.get(changed_path(result.filename))
+    if lines is None:
+        return LineSet(), LineSet()
+    return result.statements & lines, result.missing & lines
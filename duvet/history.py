@@ -0,0 +1,230 @@
+"""A persistent history of coverage results.
+
+Every time coverage data is loaded, the total coverage and the coverage
+numbers of every file are appended to a log in the `.duvet_history`
+directory alongside the coverage data file. The log can be used to draw
+the trend of the total coverage, and to compare the coverage of each
+file with any earlier run.
+
+The log is append-only, and made of fixed size records, so any record
+can be found from its index without reading the rest of the log:
+
+* `runs` has one record per run: when it was recorded, the total
+  `Numbers` of the run, and the range of file records that belong to it.
+* `files` has one record per file per run: the file's ID and its
+  `Numbers` (without n_files, which is always 1).
+* `paths` is the path of each file, one per line; a file's ID is its
+  line number.
+
+Records are read through a memory map, so reading the last few runs
+(e.g., for a trend) takes the same time however long the log is. A run
+is only recorded if its numbers differ from the last recorded run; the
+run record is written last, so an interrupted write leaves no partial
+run in the log.
+"""
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+
+# The default directory (relative to the coverage data file) for the log.
+HISTORY_DIRNAME = '.duvet_history'
+
+# The magic number/format version at the start of the record files.
+MAGIC = b'DVH1'
+
+# A run: the time it was recorded, the index of its first file record,
+# the number of file records, and the 7 arguments for its total `Numbers`.
+RUN_RECORD = struct.Struct('<dQI7I')
+
+# A file in a run: the file's ID, and the 6 arguments (after n_files)
+# for its `Numbers`.
+FILE_RECORD = struct.Struct('<I6I')
+
+
+# A recorded run.
+#   index - the position of the run in the log
+#   timestamp - when the run was recorded (in seconds since the epoch)
+#   totals - the arguments for the run's total `Numbers`
+Run = namedtuple('Run', ['index', 'timestamp', 'totals'])
+
+
+def _n_records(path, record):
+    "The number of complete records in a record file."
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    return max(0, (size - len(MAGIC)) // record.size)
+
+
+def _append(path, record, values, count):
+    """Append records to a record file that holds count complete records.
+
+    Anything after the last complete record (e.g., from an interrupted
+    write) is overwritten.
+    """
+    mode = 'r+b' if os.path.exists(path) else 'w+b'
+    with open(path, mode) as f:
+        f.seek(0)
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            f.write(MAGIC)
+            count = 0
+        f.seek(len(MAGIC) + count * record.size)
+        f.write(b''.join(record.pack(*value) for value in values))
+        f.truncate()
+
+
+class History(object):
+    "The log of coverage results in a directory."
+    def __init__(self, directory):
+        self.directory = directory
+        self._runs_path = os.path.join(directory, 'runs')
+        self._files_path = os.path.join(directory, 'files')
+        self._paths_path = os.path.join(directory, 'paths')
+
+        # The ID of each path, the path for each ID, and the size of the
+        # complete lines in the paths file; read when needed.
+        self._path_ids = None
+        self._paths = None
+        self._paths_size = 0
+
+    def __len__(self):
+        return _n_records(self._runs_path, RUN_RECORD)
+
+    def _read_paths(self):
+        if self._paths is None:
+            try:
+                with open(self._paths_path, 'rb') as f:
+                    content = f.read()
+            except (IOError, OSError):
+                content = b''
+            # Ignore a partially written last line.
+            self._paths_size = content.rfind(b'\n') + 1
+            self._paths = content[:self._paths_size].decode('utf-8').split('\n')[:-1]
+            self._path_ids = dict((path, path_id) for path_id, path in enumerate(self._paths))
+        return self._paths
+
+    def _map(self, path):
+        "Memory map a record file, returning None if it is empty."
+        try:
+            with open(path, 'rb') as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def runs(self, last=None):
+        "Return the recorded runs, oldest first; if last is given, only the last runs."
+        n_runs = len(self)
+        first = 0 if last is None else max(0, n_runs - last)
+        data = self._map(self._runs_path)
+        if data is None:
+            return []
+        try:
+            runs = []
+            for index in range(first, n_runs):
+                values = RUN_RECORD.unpack_from(data, len(MAGIC) + index * RUN_RECORD.size)
+                runs.append(Run(index, values[0], values[3:]))
+            return runs
+        finally:
+            data.close()
+
+    def snapshot(self, index):
+        """Return the numbers of every file in a run.
+
+        index is the position of the run in the log (negative indices
+        count back from the most recent run). Returns a dictionary mapping
+        each filename to the arguments for its `Numbers`.
+        """
+        n_runs = len(self)
+        if index < 0:
+            index += n_runs
+        if not 0 <= index < n_runs:
+            raise IndexError('No run %s in the coverage history' % index)
+
+        runs = self._map(self._runs_path)
+        try:
+            _, first, count = RUN_RECORD.unpack_from(runs, len(MAGIC) + index * RUN_RECORD.size)[:3]
+        finally:
+            runs.close()
+
+        paths = self._read_paths()
+        snapshot = {}
+        if count:
+            files = self._map(self._files_path)
+            if files is None:
+                return snapshot
+            try:
+                for i in range(first, first + count):
+                    values = FILE_RECORD.unpack_from(files, len(MAGIC) + i * FILE_RECORD.size)
+                    snapshot[paths[values[0]]] = (1,) + values[1:]
+            finally:
+                files.close()
+        return snapshot
+
+    def deltas(self, index, current):
+        """Compare the numbers of each file with an earlier run.
+
+        current maps filenames to the arguments for their `Numbers` (as
+        returned by `snapshot()`). Returns a dictionary mapping each file
+        whose numbers differ to its (old, new) numbers; old is None for
+        files that are new, and new is None for files that are gone.
+        """
+        old = self.snapshot(index)
+        deltas = {}
+        for filename, numbers in current.items():
+            if old.get(filename) != numbers:
+                deltas[filename] = (old.get(filename), numbers)
+        for filename, numbers in old.items():
+            if filename not in current:
+                deltas[filename] = (numbers, None)
+        return deltas
+
+    def append(self, totals, files, timestamp=None):
+        """Record a run.
+
+        totals is the arguments for the run's total `Numbers`; files maps
+        each filename to the arguments for its `Numbers`. The run isn't
+        recorded if nothing has changed since the last run. Returns True
+        if the run was recorded.
+        """
+        totals = tuple(totals)
+        files = dict((filename, tuple(numbers)) for filename, numbers in files.items())
+        n_runs = len(self)
+        if n_runs and self.runs(last=1)[0].totals == totals and self.snapshot(-1) == files:
+            return False
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        # Add any new paths, overwriting a partially written last line.
+        paths = self._read_paths()
+        new_paths = [filename for filename in sorted(files) if filename not in self._path_ids]
+        if new_paths:
+            content = ''.join(path + '\n' for path in new_paths).encode('utf-8')
+            mode = 'r+b' if os.path.exists(self._paths_path) else 'w+b'
+            with open(self._paths_path, mode) as f:
+                f.seek(self._paths_size)
+                f.write(content)
+                f.truncate()
+            self._paths_size += len(content)
+            for path in new_paths:
+                self._path_ids[path] = len(paths)
+                paths.append(path)
+
+        # Write the file records, and then the run that refers to them.
+        first = _n_records(self._files_path, FILE_RECORD)
+        _append(
+            self._files_path, FILE_RECORD,
+            [(self._path_ids[filename],) + numbers[1:] for filename, numbers in sorted(files.items())],
+            first
+        )
+        _append(
+            self._runs_path, RUN_RECORD,
+            [(timestamp or time.time(), first, len(files)) + totals],
+            n_runs
+        )
+        return True
@@ -0,0 +1,110 @@
+"""A compact representation of sets of line numbers.
+
+Every analyzed file has sets of statement, missing, excluded and partial
+lines. On a large project, storing those as Python lists or sets of ints
+costs tens of bytes per line; a `LineSet` stores the lines as a sorted
+array of unsigned ints, at 4 bytes per line.
+
+Membership is tested by binary search, and the number of lines is
+known without counting, so a LineSet can be used (e.g., for display)
+without converting it back into a set.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+def _from_sorted(lines):
+    "Construct a LineSet from an array that is already sorted (used by pickle)."
+    return LineSet.from_sorted(lines)
+
+
+class LineSet(object):
+    "An immutable, sorted set of line numbers."
+    __slots__ = ('lines',)
+
+    def __init__(self, lines=()):
+        self.lines = array('I', sorted(set(lines)))
+
+    @classmethod
+    def from_sorted(cls, lines):
+        """Construct a LineSet from line numbers that are already sorted and unique.
+
+        If lines is an array of unsigned ints, it is used without copying.
+        """
+        line_set = cls.__new__(cls)
+        if isinstance(lines, array) and lines.typecode == 'I':
+            line_set.lines = lines
+        else:
+            line_set.lines = array('I', lines)
+        return line_set
+
+    def __reduce__(self):
+        return (_from_sorted, (self.lines,))
+
+    def __repr__(self):
+        return 'LineSet(%r)' % self.lines.tolist()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LineSet.from_sorted(self.lines[index])
+        return self.lines[index]
+
+    def __contains__(self, line):
+        index = bisect_left(self.lines, line)
+        return index < len(self.lines) and self.lines[index] == line
+
+    def __eq__(self, other):
+        if isinstance(other, LineSet):
+            return self.lines == other.lines
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, LineSet):
+            return self.lines != other.lines
+        return NotImplemented
+
+    __hash__ = None
+
+    def between(self, first, last):
+        "Return the lines from first to last (inclusive)."
+        return LineSet.from_sorted(
+            self.lines[bisect_left(self.lines, first):bisect_right(self.lines, last)]
+        )
+
+    def difference(self, other):
+        "Return the lines that are in this set, but not in other."
+        other = other.lines if isinstance(other, LineSet) else LineSet(other).lines
+        result = array('I')
+        j = 0
+        n_other = len(other)
+        for line in self.lines:
+            while j < n_other and other[j] < line:
+                j += 1
+            if j == n_other or other[j] != line:
+                result.append(line)
+        return LineSet.from_sorted(result)
+
+    __sub__ = difference
+
+    def intersection(self, other):
+        "Return the lines that are in both this set and other."
+        other = other.lines if isinstance(other, LineSet) else LineSet(other).lines
+        result = array('I')
+        j = 0
+        n_other = len(other)
+        for line in self.lines:
+            while j < n_other and other[j] < line:
+                j += 1
+            if j == n_other:
+                break
+            if other[j] == line:
+                result.append(line)
+        return LineSet.from_sorted(result)
+
+    __and__ = intersection
@@ -0,0 +1,192 @@
+"""Loading of coverage data.
+
+Loading coverage data and analyzing every measured file can take a long
+time on a large project, so results are produced as a stream of
+messages. In the GUI, the loader does that work on a worker thread,
+and posts the messages onto a queue; the GUI drains that queue from
+the Tk event loop, so the window stays responsive while results arrive.
+"""
+import os
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from duvet import timing
+from duvet.analysis import analyze
+from duvet.shards import ShardedData
+from duvet.sqldata import SqliteData
+
+
+def load_coverage(jobs=1, use_cache=True, cancelled=None, shards=None, diff_base=None, record_history=False, root=None):
+    """Load and analyze coverage data, yielding progress messages.
+
+    The messages are tuples:
+
+        ('diff', changed)
+            Only produced in diff mode (see below), before 'start';
+            changed maps the path of each changed file to a `LineSet`
+            of its changed lines.
+        ('start', n_files)
+            Coverage data has been loaded; n_files will be analyzed.
+        ('file', result)
+            Analysis of a single file has completed; result is a
+            `FileResult`. If the file couldn't be found (it may have
+            been deleted after coverage was run), result.numbers will
+            be None.
+        ('history', history, previous)
+            Only produced if the load is recorded (see below), before
+            'done'; history is the `History` the load was recorded in,
+            and previous is the snapshot of the run before it (or None
+            if it is the first run).
+        ('done', totals)
+            All files have been analyzed; totals is a `Numbers` instance.
+        ('nodata',)
+            No coverage data could be found.
+        ('error', message)
+            The coverage data couldn't be loaded.
+
+    Results are yielded as soon as they are available; they aren't
+    accumulated. cancelled is an optional callable; if it returns True,
+    loading will stop as soon as possible.
+
+    The main coverage data file is merged with any parallel data files
+    alongside it. shards is an optional `ShardedData`; if it was used for
+    an earlier load, only data files that have changed since that load
+    will be read.
+
+    If diff_base is given (e.g., 'main'), only the measured files that
+    have changed against that git revision will be analyzed. root is the
+    project directory, used to find the git repository; if it isn't
+    given, the current directory is used.
+
+    If record_history is true, the results of a complete load (outside
+    diff mode) are recorded in the coverage history alongside the
+    coverage data file.
+    """
+    cov = None
+    try:
+        # coverage is slow to import, so it isn't imported until it's
+        # needed; in the GUI, that's on the loader thread.
+        import coverage
+        from duvet.cache import AnalysisCache, CACHE_DIRNAME, config_hash
+
+        # Load the new coverage data
+        cov = coverage.coverage()
+        if shards is None:
+            shards = ShardedData()
+        with timing.span('load'):
+            shards.load(cov)
+        if cancelled and cancelled():
+            return
+
+        measured_files = cov.data.measured_files()
+        if not measured_files:
+            yield ('nodata',)
+            return
+
+        if diff_base is not None:
+            from duvet.gitdiff import changed_lines, changed_path
+            changed = changed_lines(diff_base, root)
+            yield ('diff', changed)
+            measured_files = [
+                filename for filename in measured_files
+                if changed_path(filename) in changed
+            ]
+
+        yield ('start', len(measured_files))
+
+        # Keep the analysis cache alongside the coverage data file.
+        if use_cache:
+            cache = AnalysisCache(
+                os.path.join(
+                    os.path.dirname(os.path.abspath(cov.config.data_file)),
+                    CACHE_DIRNAME
+                ),
+                config=config_hash(cov.config, cov.data.has_arcs())
+            )
+        else:
+            cache = None
+
+        # Only the numbers of each file are kept for the history.
+        record_history = record_history and diff_base is None
+        numbers = {}
+
+        totals = coverage.results.Numbers()
+        for result in analyze(cov, measured_files, jobs=jobs, cancelled=cancelled, cache=cache):
+            if result.numbers:
+                totals = totals + result.numbers
+                if record_history:
+                    numbers[result.filename] = result.numbers.init_args()
+            yield ('file', result)
+
+        if cancelled and cancelled():
+            return
+
+        if record_history:
+            from duvet.history import History, HISTORY_DIRNAME
+            history = History(os.path.join(
+                os.path.dirname(os.path.abspath(cov.config.data_file)),
+                HISTORY_DIRNAME
+            ))
+            try:
+                with timing.span('history'):
+                    history.append(totals.init_args(), numbers)
+                    previous = history.snapshot(-2) if len(history) > 1 else None
+            except (IOError, OSError):
+                # The history can't be written; the load is still good.
+                pass
+            else:
+                yield ('history', history, previous)
+
+        yield ('done', totals)
+    except Exception as e:
+        yield ('error', str(e))
+    finally:
+        # A SQLite data file is queried on demand, so it stays open
+        # until the load is over (or abandoned).
+        if cov is not None and isinstance(cov.data, SqliteData):
+            cov.data.close()
+
+
+class CoverageLoader(threading.Thread):
+    """A worker thread that loads and analyzes coverage data.
+
+    Progress is reported on `self.queue`, using the messages produced
+    by `load_coverage`.
+    """
+    def __init__(self, jobs=1, use_cache=True, shards=None, diff_base=None, record_history=False, root=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.jobs = jobs
+        self.use_cache = use_cache
+        self.shards = shards
+        self.diff_base = diff_base
+        self.record_history = record_history
+        self.root = root
+        self.queue = queue.Queue()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        "Abandon the load; no further results will be posted."
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        messages = load_coverage(
+            self.jobs, self.use_cache,
+            cancelled=self._cancelled.is_set,
+            shards=self.shards,
+            diff_base=self.diff_base,
+            record_history=self.record_history,
+            root=self.root
+        )
+        for message in messages:
+            if self.cancelled:
+                return
+            self.queue.put(message)
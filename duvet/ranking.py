@@ -0,0 +1,124 @@
+"""Ranking files by how badly they are covered.
+
+A `Ranking` keeps every file with statements in sorted order, by a key
+computed from its coverage `Numbers`. When the coverage of a file
+changes, only that file's entry is moved: it is found by binary search,
+removed, and inserted again at its new position. The files are never
+sorted as a whole, so the first K entries can be read at any time
+without sorting every file on each refresh.
+
+The entries are stored as a list of short sorted blocks, rather than
+a single list, so that inserting or removing an entry only moves the
+entries in one block.
+"""
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+
+# The orders in which files can be ranked: a name, a description, and
+# the sort key for a file's coverage numbers. Ties are broken by the
+# other measure, and then by filename.
+RANKINGS = [
+    ('missing', 'Most missing lines', lambda numbers: (-numbers.n_missing, numbers.pc_covered)),
+    ('coverage', 'Lowest coverage', lambda numbers: (numbers.pc_covered, -numbers.n_missing)),
+]
+
+# The size at which a block of sorted entries is split in two.
+MAX_BLOCK_SIZE = 1000
+
+
+class SortedList(object):
+    "A list of items in sorted order, stored as a list of sorted blocks."
+    def __init__(self):
+        self._blocks = []
+        # The last (largest) item in each block.
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def add(self, item):
+        "Insert an item at its sorted position."
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            return
+
+        index = bisect_left(self._maxes, item)
+        if index == len(self._maxes):
+            index -= 1
+            block = self._blocks[index]
+            block.append(item)
+            self._maxes[index] = item
+        else:
+            block = self._blocks[index]
+            insort(block, item)
+
+        if len(block) > MAX_BLOCK_SIZE:
+            half = len(block) // 2
+            self._blocks[index:index + 1] = [block[:half], block[half:]]
+            self._maxes[index:index + 1] = [block[half - 1], block[-1]]
+
+    def remove(self, item):
+        "Remove an item, which must be in the list."
+        index = bisect_left(self._maxes, item)
+        block = self._blocks[index] if index < len(self._blocks) else []
+        position = bisect_left(block, item)
+        if position == len(block) or block[position] != item:
+            raise ValueError('%r is not in the list' % (item,))
+
+        del block[position]
+        self._len -= 1
+        if not block:
+            del self._blocks[index]
+            del self._maxes[index]
+        elif position == len(block):
+            self._maxes[index] = block[-1]
+
+    def head(self, count):
+        "Return the first count items."
+        return list(islice(self, count))
+
+
+class Ranking(object):
+    "Files in order of a key, updated one file at a time."
+    def __init__(self, key):
+        self.key = key
+
+        # The sorted (key..., filename) entries, and the key of each file.
+        self._entries = SortedList()
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, filename, numbers):
+        """Record the coverage numbers of a file.
+
+        If numbers is None (or the file has no statements), the file is
+        removed from the ranking.
+        """
+        if numbers is not None and numbers.n_statements:
+            key = self.key(numbers)
+        else:
+            key = None
+
+        old = self._keys.get(filename)
+        if key == old:
+            return
+
+        if old is not None:
+            self._entries.remove(old + (filename,))
+            del self._keys[filename]
+        if key is not None:
+            self._entries.add(key + (filename,))
+            self._keys[filename] = key
+
+    def top(self, count):
+        "Return the filenames of the first count files in the ranking."
+        return [entry[-1] for entry in self._entries.head(count)]
@@ -0,0 +1,257 @@
+'''
+A headless coverage report, for use where there is no display (e.g., CI).
+
+The report uses the same loading and analysis pipeline as the GUI, and
+writes the result for each file as soon as it has been analyzed, so the
+report starts immediately and doesn't grow in memory with the size of
+the project.
+'''
+import json
+import os
+import sys
+from argparse import ArgumentParser
+
+from duvet import timing
+from duvet.analysis import branch_coverage_str, coverage_bucket, coverage_str, filename_normalizer, line_ranges
+from duvet.diff import result_bucket
+from duvet.gitdiff import changed_coverage
+from duvet.loader import load_coverage
+
+
+# The exit status when total coverage is below the requested threshold.
+FAIL_UNDER_STATUS = 2
+
+
+class Reporter(object):
+    """The base class for reporters.
+
+    In diff mode, `diff()` is called before `start()`; the reporter
+    then keeps a count of the changed statements, and of the changed
+    statements that aren't covered.
+    """
+    def __init__(self, output, normalizer):
+        self.output = output
+        self.normalizer = normalizer
+        self.changed = None
+        self.n_changed = 0
+        self.n_new_missing = 0
+
+    def diff(self, changed):
+        self.changed = changed
+
+    def _changed_coverage(self, result):
+        "Return the changed statements and new uncovered lines of a result, and count them."
+        statements, new_missing = changed_coverage(result, self.changed)
+        self.n_changed += len(statements)
+        self.n_new_missing += len(new_missing)
+        return statements, new_missing
+
+    @property
+    def changed_pc_covered(self):
+        "The percentage of changed statements that are covered."
+        if not self.n_changed:
+            return 100.0
+        return 100.0 * (self.n_changed - self.n_new_missing) / self.n_changed
+
+
+class TableReporter(Reporter):
+    "Writes results as a compact text table."
+    def start(self, n_files):
+        if self.changed is None:
+            header = '%-60s %7s %7s %7s  %s' % ('Name', 'Stmts', 'Miss', 'Cover', 'Status')
+        else:
+            header = '%-60s %7s %7s %7s  %-8s %7s' % ('Name', 'Stmts', 'Miss', 'Cover', 'Status', 'NewMiss')
+        self.separator = '-' * len(header)
+        self.output.write(header + '\n')
+        self.output.write(self.separator + '\n')
+
+    def file(self, result):
+        name = self.normalizer(result.filename)
+        if result.numbers is None:
+            self.output.write('%-60s %7s %7s %7s  %s\n' % (name, '', '', '', 'nosource'))
+        else:
+            line = '%-60s %7d %7d %6s%%  %s' % (
+                name,
+                result.numbers.n_statements,
+                result.numbers.n_missing,
+                coverage_str(result.numbers),
+                result_bucket(result),
+            )
+            if self.changed is not None:
+                _, new_missing = self._changed_coverage(result)
+                line = '%-94s %7d' % (line, len(new_missing))
+            self.output.write(line + '\n')
+        self.output.flush()
+
+    def done(self, totals):
+        self.output.write(self.separator + '\n')
+        self.output.write('%-60s %7d %7d %6s%%  %s\n' % (
+            'TOTAL (%s files)' % totals.n_files,
+            totals.n_statements,
+            totals.n_missing,
+            coverage_str(totals),
+            coverage_bucket(totals.pc_covered),
+        ))
+        if self.changed is not None:
+            self.output.write('Changed statements: %d, not covered: %d (%.1f%% covered)\n' % (
+                self.n_changed,
+                self.n_new_missing,
+                self.changed_pc_covered,
+            ))
+
+
+class JSONReporter(Reporter):
+    "Writes results as JSON, one object per line."
+
+    def _write(self, data):
+        self.output.write(json.dumps(data, sort_keys=True) + '\n')
+        self.output.flush()
+
+    def start(self, n_files):
+        self._write({'files': n_files})
+
+    def file(self, result):
+        data = {
+            'file': self.normalizer(result.filename),
+            'bucket': result_bucket(result),
+        }
+        if result.numbers is not None:
+            data.update({
+                'statements': result.numbers.n_statements,
+                'missing': result.numbers.n_missing,
+                'excluded': result.numbers.n_excluded,
+                'coverage': round(result.numbers.pc_covered, 1),
+                'missing_lines': line_ranges(result.missing),
+                'partial_lines': line_ranges(result.partial),
+            })
+            if result.numbers.n_branches:
+                data.update({
+                    'branches': result.numbers.n_branches,
+                    'missing_branches': result.numbers.n_missing_branches,
+                    'branch_coverage': float(branch_coverage_str(result.numbers)),
+                })
+            if self.changed is not None:
+                statements, new_missing = self._changed_coverage(result)
+                data.update({
+                    'changed_statements': len(statements),
+                    'new_missing_lines': line_ranges(new_missing),
+                })
+        self._write(data)
+
+    def done(self, totals):
+        data = {
+            'total': {
+                'files': totals.n_files,
+                'statements': totals.n_statements,
+                'missing': totals.n_missing,
+                'coverage': round(totals.pc_covered, 1),
+                'bucket': coverage_bucket(totals.pc_covered),
+            }
+        }
+        if self.changed is not None:
+            data['changed'] = {
+                'statements': self.n_changed,
+                'missing': self.n_new_missing,
+                'coverage': round(self.changed_pc_covered, 1),
+            }
+        self._write(data)
+
+
+REPORTERS = {
+    'table': TableReporter,
+    'json': JSONReporter,
+}
+
+
+def main(argv=None, output=sys.stdout):
+    parser = ArgumentParser(
+        prog='duvet report',
+        description='Report coverage data without a GUI.',
+    )
+    parser.add_argument(
+        '-p', '--path',
+        metavar='application_path/',
+        help='The PATH that file names should be reported relative to'
+    )
+    parser.add_argument(
+        '-f', '--format',
+        choices=sorted(REPORTERS),
+        default='table',
+        help='The format for the report (default: table)'
+    )
+    parser.add_argument(
+        '--diff',
+        metavar='BASE',
+        dest='diff_base',
+        help='Only report files that have changed against the git revision BASE (e.g., main)'
+    )
+    parser.add_argument(
+        '--fail-under',
+        metavar='PERCENT',
+        type=float,
+        help='Exit with status %s if total coverage is below PERCENT' % FAIL_UNDER_STATUS
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        metavar='N',
+        type=int,
+        default=1,
+        help='The number of processes to use when analyzing files (0 to use one per CPU)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Don't cache analysis results between loads"
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write a trace of where time was spent to FILE (in Chrome trace format)'
+    )
+
+    options = parser.parse_args(argv)
+
+    if options.path:
+        base_path = os.path.abspath(options.path)
+    else:
+        base_path = os.path.abspath(os.getcwd())
+    reporter = REPORTERS[options.format](output, filename_normalizer(os.path.normcase(base_path)))
+
+    if options.profile:
+        timing.enable(trace=True)
+    try:
+        return _report(reporter, options)
+    finally:
+        if options.profile:
+            timing.timer().write_trace(options.profile)
+            timing.disable()
+
+
+def _report(reporter, options):
+    "Write the report, returning the exit status."
+    messages = load_coverage(
+        jobs=options.jobs,
+        use_cache=not options.no_cache,
+        diff_base=options.diff_base,
+        root=options.path
+    )
+    for message in messages:
+        if message[0] == 'nodata':
+            sys.stderr.write("Couldn't find coverage data file.\n")
+            return 1
+        elif message[0] == 'error':
+            sys.stderr.write("Couldn't load coverage data -- data file may be corrupted (Error was: %s)\n" % message[1])
+            return 1
+        elif message[0] == 'done':
+            totals = message[1]
+            reporter.done(totals)
+            if options.fail_under is not None and totals.pc_covered < options.fail_under:
+                return FAIL_UNDER_STATUS
+        else:
+            getattr(reporter, message[0])(*message[1:])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
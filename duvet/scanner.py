@@ -0,0 +1,319 @@
+"""Scanning of the project directory.
+
+The scanner lists directories with `scandir`, so the type of each entry
+is known without an extra stat call. Directories and files are filtered
+with ignore rules: a default set of patterns (version control metadata,
+build artefacts, virtualenvs and the like), any patterns provided by
+the user, and the content of any .gitignore files in the project.
+
+When the whole project needs to be scanned, sibling directories are
+scanned in parallel; on slow (e.g., network mounted) filesystems, most
+of the time spent scanning is waiting for I/O.
+"""
+import os
+import re
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+# Directories and files that are never displayed. Hidden files and
+# directories (including .git, .hg, .tox and .venv) are excluded, as
+# are build artefacts, node packages and virtualenvs.
+DEFAULT_IGNORE = [
+    '.*',
+    '_build/',
+    '__pycache__/',
+    'node_modules/',
+    '*.egg-info/',
+    'venv/',
+]
+
+# The number of threads to use when scanning the whole project.
+DEFAULT_SCAN_THREADS = 8
+
+# The file that marks a directory as a virtual environment.
+VENV_MARKER = 'pyvenv.cfg'
+
+
+def translate(pattern):
+    """Translate a glob pattern into a regular expression.
+
+    This follows the rules of .gitignore files: `*` and `?` don't match
+    a `/`, but `**` matches any number of directories.
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            regex.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            regex.append('.*')
+            i += 2
+        elif c == '*':
+            regex.append('[^/]*')
+            i += 1
+        elif c == '?':
+            regex.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex.append(re.escape(c))
+                i += 1
+            else:
+                group = pattern[i + 1:end]
+                if group.startswith('!'):
+                    group = '^' + group[1:]
+                regex.append('[%s]' % group.replace('\\', '\\\\'))
+                i = end + 1
+        else:
+            regex.append(re.escape(c))
+            i += 1
+    return ''.join(regex) + '$'
+
+
+class IgnoreRule(object):
+    """A single ignore pattern.
+
+    base is the directory that the pattern is relative to. Patterns
+    without a `/` match a name at any depth; patterns containing a `/`
+    match the path relative to the base directory. Patterns ending
+    with `/` only match directories, and patterns starting with `!`
+    re-include anything matched by an earlier pattern.
+    """
+    def __init__(self, pattern, base):
+        self.base = base
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+
+        self.directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+
+        self.anchored = '/' in pattern
+        self.regex = re.compile(translate(pattern.lstrip('/')))
+
+    def matches(self, path, name, is_dir):
+        "Does this rule match the entry at path (with basename name)?"
+        if self.directory_only and not is_dir:
+            return False
+        if self.anchored:
+            if not path.startswith(self.base + os.sep):
+                return False
+            relpath = path[len(self.base) + 1:].replace(os.sep, '/')
+            return self.regex.match(relpath) is not None
+        return self.regex.match(name) is not None
+
+
+def parse_ignore_file(filename, base):
+    "Read a .gitignore file, returning a list of IgnoreRules."
+    rules = []
+    try:
+        with open(filename) as f:
+            for line in f:
+                line = line.rstrip()
+                if line and not line.startswith('#'):
+                    rules.append(IgnoreRule(line, base))
+    except (IOError, OSError):
+        pass
+    return rules
+
+
+def _is_venv(dirname):
+    "Is a directory a virtual environment?"
+    return os.path.isfile(os.path.join(dirname, VENV_MARKER))
+
+
+def _list_dir(dirname):
+    """List a directory, returning (name, is_dir, is_symlink) tuples.
+
+    Where scandir is available, the type of each entry comes from the
+    directory listing itself.
+    """
+    if scandir is not None:
+        entries = []
+        it = scandir(dirname)
+        try:
+            for entry in it:
+                try:
+                    entries.append((entry.name, entry.is_dir(), entry.is_symlink()))
+                except OSError:
+                    pass
+        finally:
+            # scandir iterators are only context managers on Python 3.6+
+            if hasattr(it, 'close'):
+                it.close()
+        return entries
+
+    return [
+        (name, os.path.isdir(os.path.join(dirname, name)), os.path.islink(os.path.join(dirname, name)))
+        for name in os.listdir(dirname)
+    ]
+
+
+class ProjectScanner(object):
+    """Lists the displayable content of the directories in a project.
+
+    ignore is a list of extra glob patterns (relative to the project
+    root) to exclude. If gitignore is True, .gitignore files in the
+    project will also be honored.
+    """
+    def __init__(self, root, ignore=None, gitignore=True, extensions=('.py',), threads=DEFAULT_SCAN_THREADS):
+        self.root = root
+        self.gitignore = gitignore
+        self.extensions = tuple(extensions)
+        self.threads = threads
+
+        self._base_rules = [
+            IgnoreRule(pattern, root)
+            for pattern in DEFAULT_IGNORE + list(ignore or [])
+        ]
+        # The ignore rules that apply in each directory that has been scanned.
+        self._rules = {}
+
+    def _rules_for(self, dirname, names=None):
+        """Return the ignore rules that apply to the content of a directory.
+
+        names is the list of names in the directory, if it is known.
+        """
+        try:
+            return self._rules[dirname]
+        except KeyError:
+            pass
+
+        if dirname == self.root or not dirname.startswith(self.root + os.sep):
+            rules = self._base_rules
+        else:
+            rules = self._rules_for(os.path.dirname(dirname))
+
+        if self.gitignore:
+            gitignore = os.path.join(dirname, '.gitignore')
+            if names is not None:
+                has_gitignore = '.gitignore' in names
+            else:
+                has_gitignore = os.path.isfile(gitignore)
+
+            if has_gitignore:
+                rules = rules + parse_ignore_file(gitignore, dirname)
+
+        self._rules[dirname] = rules
+        return rules
+
+    def is_ignored(self, path, is_dir):
+        "Is the file or directory at path excluded from the project?"
+        if is_dir and _is_venv(path):
+            return True
+        return self._is_ignored(self._rules_for(os.path.dirname(path)), path, is_dir)
+
+    def _is_ignored(self, rules, path, is_dir):
+        """Is a file or directory excluded by the ignore rules?
+
+        Virtual environments aren't checked here; see `_scan`.
+        """
+        name = os.path.basename(path)
+        ignored = False
+        # The last matching rule wins.
+        for rule in rules:
+            if rule.negated == ignored and rule.matches(path, name, is_dir):
+                ignored = not rule.negated
+        return ignored
+
+    def _scan(self, dirname):
+        """Scan a directory, returning (subdirs, filenames, symlinked subdirs).
+
+        If the directory is a virtual environment (which can have any
+        name), it has no content. Checking the directory's own listing
+        for pyvenv.cfg means that a scan of the whole project doesn't
+        need an extra stat for every directory.
+        """
+        try:
+            entries = _list_dir(dirname)
+        except OSError:
+            return [], [], set()
+
+        names = set(name for name, _, _ in entries)
+        if dirname != self.root and VENV_MARKER in names:
+            return None, [], set()
+
+        rules = self._rules_for(dirname, names)
+        subdirs = []
+        filenames = []
+        links = set()
+        for name, is_dir, is_link in entries:
+            if is_dir:
+                if not self._is_ignored(rules, os.path.join(dirname, name), True):
+                    subdirs.append(name)
+                    if is_link:
+                        links.add(name)
+            elif os.path.splitext(name)[1] in self.extensions:
+                if not self._is_ignored(rules, os.path.join(dirname, name), False):
+                    filenames.append(name)
+
+        return subdirs, filenames, links
+
+    def scan(self, dirname):
+        "Scan a single directory, returning (subdirs, filenames)."
+        subdirs, filenames, _ = self._scan(dirname)
+        if subdirs is None:
+            return [], []
+        # The subdirectories will be displayed before they are scanned,
+        # so virtual environments must be excluded now.
+        return [
+            subdir for subdir in subdirs
+            if not _is_venv(os.path.join(dirname, subdir))
+        ], filenames
+
+    def walk(self):
+        """Scan every directory in the project.
+
+        Yields (dirname, subdirs, filenames) for each directory, in
+        the order the scans complete. Symlinked directories are listed,
+        but not descended into. Virtual environments are found when they
+        are scanned, so they may be listed in subdirs, but they are not
+        yielded themselves.
+        """
+        if ThreadPoolExecutor is None or self.threads <= 1:
+            pending = [self.root]
+            while pending:
+                dirname = pending.pop()
+                subdirs, filenames, links = self._scan(dirname)
+                if subdirs is None:
+                    continue
+                pending.extend(
+                    os.path.join(dirname, subdir)
+                    for subdir in subdirs
+                    if subdir not in links
+                )
+                yield dirname, subdirs, filenames
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            pending = {executor.submit(self._scan, self.root): self.root}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dirname = pending.pop(future)
+                    subdirs, filenames, links = future.result()
+                    if subdirs is None:
+                        continue
+                    for subdir in subdirs:
+                        if subdir not in links:
+                            path = os.path.join(dirname, subdir)
+                            pending[executor.submit(self._scan, path)] = path
+                    yield dirname, subdirs, filenames
+        finally:
+            executor.shutdown(wait=False)
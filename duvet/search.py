@@ -0,0 +1,134 @@
+"""Searching the paths displayed in the file trees.
+
+Paths are indexed as they are added to a tree. Each path is recorded in
+a trigram index: for every three character sequence, the list of paths
+that contain it. A substring search only needs to check the paths that
+contain the query's rarest trigram, rather than every path.
+
+If no path contains the query as a substring, paths are matched fuzzily:
+a path matches if it contains the characters of the query in order. A
+bitmask of the characters in each path is used to rule out most paths
+before they are checked.
+
+While a query is being typed, each query usually extends the last one;
+in that case, only the paths that matched the last query need to be
+checked again.
+"""
+import re
+from array import array
+
+
+def char_mask(text):
+    "Return a bitmask of the characters in text (with some collisions)."
+    mask = 0
+    for c in set(text):
+        mask |= 1 << (ord(c) & 31)
+    return mask
+
+
+class PathIndex(object):
+    """An index of paths for substring and fuzzy searches.
+
+    Each path is identified by a key (e.g., a tree node); searches return
+    the keys of the matching paths. Searches are case insensitive.
+    """
+    def __init__(self):
+        # The (lower case) paths, their keys and character masks, by id.
+        self.paths = []
+        self.keys = []
+        # (Masks are 32 bits, so they fit an 'L' on every platform;
+        # Python 2 has no 'Q' arrays.)
+        self.masks = array('L')
+        self.ids = {}
+
+        # For each trigram, the ids of the paths that contain it.
+        self.trigrams = {}
+
+        # The last query, and the ids it matched as substrings and
+        # (if it was needed) fuzzily.
+        self._last = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    def add(self, key, path):
+        "Add a path to the index."
+        if key in self.ids:
+            return
+
+        path_id = len(self.paths)
+        text = path.lower()
+        self.ids[key] = path_id
+        self.keys.append(key)
+        self.paths.append(text)
+        self.masks.append(char_mask(text))
+
+        for trigram in set(text[i:i + 3] for i in range(len(text) - 2)):
+            try:
+                self.trigrams[trigram].append(path_id)
+            except KeyError:
+                self.trigrams[trigram] = array('I', [path_id])
+
+        # Results for earlier queries don't include this path.
+        self._last = None
+
+    def search(self, query):
+        """Return the keys of the paths that match a query.
+
+        If any paths contain the query, those paths are returned;
+        otherwise, the paths that match the query fuzzily are returned.
+        """
+        query = query.lower()
+
+        # If the query extends the last query, only the paths that
+        # matched the last query can match this one.
+        last_substring = last_fuzzy = None
+        if self._last is not None and query.startswith(self._last[0]):
+            _, last_substring, last_fuzzy = self._last
+
+        matches = self._substring_matches(query, last_substring)
+        fuzzy = None
+        if not matches:
+            fuzzy = self._fuzzy_matches(query, last_fuzzy)
+        self._last = (query, matches, fuzzy)
+
+        keys = self.keys
+        return [keys[path_id] for path_id in (matches or fuzzy)]
+
+    def _substring_matches(self, query, candidates):
+        "Return the ids of the paths that contain query."
+        if candidates is None:
+            if len(query) >= 3:
+                for trigram in set(query[i:i + 3] for i in range(len(query) - 2)):
+                    postings = self.trigrams.get(trigram)
+                    if postings is None:
+                        return []
+                    if candidates is None or len(postings) < len(candidates):
+                        candidates = postings
+            else:
+                candidates = range(len(self.paths))
+
+        paths = self.paths
+        return [path_id for path_id in candidates if query in paths[path_id]]
+
+    def _fuzzy_matches(self, query, candidates):
+        "Return the ids of the paths that contain the characters of query, in order."
+        if candidates is None:
+            candidates = range(len(self.paths))
+
+        # Each character must be followed by the next; e.g., "abc" is
+        # matched by "a[^b]*b[^c]*c", which can't backtrack.
+        mask = char_mask(query)
+        regex = re.compile(''.join(
+            '%s[^%s]*' % (re.escape(c), re.escape(n))
+            for c, n in zip(query, query[1:])
+        ) + re.escape(query[-1:]))
+        paths = self.paths
+        masks = self.masks
+        return [
+            path_id for path_id in candidates
+            if masks[path_id] & mask == mask and regex.search(paths[path_id])
+        ]
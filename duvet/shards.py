@@ -0,0 +1,212 @@
+"""Reading of parallel coverage data files.
+
+When coverage is run in parallel mode (e.g., by pytest-xdist), each
+process writes its own data file, named after the main data file (e.g.,
+`.coverage.myhost.1234.567890`). Rather than requiring those files to be
+combined (which deletes them) before they can be displayed, the main
+data file and every parallel data file are read, and their measured
+lines are merged in memory.
+
+The files are read concurrently. The data read from each file is kept,
+so on later loads, only files that are new or have changed need to be
+read again; if no file has changed or been removed, the new files are
+merged into the existing data, rather than merging everything again.
+
+If the only data file is a SQLite database (as written by coverage 5+),
+it isn't read or merged at all: a `SqliteData` is used to query it as
+each file is analyzed.
+"""
+import os
+import threading
+
+from duvet.sqldata import SqliteData, is_sqlite
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+# The largest number of threads to use when reading data files.
+MAX_READ_THREADS = 8
+
+
+def find_data_files(data_file):
+    "Find the main data file, and any parallel data files alongside it."
+    dirname, basename = os.path.split(data_file)
+    try:
+        names = os.listdir(dirname)
+    except OSError:
+        return []
+
+    return sorted(
+        os.path.join(dirname, name)
+        for name in names
+        if (name == basename or name.startswith(basename + '.'))
+        and os.path.isfile(os.path.join(dirname, name))
+    )
+
+
+def read_data_file(path):
+    "Read a single coverage data file."
+    import coverage
+
+    try:
+        # coverage 5+
+        data = coverage.CoverageData(basename=path)
+        data.read()
+    except TypeError:
+        data = coverage.CoverageData()
+        data.read_file(path)
+    return data
+
+
+def new_data():
+    "Construct an empty, in-memory CoverageData."
+    import coverage
+
+    try:
+        # coverage 5+ (an in-memory database)
+        return coverage.CoverageData(no_disk=True)
+    except TypeError:
+        return coverage.CoverageData()
+
+
+def use_data(cov, data):
+    "Make a coverage instance use data, rather than reading its data file."
+    cov._init()
+    cov.data = data
+    # coverage 5+ analyzes files using the data in cov._data.
+    cov._data = data
+
+
+def merge_data(merged, data, aliases=None):
+    """Merge the measured lines (or arcs) and file tracers of data into merged.
+
+    `CoverageData.update()` isn't used, as in coverage 5 it discards the
+    content of an in-memory CoverageData (see `new_data`).
+    """
+    has_arcs = data.has_arcs()
+    measured = {}
+    tracers = {}
+    for filename in data.measured_files():
+        lines = data.arcs(filename) if has_arcs else data.lines(filename)
+        tracer = data.file_tracer(filename)
+        if aliases is not None:
+            filename = aliases.map(filename)
+        measured.setdefault(filename, {}).update(dict.fromkeys(lines or ()))
+        if tracer:
+            tracers[filename] = tracer
+
+    if not measured:
+        return
+    if has_arcs:
+        merged.add_arcs(measured)
+    else:
+        merged.add_lines(measured)
+    merged.add_file_tracers(tracers)
+
+
+def path_aliases(config):
+    """Construct the path aliases defined by the [paths] coverage setting.
+
+    Returns None if there are no aliases.
+    """
+    if not config.paths:
+        return None
+
+    from coverage.files import PathAliases
+    aliases = PathAliases()
+    for paths in config.paths.values():
+        result = paths[0]
+        for pattern in paths[1:]:
+            aliases.add(pattern, result)
+    return aliases
+
+
+class ShardedData(object):
+    """The merged content of a main data file and its parallel data files.
+
+    A single instance should be used for successive loads of the same
+    project, so that the data read from each file can be reused.
+    """
+    def __init__(self, threads=MAX_READ_THREADS):
+        self.threads = threads
+
+        # By path, the (mtime, size) of each data file that has been
+        # read, and the data that was read from it.
+        self.files = {}
+        self.merged = None
+        self._lock = threading.Lock()
+
+    def _read(self, paths):
+        "Read data files, returning (path, stat, data) for each file that can be read."
+        def read(path):
+            try:
+                stat = os.stat(path)
+                return path, (stat.st_mtime, stat.st_size), read_data_file(path)
+            except Exception:
+                # The file may still be being written by a test process;
+                # skip it for now. It will be read again on the next load.
+                return path, None, None
+
+        if ThreadPoolExecutor is None or self.threads <= 1 or len(paths) <= 1:
+            results = [read(path) for path in paths]
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(self.threads, len(paths)))
+            try:
+                results = list(executor.map(read, paths))
+            finally:
+                executor.shutdown()
+
+        return [result for result in results if result[2] is not None]
+
+    def load(self, cov):
+        """Load the data for a coverage instance.
+
+        On return, cov.data holds the merged content of every data file.
+        """
+        data_file = os.path.abspath(cov.config.data_file)
+        aliases = path_aliases(cov.config)
+
+        with self._lock:
+            paths = find_data_files(data_file)
+
+            # A single SQLite database can be queried on demand.
+            if paths == [data_file] and is_sqlite(data_file):
+                self.files = {}
+                self.merged = None
+                use_data(cov, SqliteData(data_file, aliases=aliases))
+                return
+
+            changed = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                known = self.files.get(path)
+                if known is None or known[0] != (stat.st_mtime, stat.st_size):
+                    changed.append(path)
+
+            removed = set(self.files) - set(paths)
+            modified = [path for path in changed if path in self.files]
+            for path in removed:
+                del self.files[path]
+
+            new_files = self._read(changed)
+            for path, stat, data in new_files:
+                self.files[path] = (stat, data)
+
+            if self.merged is None or removed or modified:
+                # Merge everything again.
+                self.merged = new_data()
+                to_merge = [self.files[path][1] for path in sorted(self.files)]
+            else:
+                # Only merge the files that are new.
+                to_merge = [data for _, _, data in new_files]
+
+            for data in to_merge:
+                merge_data(self.merged, data, aliases)
+
+            use_data(cov, self.merged)
@@ -0,0 +1,246 @@
+"""Loading and tokenizing source files for display.
+
+Displaying a file means reading it, and tokenizing it to find the
+ranges of text to color. Rather than doing that every time a file is
+selected, the result is kept in an LRU cache with a size budget; an
+entry is reused as long as the file's mtime and size are unchanged.
+
+The tokens of a file are stored compactly, in chunks of lines: for each
+token type, a flat list of the start and end indices (in Tk "line.column"
+form) of every range of that type starting in the chunk, with adjacent
+ranges merged. A chunk can be colored with one Tk call per token type,
+and the chunks that are visible can be colored first.
+
+Files are tokenized on a worker thread. The file to be displayed is
+loaded first; after that, the files next to it can be loaded, so moving
+to a neighbouring file is instant.
+"""
+import os
+import sys
+import threading
+from collections import namedtuple, OrderedDict
+
+from pygments import lex
+from pygments.lexers import TextLexer, guess_lexer_for_filename
+from pygments.util import ClassNotFound
+
+
+# The default size budget (in bytes) for cached sources.
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# The approximate cost (in bytes) of each stored index.
+INDEX_SIZE = 60
+
+# The number of lines in each chunk of tokens.
+CHUNK_LINES = 200
+
+
+# A loaded source file.
+#   filename - the path of the file
+#   stamp - the (mtime, size) of the file when it was loaded
+#   text - the content of the file
+#   chunks - for each chunk of lines, a dictionary mapping the tag for
+#       each token type to the start and end index of each range
+#   size - the approximate memory used by the entry
+Source = namedtuple('Source', ['filename', 'stamp', 'text', 'chunks', 'size'])
+
+
+def file_stamp(filename):
+    "Return the (mtime, size) of a file; if either changes, the file has changed."
+    stat = os.stat(filename)
+    return (stat.st_mtime, stat.st_size)
+
+
+def read_text(filename):
+    "Read a source file, returning its (mtime, size) stamp and its content."
+    stamp = file_stamp(filename)
+    with open(filename) as f:
+        return stamp, f.read()
+
+
+def tokenize(text, lexer):
+    """Tokenize text, returning the ranges of each token type.
+
+    The result is a list with a dictionary for each chunk of
+    `CHUNK_LINES` lines, mapping the Tk tag for each token type to a
+    list of alternating start and end indices of the ranges that start
+    in that chunk.
+    """
+    chunks = []
+    line, column = 1, 0
+    for token, content in lex(text, lexer):
+        if not content:
+            continue
+
+        chunk = (line - 1) // CHUNK_LINES
+        if chunk >= len(chunks):
+            chunks.extend({} for _ in range(chunk + 1 - len(chunks)))
+            tags = chunks[chunk]
+            # The end of the last range of each tag in the chunk, so
+            # adjacent ranges of the same type can be merged.
+            ends = {}
+
+        start = '%d.%d' % (line, column)
+        newlines = content.count('\n')
+        if newlines:
+            line += newlines
+            column = len(content) - content.rfind('\n') - 1
+        else:
+            column += len(content)
+        end = '%d.%d' % (line, column)
+
+        tag = str(token)
+        indices = tags.get(tag)
+        if indices is None:
+            tags[tag] = [start, end]
+        elif ends[tag] == start:
+            indices[-1] = end
+        else:
+            indices.append(start)
+            indices.append(end)
+        ends[tag] = end
+    return chunks
+
+
+def load_source(filename, lexer=None):
+    "Read and tokenize a source file, returning a `Source`."
+    stamp, text = read_text(filename)
+    if lexer is None:
+        try:
+            lexer = guess_lexer_for_filename(filename, text, stripnl=False)
+        except ClassNotFound:
+            lexer = TextLexer(stripnl=False)
+    chunks = tokenize(text, lexer)
+
+    size = sys.getsizeof(text) + INDEX_SIZE * sum(
+        len(indices) for tags in chunks for indices in tags.values()
+    )
+    return Source(filename, stamp, text, chunks, size)
+
+
+class SourceCache(object):
+    """An LRU cache of loaded source files.
+
+    Entries are discarded, least recently used first, when the total
+    size of the cache is over max_bytes. The cache can be used from
+    several threads.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # The file (and lexer) waiting to be displayed, the files waiting
+        # to be prefetched, the file being loaded, and the worker thread.
+        self._requested = None
+        self._wanted = []
+        self._loading = None
+        self._worker = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filename):
+        return filename in self._entries
+
+    def cached(self, filename):
+        "Return the `Source` for a file if it is cached (and unchanged), or None."
+        try:
+            stamp = file_stamp(filename)
+        except OSError:
+            stamp = None
+
+        with self._lock:
+            source = self._entries.get(filename)
+            if source is not None:
+                if source.stamp == stamp:
+                    # Mark this as the most recently used entry.
+                    del self._entries[filename]
+                    self._entries[filename] = source
+                    return source
+                self._discard(filename)
+        return None
+
+    def get(self, filename, lexer=None):
+        "Return the `Source` for a file, loading it if it isn't cached (or has changed)."
+        source = self.cached(filename)
+        if source is None:
+            source = load_source(filename, lexer)
+            self._put(source)
+        return source
+
+    def _put(self, source):
+        "Add a source to the cache, discarding old entries to stay within budget."
+        if source.size > self.max_bytes:
+            return
+
+        with self._lock:
+            if source.filename in self._entries:
+                self._discard(source.filename)
+            self._entries[source.filename] = source
+            self.size += source.size
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, filename):
+        "Remove an entry; the lock must be held."
+        self.size -= self._entries.pop(filename).size
+
+    def request(self, filename, lexer=None):
+        """Load a file that is about to be displayed, in the background.
+
+        The file is loaded before any prefetched files; any file still
+        waiting from an earlier request is abandoned. Use `cached()` to
+        find out when it is ready.
+        """
+        with self._lock:
+            self._requested = (filename, lexer)
+            self._start_worker()
+
+    def prefetch(self, filenames):
+        """Load files into the cache in the background.
+
+        Any files still waiting from an earlier call are abandoned.
+        """
+        with self._lock:
+            self._wanted = list(filenames)
+            self._start_worker()
+
+    def pending(self, filename):
+        "Is a file waiting to be loaded (or being loaded) in the background?"
+        with self._lock:
+            return (
+                filename == self._loading
+                or (self._requested is not None and filename == self._requested[0])
+                or filename in self._wanted
+            )
+
+    def _start_worker(self):
+        "Start the worker thread, if it isn't running; the lock must be held."
+        if self._worker is None and (self._requested or self._wanted):
+            self._worker = threading.Thread(target=self._work)
+            self._worker.daemon = True
+            self._worker.start()
+
+    def _work(self):
+        "Load the requested and wanted files, until there are none left."
+        while True:
+            with self._lock:
+                if self._requested is not None:
+                    filename, lexer = self._requested
+                    self._requested = None
+                elif self._wanted:
+                    filename, lexer = self._wanted.pop(0), None
+                else:
+                    self._loading = None
+                    self._worker = None
+                    return
+                self._loading = filename
+
+            try:
+                self.get(filename, lexer)
+            except Exception:
+                # The file can't be loaded; it will be displayed
+                # without coloring.
+                pass
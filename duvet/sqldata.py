@@ -0,0 +1,145 @@
+"""Reading coverage data on demand from a coverage SQLite database.
+
+coverage 5+ stores its data in a SQLite database. Loading that data
+through coverage (or merging it with other data files) reads every line
+of every file into memory before any file can be analyzed; for the data
+file from a long integration run, that can take a long time.
+
+A `SqliteData` opens the database read-only, and only reads the list of
+measured files up front. The lines (or arcs) of a file are queried when
+that file is analyzed, using the database's indexes; they aren't kept,
+so memory use doesn't grow with the size of the data file.
+"""
+import os
+import sqlite3
+import threading
+
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+
+# The first bytes of every SQLite database.
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def is_sqlite(path):
+    "Is the file at path a SQLite database?"
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except (IOError, OSError):
+        return False
+
+
+def numbits_to_lines(numbits):
+    """Decode a coverage "numbits" blob into a list of line numbers.
+
+    Bit n of the blob (counting from the low bit of the first byte) is
+    set if line n was executed.
+    """
+    lines = []
+    for index, byte in enumerate(bytearray(numbits)):
+        if byte:
+            for bit in range(8):
+                if byte & (1 << bit):
+                    lines.append(index * 8 + bit)
+    return lines
+
+
+class SqliteData(object):
+    """Coverage data read on demand from a coverage SQLite database.
+
+    Provides the parts of the `CoverageData` API that are needed to
+    analyze files. aliases is an optional coverage `PathAliases`, used
+    to remap the measured paths.
+    """
+    def __init__(self, path, aliases=None):
+        self.path = path
+        try:
+            self._db = sqlite3.connect(
+                'file:%s?mode=ro' % pathname2url(os.path.abspath(path)),
+                uri=True,
+                check_same_thread=False,
+            )
+        except TypeError:
+            # Python 2 can't open a database read-only.
+            self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        row = self._query_one("SELECT value FROM meta WHERE key = 'has_arcs'")
+        self._has_arcs = bool(row and int(row[0]))
+
+        # The file IDs for each (remapped) path; if aliases map several
+        # paths onto one, that path has several IDs.
+        self._file_ids = {}
+        for file_id, filename in self._query('SELECT id, path FROM file'):
+            if aliases is not None:
+                filename = aliases.map(filename)
+            self._file_ids.setdefault(filename, []).append(file_id)
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def _query_one(self, sql, parameters=()):
+        rows = self._query(sql, parameters)
+        return rows[0] if rows else None
+
+    def _query_file(self, sql, filename):
+        """Run a query for the rows about a file.
+
+        sql must contain a single %s, which is replaced with the
+        placeholders for the file's IDs. Returns None if the file
+        wasn't measured.
+        """
+        file_ids = self._file_ids.get(filename)
+        if file_ids is None:
+            return None
+        return self._query(sql % ', '.join('?' * len(file_ids)), file_ids)
+
+    def close(self):
+        self._db.close()
+
+    def measured_files(self):
+        return list(self._file_ids)
+
+    def has_arcs(self):
+        return self._has_arcs
+
+    def lines(self, filename):
+        "Return the lines executed in a file, or None if it wasn't measured."
+        if self._has_arcs:
+            arcs = self.arcs(filename)
+            if arcs is None:
+                return None
+            return sorted(set(line for arc in arcs for line in arc if line > 0))
+
+        rows = self._query_file('SELECT numbits FROM line_bits WHERE file_id IN (%s)', filename)
+        if rows is None:
+            return None
+        lines = set()
+        for numbits, in rows:
+            lines.update(numbits_to_lines(numbits))
+        return sorted(lines)
+
+    def arcs(self, filename):
+        "Return the arcs executed in a file, or None if it wasn't measured."
+        if not self._has_arcs:
+            return None
+        rows = self._query_file('SELECT DISTINCT fromno, tono FROM arc WHERE file_id IN (%s)', filename)
+        if rows is None:
+            return None
+        return [tuple(row) for row in rows]
+
+    def file_tracer(self, filename):
+        """Return the name of the plugin that traced a file.
+
+        Returns '' if the file was traced by Python, or None if it
+        wasn't measured.
+        """
+        rows = self._query_file('SELECT tracer FROM tracer WHERE file_id IN (%s)', filename)
+        if rows is None:
+            return None
+        return rows[0][0] if rows else ''
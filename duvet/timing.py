@@ -0,0 +1,169 @@
+"""Timing of the phases of loading and displaying coverage.
+
+The phases of interest (loading coverage data, analysis, updating the
+file trees, displaying and highlighting source) are wrapped in spans.
+Timing is disabled by default; while it is disabled, a span is a shared
+object that does nothing, so instrumented code pays almost nothing.
+
+Once enabled, the total time spent in each phase is accumulated, so the
+breakdown of the most recent load can be displayed. If tracing is also
+enabled, every span is recorded as an event, and the events can be
+written as a Chrome trace file (which can be opened in Perfetto, or in
+chrome://tracing).
+"""
+import json
+import os
+import threading
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    # Python 2
+    from time import time as clock
+
+
+class _NullSpan(object):
+    "A span that records nothing, used while timing is disabled."
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    "A timed span of work, recorded when the span exits."
+    def __init__(self, timer, name, args):
+        self.timer = timer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, self.start, clock(), self.args)
+        return False
+
+
+class Timer(object):
+    """Accumulates the time spent in each phase.
+
+    If trace is True, every span is also recorded as a trace event.
+    """
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.origin = clock()
+        self.phases = {}
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end, args=None):
+        "Record a span of work on the current thread."
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + (end - start)
+            if self.trace:
+                thread = threading.current_thread()
+                self.threads[thread.ident] = thread.name
+                self.events.append((name, start, end, thread.ident, args))
+
+    def reset(self):
+        "Discard the accumulated phase totals (but not the trace events)."
+        with self._lock:
+            self.phases = {}
+
+    def breakdown(self):
+        "Return a list of (phase, seconds), in decreasing order of time."
+        with self._lock:
+            return sorted(self.phases.items(), key=lambda item: -item[1])
+
+    def write_trace(self, filename):
+        "Write the recorded events in the Chrome trace event format."
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': pid,
+                    'tid': tid,
+                    'args': {'name': name},
+                }
+                for tid, name in self.threads.items()
+            ]
+            for name, start, end, tid, args in self.events:
+                event = {
+                    'name': name,
+                    'cat': 'duvet',
+                    'ph': 'X',
+                    'ts': (start - self.origin) * 1e6,
+                    'dur': (end - start) * 1e6,
+                    'pid': pid,
+                    'tid': tid,
+                }
+                if args:
+                    event['args'] = args
+                events.append(event)
+
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+# The active timer, if timing is enabled.
+_timer = None
+
+
+def enable(trace=False):
+    "Enable timing (and, optionally, tracing), returning the Timer."
+    global _timer
+    _timer = Timer(trace=trace)
+    return _timer
+
+
+def disable():
+    "Disable timing."
+    global _timer
+    _timer = None
+
+
+def timer():
+    "Return the active Timer, or None if timing is disabled."
+    return _timer
+
+
+def span(name, **args):
+    """Time a phase of work, for use as a context manager.
+
+    Any keyword arguments are attached to the trace event.
+    """
+    if _timer is None:
+        return NULL_SPAN
+    return _Span(_timer, name, args)
+
+
+def timed_iter(name, iterable):
+    """Time the production of each item of an iterable.
+
+    Only the time spent producing items is timed; the time spent by
+    the consumer of the items is not.
+    """
+    if _timer is None:
+        return iterable
+    return _timed_iter(_timer, name, iterable)
+
+
+def _timed_iter(timer, name, iterable):
+    iterator = iter(iterable)
+    while True:
+        start = clock()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        timer.record(name, start, clock())
+        yield item
@@ -4,36 +4,57 @@
 This is the "View" of the MVC world.
 """
 import os
-import webbrowser
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 try:
     import tkinter as tk
-    from tkinter.ttk import Notebook, Label, PanedWindow, Sizegrip
+    from tkinter.ttk import Entry, Notebook, Label, PanedWindow, Sizegrip
     import tkinter.messagebox as tkMessageBox
 except ImportError:
     import Tkinter as tk
-    from ttk import Notebook, Label, PanedWindow, Sizegrip
+    from ttk import Entry, Notebook, Label, PanedWindow, Sizegrip
     import tkMessageBox
 
-import coverage
+from duvet import timing
+from duvet.analysis import BUCKET_COLORS, coverage_bucket, filename_normalizer
+from duvet.diff import CoverageDiff, result_bucket, result_coverage
+from duvet.gitdiff import changed_coverage
+from duvet.loader import CoverageLoader
+from duvet.scanner import ProjectScanner
+from duvet.shards import ShardedData
+from duvet.watcher import Watcher
+from duvet.widgets import CodeView, FileView, RankingView, Sparkline
 
-from duvet import VERSION, NUM_VERSION
-from duvet.widgets import nodify, CodeView, FileView
 
+# How often (in ms) to check for new results from the coverage loader.
+LOADER_POLL_INTERVAL = 50
 
-def filename_normalizer(base_path):
-    """Generate a fuction that will normalize a full path into a
-    display name, by removing a common prefix.
+# The longest time (in s) to spend applying loader results before
+# handing control back to the Tk event loop.
+LOADER_BATCH_TIME = 0.05
 
-    In most situations, this will be removing the current working
-    directory.
-    """
-    def _normalizer(filename):
-        if filename.startswith(base_path) and filename[len(base_path)] == os.sep:
-            return filename[len(base_path)+1:]
-        else:
-            return filename
-    return _normalizer
+# How often (in ms) to check whether the watcher has seen a change.
+WATCH_POLL_INTERVAL = 200
+
+# The number of files on either side of the selected file to load
+# into the source cache in the background.
+PREFETCH_NEIGHBOURS = 2
+
+# The number of recorded runs shown on the coverage trend.
+SPARKLINE_RUNS = 50
+
+
+def open_url(url):
+    "Open a URL in a web browser."
+    # webbrowser is only imported when it's needed, as it's slow to import.
+    import webbrowser
+    webbrowser.open_new(url)
 
 
 class MainWindow(object):
@@ -58,15 +79,53 @@ class MainWindow(object):
             base_path = os.path.abspath(os.getcwd())
         self.base_path = os.path.normcase(base_path)
 
+        # The number of processes to use when analyzing files, and
+        # whether analysis results should be cached between loads.
+        self.jobs = options.jobs
+        self.use_cache = not options.no_cache
+        self.record_history = not getattr(options, 'no_history', False)
+
+        # Should the project tree be scanned as directories are expanded,
+        # and what should be excluded from the project tree?
+        self.lazy_tree = not options.eager
+        self.ignore = options.ignore
+
+        # In diff mode, the git revision to compare against, and the
+        # lines that have changed against it. Only the changed files
+        # are shown, so the project isn't scanned.
+        self.diff_base = getattr(options, 'diff_base', None)
+        self.changed_lines = None
+
+        # The coverage history, and the numbers of each file in the
+        # run before the most recent one (for per-file changes).
+        self.history = None
+        self.previous_numbers = None
+
         # Create a filename normalizer based on the CWD.
         self.filename_normalizer = filename_normalizer(self.base_path)
 
         # Set up dummy coverage data
-        self.coverage_data = {'lines': {}, 'total_coverage': None}
+        self.coverage_data = {'files': {}, 'total_coverage': None}
+
+        # The background loader for coverage data, and the state
+        # of the load that is in progress.
+        self.loader = None
+        self.load_started = None
+        self.shards = ShardedData()
+        self.diff = None
+        self.old_total_coverage = None
+        self.n_files = 0
+        self.totals = None
+
+        # The status code to use when the program exits.
+        self.exit_status = 0
 
         # Root window
         self.root = root
-        self.root.title('Duvet')
+        if self.diff_base:
+            self.root.title('Duvet (changes against %s)' % self.diff_base)
+        else:
+            self.root.title('Duvet')
         self.root.geometry('1024x768')
 
         # Prevent the menus from having the empty tearoff entry
@@ -90,6 +149,20 @@ class MainWindow(object):
         self.root.rowconfigure(1, weight=1)
         self.root.rowconfigure(2, weight=0)
 
+        # If requested, watch the coverage data file (and the project
+        # sources) and reload whenever they change.
+        self.watcher = None
+        self.watch_event = threading.Event()
+        if options.watch or options.watch_sources:
+            import coverage
+            self.watcher = Watcher(
+                [os.path.abspath(coverage.coverage().config.data_file)],
+                on_change=self.watch_event.set,
+                scanner=ProjectScanner(self.base_path, ignore=self.ignore) if options.watch_sources else None
+            )
+            self.watcher.start()
+            self.root.after(WATCH_POLL_INTERVAL, self._poll_watcher)
+
     ######################################################
     # Internal GUI layout methods.
     ######################################################
@@ -145,8 +218,13 @@ class MainWindow(object):
         )
         self.coverage_total_summary_label.grid(column=1, row=0, sticky=(tk.W, tk.E))
 
+        # The trend of the total coverage over recent runs.
+        self.sparkline = Sparkline(self.toolbar)
+        self.sparkline.grid(column=2, row=0, padx=(0, 5))
+
         self.toolbar.columnconfigure(0, weight=0)
         self.toolbar.columnconfigure(1, weight=1)
+        self.toolbar.columnconfigure(2, weight=0)
         self.toolbar.rowconfigure(0, weight=0)
 
     def _setup_main_content(self):
@@ -162,6 +240,7 @@ class MainWindow(object):
         self._setup_left_frame()
         self._setup_project_file_tree()
         self._setup_global_file_tree()
+        self._setup_worst_files()
 
         # Create the output/viewer area on the right frame
         self._setup_code_area()
@@ -179,20 +258,42 @@ class MainWindow(object):
         '''
 
         # The left-hand side frame on the main content area
+        self.left_frame = tk.Frame(self.content)
+
+        # A filter box, to narrow down the files in both trees.
+        self.file_filter = tk.StringVar()
+        self.file_filter_entry = Entry(self.left_frame, textvariable=self.file_filter)
+        self.file_filter_entry.grid(column=0, row=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.file_filter_entry.bind('<KeyRelease>', self.on_filter_changed)
+        self.file_filter_entry.bind('<Escape>', self.cmd_clear_filter)
+        self._filter_pending = False
+
         # The tabs for the two trees
         self.tree_notebook = Notebook(
-            self.content,
+            self.left_frame,
             padding=(0, 5, 0, 5)
         )
-        self.content.add(self.tree_notebook)
+        self.tree_notebook.grid(column=0, row=1, sticky=(tk.N, tk.S, tk.E, tk.W))
+
+        self.left_frame.columnconfigure(0, weight=1)
+        self.left_frame.rowconfigure(0, weight=0)
+        self.left_frame.rowconfigure(1, weight=1)
+
+        self.content.add(self.left_frame)
 
     def _setup_project_file_tree(self):
 
-        self.project_file_tree_frame = tk.Frame(self.content)
-        self.project_file_tree_frame.grid(column=0, row=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.project_file_tree_frame = tk.Frame(self.tree_notebook)
         self.tree_notebook.add(self.project_file_tree_frame, text='Project')
 
-        self.project_file_tree = FileView(self.project_file_tree_frame, normalizer=self.filename_normalizer, root=self.base_path)
+        self.project_file_tree = FileView(
+            self.project_file_tree_frame,
+            normalizer=self.filename_normalizer,
+            root=self.base_path,
+            scanner=ProjectScanner(self.base_path, ignore=self.ignore),
+            lazy=self.lazy_tree and not self.diff_base,
+            scan=not self.diff_base
+        )
         self.project_file_tree.grid(column=0, row=0, sticky=(tk.N, tk.S, tk.E, tk.W))
 
         # # The tree's vertical scrollbar
@@ -214,8 +315,7 @@ class MainWindow(object):
 
     def _setup_global_file_tree(self):
 
-        self.global_file_tree_frame = tk.Frame(self.content)
-        self.global_file_tree_frame.grid(column=0, row=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.global_file_tree_frame = tk.Frame(self.tree_notebook)
         self.tree_notebook.add(self.global_file_tree_frame, text='Global')
 
         self.global_file_tree = FileView(self.global_file_tree_frame, normalizer=self.filename_normalizer)
@@ -238,6 +338,29 @@ class MainWindow(object):
         # Handlers for GUI events
         self.global_file_tree.bind('<<TreeviewSelect>>', self.on_file_selected)
 
+    def _setup_worst_files(self):
+
+        self.worst_files_frame = tk.Frame(self.tree_notebook)
+        self.tree_notebook.add(self.worst_files_frame, text='Worst')
+
+        self.worst_files = RankingView(self.worst_files_frame, normalizer=self.filename_normalizer)
+        self.worst_files.grid(column=0, row=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+
+        # The list's vertical scrollbar
+        self.worst_files_scrollbar = tk.Scrollbar(self.worst_files_frame, orient=tk.VERTICAL)
+        self.worst_files_scrollbar.grid(column=1, row=0, sticky=(tk.N, tk.S))
+
+        self.worst_files.config(yscrollcommand=self.worst_files_scrollbar.set)
+        self.worst_files_scrollbar.config(command=self.worst_files.yview)
+
+        # Setup weights for the "worst_files" list
+        self.worst_files_frame.columnconfigure(0, weight=1)
+        self.worst_files_frame.columnconfigure(1, weight=0)
+        self.worst_files_frame.rowconfigure(0, weight=1)
+
+        # Handlers for GUI events
+        self.worst_files.bind('<<TreeviewSelect>>', self.on_file_selected)
+
     def _setup_code_area(self):
         self.code_frame = tk.Frame(self.content)
         self.code_frame.grid(column=1, row=0, sticky=(tk.N, tk.S, tk.E, tk.W))
@@ -269,13 +392,19 @@ class MainWindow(object):
         self.coverage_file_summary_label.grid(column=0, row=0, sticky=(tk.W, tk.E))
         self.coverage_file_summary.set('No file selected')
 
+        # How long the last load took, and where the time went.
+        self.load_summary = tk.StringVar()
+        self.load_summary_label = Label(self.statusbar, textvariable=self.load_summary, anchor=tk.E)
+        self.load_summary_label.grid(column=1, row=0, sticky=(tk.W, tk.E))
+
         # Main window resize handle
         self.grip = Sizegrip(self.statusbar)
-        self.grip.grid(column=1, row=0, sticky=(tk.S, tk.E))
+        self.grip.grid(column=2, row=0, sticky=(tk.S, tk.E))
 
         # Set up weights for status bar frame
         self.statusbar.columnconfigure(0, weight=1)
         self.statusbar.columnconfigure(1, weight=0)
+        self.statusbar.columnconfigure(2, weight=0)
         self.statusbar.rowconfigure(0, weight=0)
 
     ######################################################
@@ -298,150 +427,288 @@ class MainWindow(object):
         # Update the code view; this means changing the displayed file
         # if necessary, and updating the current line.
         if filename != self.code.filename:
-            self.code.filename = filename
-
-            missing = self.coverage_data['missing'].get(os.path.normcase(filename), [])
-            executed = self.coverage_data['lines'].get(os.path.normcase(filename), [])
+            with timing.span('display', filename=filename):
+                self.code.filename = filename
+
+            result = self.coverage_data['files'].get(os.path.normcase(filename))
+            with timing.span('highlight', filename=filename):
+                if result:
+                    missing = result.missing
+                    executed = result.statements
+                    if self.changed_lines is not None:
+                        _, new_missing = changed_coverage(result, self.changed_lines)
+                    else:
+                        new_missing = ()
+                    self.code.highlight_coverage(missing, result.excluded, result.partial, new_missing)
+                else:
+                    missing = []
+                    executed = []
+                    new_missing = ()
+                    self.code.highlight_coverage([])
 
             n_executed = len(executed)
             n_missing = len(missing)
 
-            self.code.highlight_missing(missing)
-
-            self.coverage_file_summary.set('%s/%s lines executed' % (n_executed, n_executed + n_missing))
+            summary = '%s/%s lines executed' % (n_executed, n_executed + n_missing)
+            if self.changed_lines is not None:
+                summary = '%s, %s changed lines not covered' % (summary, len(new_missing))
+            if result and result.numbers and self.previous_numbers is not None:
+                summary = '%s%s' % (summary, self._file_trend(result))
+            self.coverage_file_summary.set(summary)
 
         self.code.line = line
 
     def load_coverage(self):
-        "Load and display coverage data"
-        # Store the old list of files that have coverage data.
-        # We do this so we can identify stale data on the tree.
-        old_files = set(self.coverage_data['lines'].keys())
-        old_total_coverage = self.coverage_data['total_coverage']
-
-        loaded = False
-        retry = True
-        while not loaded and retry:
-            try:
-                # Load the new coverage data
-                cov = coverage.coverage()
-                cov.load()
-
-                # Override precision for coverage reporting.
-                coverage.results.Numbers.set_precision(1)
-
-                if cov.data.measured_files():
-                    self.coverage_data = {
-                        'lines': {},
-                        'missing': {},
-                    }
-                    totals = coverage.results.Numbers()
-
-                    # Update the coverage display of every file mentioned in the file.
-                    for filename in cov.data.measured_files():
-                        filename = os.path.normcase(filename)
-                        node = nodify(filename)
-                        dirname, basename = os.path.split(filename)
-
-                        # If the normalized version of the filename is the same as the
-                        # filename, then the file *isn't* under the project root.
-                        if filename == self.filename_normalizer(filename):
-                            file_tree = self.global_file_tree
-                        else:
-                            file_tree = self.project_file_tree
-
-                        try:
-                            # # Make sure the file exists on the tree.
-                            file_tree.insert_filename(dirname, basename)
-
-                            # Compute the coverage percentage
-                            analysis = cov._analyze(filename)
-
-                            self.coverage_data['lines'][filename] = analysis.statements
-                            self.coverage_data['missing'][filename] = analysis.missing
-                            file_coverage = analysis.numbers.pc_covered
-
-                            totals = totals + analysis.numbers
-
-                            file_tree.set(node, 'coverage', analysis.numbers.pc_covered_str)
-                            # file_tree.set(node, 'branch_coverage', str(len(lines)))
-
-                            # Set the color of the tree node based on coverage
-                            if file_coverage < 70.0:
-                                file_tree.item(node, tags=['file', 'code', 'bad'])
-                            elif file_coverage < 80.0:
-                                file_tree.item(node, tags=['file', 'code', 'poor'])
-                            elif file_coverage < 90.0:
-                                file_tree.item(node, tags=['file', 'code', 'ok'])
-                            elif file_coverage < 99.9:
-                                file_tree.item(node, tags=['file', 'code', 'good'])
-                            else:
-                                file_tree.item(node, tags=['file', 'code', 'perfect'])
-
-                        except coverage.misc.NoSource:
-                            # could mean the file was deleted after running coverage
-                            file_tree.item(node, tags=['bad'])
-
-                        # We've updated the file, so we know it isn't stale.
-                        try:
-                            old_files.remove(filename)
-                        except KeyError:
-                            # File wasn't loaded before; ignore this.
-                            pass
-
-                        # Clear out any stale coverage data
-                        for filename in old_files:
-                            node = nodify(filename)
-                            if file_tree.exists(node):
-                                file_tree.set(node, 'coverage', '')
-                                file_tree.item(node, tags=['file', 'code'])
-
-                    # Compute the overall coverage
-                    total_coverage = totals.pc_covered
-                    self.coverage_data['total_coverage'] = total_coverage
-
-                    coverage_text = u'%.1f%%' % total_coverage
-
-                    # Update the text with up/down arrows to reflect change
-                    if old_total_coverage is not None:
-                        if total_coverage > old_total_coverage:
-                            coverage_text = coverage_text + u' ⬆'
-                        elif total_coverage < old_total_coverage:
-                            coverage_text = coverage_text + u' ⬇'
-
-                    self.coverage_total_summary.set(coverage_text)
-
-                    # Set the color based on coverage level.
-                    if total_coverage < 70.0:
-                        self.coverage_total_summary_label.configure(foreground='red')
-                    elif total_coverage < 80.0:
-                        self.coverage_total_summary_label.configure(foreground='orange')
-                    elif total_coverage < 90.0:
-                        self.coverage_total_summary_label.configure(foreground='blue')
-                    elif total_coverage < 99.9:
-                        self.coverage_total_summary_label.configure(foreground='cyan')
-                    else:
-                        self.coverage_total_summary_label.configure(foreground='green')
+        """Start loading coverage data.
 
-                    # Refresh the file display
-                    current_file = self.code._filename
-                    if current_file:
-                        self.code._filename = None
-                        self.show_file(current_file)
+        The data is loaded and analyzed on a background thread; the
+        results are applied to the display as they arrive.
+        """
+        # Abandon any load that is already in progress.
+        if self.loader is not None:
+            self.loader.cancel()
+
+        # Compare the new results with what is currently displayed,
+        # so that only the files that have changed need to be updated.
+        self.diff = CoverageDiff(self.coverage_data['files'])
+        self.old_total_coverage = self.coverage_data['total_coverage']
+
+        # Time the phases of this load from scratch.
+        self.load_started = time.time()
+        if timing.timer():
+            timing.timer().reset()
+
+        self.loader = CoverageLoader(
+            jobs=self.jobs,
+            use_cache=self.use_cache,
+            shards=self.shards,
+            diff_base=self.diff_base,
+            record_history=self.record_history,
+            root=self.base_path
+        )
+        self.loader.start()
+        self.root.after(LOADER_POLL_INTERVAL, self._poll_loader, self.loader)
+
+    def _poll_loader(self, loader):
+        "Apply any results the loader has produced since the last poll."
+        # If a newer load has been started, this loader is stale.
+        if loader is not self.loader:
+            return
+
+        # Only process results for a short time, so that the GUI
+        # gets a chance to handle events between batches.
+        deadline = time.time() + LOADER_BATCH_TIME
+        finished = False
+        with timing.span('tree'):
+            while not finished and time.time() < deadline:
+                try:
+                    message = loader.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                finished = getattr(self, '_on_load_%s' % message[0])(*message[1:])
+
+        # Files added to the trees may match the filter, and may
+        # change the worst files.
+        self._apply_filter()
+        self.worst_files.refresh()
+
+        if finished:
+            # A handler may have started a new load (e.g., on retry);
+            # only forget the loader if it is still this one.
+            if self.loader is loader:
+                self.loader = None
+        else:
+            self.root.after(LOADER_POLL_INTERVAL, self._poll_loader, loader)
+            self._show_total_coverage(self.totals, partial=True)
+
+    def _poll_watcher(self):
+        "Reload the coverage data if the watcher has seen a change."
+        if self.watch_event.is_set():
+            self.watch_event.clear()
+            self.load_coverage()
+        self.root.after(WATCH_POLL_INTERVAL, self._poll_watcher)
+
+    def _on_load_diff(self, changed):
+        "The changes against the diff base have been found."
+        self.changed_lines = changed
+
+    def _on_load_start(self, n_files):
+        "Coverage data has been loaded; analysis is starting."
+        from coverage.results import Numbers
+        self.n_files = n_files
+        self.totals = Numbers()
+
+    def _on_load_file(self, result):
+        "The analysis of a single file has completed."
+        if result.numbers:
+            self.totals = self.totals + result.numbers
+
+        change = self.diff.update(result)
+        if change:
+            self.coverage_data['files'][result.filename] = result
+            self._apply_change(change)
+
+    def _on_load_history(self, history, previous):
+        "The load has been recorded in the coverage history."
+        from coverage.results import Numbers
+        self.history = history
+        self.previous_numbers = previous
+
+        trend = [Numbers(*run.totals).pc_covered for run in history.runs(last=SPARKLINE_RUNS)]
+        self.sparkline.set_values(trend)
+
+        # On the first load, show the change since the last recorded run.
+        if self.old_total_coverage is None and len(trend) > 1:
+            self.old_total_coverage = trend[-2]
+
+        # The file on display may have changed since the last run.
+        self._refresh_file()
+
+    def _on_load_done(self, totals):
+        "All files have been analyzed."
+        # Clear out any stale coverage data
+        for change in self.diff.removed():
+            del self.coverage_data['files'][change.filename]
+            self._apply_change(change)
+
+        # Compute the overall coverage
+        self.totals = totals
+        self.coverage_data['total_coverage'] = totals.pc_covered
+        self._show_total_coverage(totals)
+        self._show_load_summary(totals)
+
+        return True
+
+    def _apply_change(self, change):
+        "Update the display to reflect a change in the coverage of a file."
+        filename = change.filename
+        file_tree = self._file_tree(filename)
+
+        # Make sure the file exists on the tree.
+        if change.old is None:
+            dirname, basename = os.path.split(filename)
+            file_tree.insert_filename(dirname, basename)
+
+        # Set the coverage and the color of the tree node (and the
+        # totals of the directories containing it).
+        if change.coverage_changed or change.bucket_changed or change.lines_changed:
+            bucket = result_bucket(change.new)
+            if bucket is None:
+                tags = ['file', 'code']
+            elif bucket == 'nosource':
+                # could mean the file was deleted after running coverage
+                tags = ['bad']
+            else:
+                tags = ['file', 'code', bucket]
+            numbers = change.new.numbers if change.new else None
+            file_tree.set_coverage(filename, result_coverage(change.new), tags, numbers)
+            self.worst_files.set_coverage(filename, result_coverage(change.new), tags, numbers)
+
+        # If this is the file currently on display, refresh it.
+        if change.lines_changed and filename == os.path.normcase(self.code.filename or ''):
+            self._refresh_file()
+
+    def _on_load_nodata(self):
+        "There is no coverage data to load."
+        return self._retry_load(
+            message="Couldn't find coverage data file. Have you generated coverage data? Is the .coverage in your current working directory",
+            title='No coverage data found'
+        )
 
-                    loaded = True
-                else:
-                    retry = tkMessageBox.askretrycancel(
-                        message="Couldn't find coverage data file. Have you generated coverage data? Is the .coverage in your current working directory",
-                        title='No coverage data found'
-                    )
-            except Exception as e:
-                retry = tkMessageBox.askretrycancel(
-                    message="Couldn't load coverage data -- data file may be corrupted (Error was: %s)" % e,
-                    title='Problem loading coverage data'
-                )
-
-        return loaded
+    def _on_load_error(self, error):
+        "The coverage data couldn't be loaded."
+        return self._retry_load(
+            message="Couldn't load coverage data -- data file may be corrupted (Error was: %s)" % error,
+            title='Problem loading coverage data'
+        )
+
+    def _retry_load(self, message, title):
+        """Ask the user if they want to retry loading coverage data.
+
+        If they don't, and no coverage data has ever been loaded, quit.
+        """
+        if tkMessageBox.askretrycancel(message=message, title=title):
+            self.load_coverage()
+        elif self.coverage_data['total_coverage'] is None:
+            self.exit_status = 1
+            self.cmd_quit()
+        return True
+
+    def _file_tree(self, filename):
+        "Return the file tree that should display the given file."
+        # If the normalized version of the filename is the same as the
+        # filename, then the file *isn't* under the project root.
+        if filename == self.filename_normalizer(filename):
+            return self.global_file_tree
+        else:
+            return self.project_file_tree
+
+    def _apply_filter(self):
+        "Filter both file trees to match the content of the filter box."
+        self._filter_pending = False
+        query = self.file_filter.get()
+        self.project_file_tree.filter(query)
+        self.global_file_tree.filter(query)
+
+    def _refresh_file(self):
+        "Redraw the file currently on display"
+        current_file = self.code._filename
+        if current_file:
+            self.code._filename = None
+            self.show_file(current_file)
+
+    def _show_total_coverage(self, totals, partial=False):
+        """Display the total coverage on the toolbar.
+
+        If partial is true, the load is still in progress; show how
+        many files have been analyzed so far.
+        """
+        if totals is None or totals.n_files == 0:
+            return
+
+        total_coverage = totals.pc_covered
+        coverage_text = u'%.1f%%' % total_coverage
+
+        if partial:
+            coverage_text = coverage_text + u' (%s/%s files)' % (totals.n_files, self.n_files)
+
+        # Update the text with up/down arrows to reflect change
+        elif self.old_total_coverage is not None:
+            if total_coverage > self.old_total_coverage:
+                coverage_text = coverage_text + u' ⬆'
+            elif total_coverage < self.old_total_coverage:
+                coverage_text = coverage_text + u' ⬇'
+
+        self.coverage_total_summary.set(coverage_text)
+
+        # Set the color based on coverage level.
+        self.coverage_total_summary_label.configure(
+            foreground=BUCKET_COLORS[coverage_bucket(total_coverage)]
+        )
+
+    def _file_trend(self, result):
+        "Describe how the coverage of a file has changed since the previous run."
+        from coverage.results import Numbers
+        previous = self.previous_numbers.get(result.filename)
+        if previous is None:
+            return ', new since the last run'
+        change = result.numbers.pc_covered - Numbers(*previous).pc_covered
+        if abs(change) < 0.05:
+            return ''
+        return ', %+.1f%% since the last run' % change
+
+    def _show_load_summary(self, totals):
+        "Display how long the last load took on the status bar."
+        summary = 'Loaded %s files in %.2fs' % (totals.n_files, time.time() - self.load_started)
+        if timing.timer():
+            phases = ', '.join(
+                '%s %.2fs' % (phase, seconds)
+                for phase, seconds in timing.timer().breakdown()
+            )
+            if phases:
+                summary = '%s (%s)' % (summary, phases)
+        self.load_summary.set(summary)
 
     ######################################################
     # TK Main loop
@@ -462,31 +729,43 @@ class MainWindow(object):
         "Refresh the coverage data"
         self.load_coverage()
 
+    def cmd_clear_filter(self, event=None):
+        "Clear the filter, displaying every file"
+        self.file_filter.set('')
+        self._apply_filter()
+
     def cmd_duvet_page(self):
         "Show the Duvet project page"
-        webbrowser.open_new('http://pybee.org/duvet')
+        open_url('http://pybee.org/duvet')
 
     def cmd_duvet_github(self):
         "Show the Duvet GitHub repo"
-        webbrowser.open_new('http://github.com/pybee/duvet')
+        open_url('http://github.com/pybee/duvet')
 
     def cmd_duvet_docs(self):
         "Show the Duvet documentation"
         # If this is a formal release, show the docs for that
         # version. otherwise, just show the head docs.
+        from duvet import NUM_VERSION, get_version
         if len(NUM_VERSION) == 3:
-            webbrowser.open_new('https://duvet.readthedocs.io/en/v%s/' % VERSION)
+            open_url('https://duvet.readthedocs.io/en/v%s/' % get_version())
         else:
-            webbrowser.open_new('https://duvet.readthedocs.io/')
+            open_url('https://duvet.readthedocs.io/')
 
     def cmd_beeware_page(self):
         "Show the BeeWare project page"
-        webbrowser.open_new('http://pybee.org/')
+        open_url('http://pybee.org/')
 
     ######################################################
     # Handlers for GUI actions
     ######################################################
 
+    def on_filter_changed(self, event):
+        "The filter has been edited; filter the trees once pending keystrokes are handled."
+        if not self._filter_pending:
+            self._filter_pending = True
+            self.root.after_idle(self._apply_filter)
+
     def on_file_selected(self, event):
         "When a file is selected, highlight the file and line"
         if event.widget.selection():
@@ -497,3 +776,20 @@ class MainWindow(object):
                 self.show_file(filename=filename)
             else:
                 self.code.filename = None
+
+            # Load the files next to it, so they're ready if the
+            # selection moves.
+            self.code.sources.prefetch(self._neighbours(event.widget, filename))
+
+    def _neighbours(self, tree, node):
+        "Return the files on either side of a node on a tree, nearest first."
+        before = after = node
+        neighbours = []
+        for _ in range(PREFETCH_NEIGHBOURS):
+            before = tree.prev(before) if before else ''
+            after = tree.next(after) if after else ''
+            neighbours.extend(
+                sibling for sibling in (after, before)
+                if sibling and os.path.isfile(sibling)
+            )
+        return neighbours
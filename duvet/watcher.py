@@ -0,0 +1,263 @@
+"""Watching for changes to coverage data and project sources.
+
+Where inotify is available (i.e., on Linux), it is used to detect
+changes as they happen; otherwise, the files are polled for changes in
+their modification time.
+
+Test runners often write coverage data in bursts (e.g., one data file
+per process in a parallel run), so changes are debounced: a change is
+only reported once there have been no further changes for a short
+period.
+"""
+import ctypes
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+
+# How long (in s) to wait for writes to stop before reporting a change.
+DEBOUNCE = 0.5
+
+# The longest (in s) a change can be delayed by a continuous stream of writes.
+MAX_DEBOUNCE = 5.0
+
+# How often (in s) to check for changes when polling.
+POLL_INTERVAL = 1.0
+
+# inotify constants, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _load_libc():
+    "Load the C library, if it provides inotify."
+    # ctypes.util is slow to import, so only import it when it's needed.
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyMonitor(object):
+    """Detect changes using inotify.
+
+    filenames are individual files to watch; their directories are
+    watched, so that files that are replaced (rather than rewritten)
+    are also detected. directories are watched for changes to any file
+    with one of the given extensions; any subdirectories created in a
+    watched directory will also be watched.
+    """
+    def __init__(self, libc, filenames, directories, extensions):
+        self.libc = libc
+        self.extensions = tuple(extensions)
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'Unable to initialize inotify')
+
+        # The watched directories, and by watch descriptor, the file names
+        # of interest, and the directories where any source file is of
+        # interest.
+        self.watches = {}
+        self.names = {}
+        self.sources = set()
+
+        for filename in filenames:
+            dirname, basename = os.path.split(os.path.abspath(filename))
+            wd = self._add_watch(dirname)
+            if wd is not None:
+                self.names.setdefault(wd, set()).add(basename)
+
+        for dirname in directories:
+            wd = self._add_watch(dirname)
+            if wd is not None:
+                self.sources.add(wd)
+
+    def _add_watch(self, dirname):
+        "Watch a directory, returning the watch descriptor."
+        mask = IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        wd = self.libc.inotify_add_watch(self.fd, dirname.encode('utf-8'), mask)
+        if wd < 0:
+            return None
+        self.watches[wd] = dirname
+        return wd
+
+    def _is_relevant(self, wd, name):
+        "Is a change to name in the watched directory of interest?"
+        if wd in self.sources and name.endswith(self.extensions):
+            return True
+        # Coverage data files for parallel runs are named after
+        # the main data file.
+        return any(name == n or name.startswith(n + '.') for n in self.names.get(wd, ()))
+
+    def wait(self, timeout):
+        "Wait up to timeout seconds; return True if a relevant change occurred."
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            raise
+
+        changed = False
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                self.sources.discard(wd)
+                continue
+
+            # Watch new directories in the source tree.
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and wd in self.sources:
+                    new_wd = self._add_watch(os.path.join(self.watches[wd], name))
+                    if new_wd is not None:
+                        self.sources.add(new_wd)
+                continue
+
+            if self._is_relevant(wd, name):
+                changed = True
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingMonitor(object):
+    """Detect changes by polling modification times.
+
+    Takes the same arguments as InotifyMonitor; source directories are
+    not rescanned for new subdirectories.
+    """
+    def __init__(self, filenames, directories, extensions):
+        self.filenames = [os.path.abspath(filename) for filename in filenames]
+        self.directories = list(directories)
+        self.extensions = tuple(extensions)
+        self.last = self._snapshot()
+
+    def _snapshot(self):
+        "Record the modification time and size of every file of interest."
+        snapshot = {}
+        for filename in self.filenames:
+            dirname, basename = os.path.split(filename)
+            try:
+                names = [
+                    name for name in os.listdir(dirname)
+                    if name == basename or name.startswith(basename + '.')
+                ]
+            except OSError:
+                names = []
+            for name in names:
+                self._stat(snapshot, os.path.join(dirname, name))
+
+        for dirname in self.directories:
+            try:
+                names = os.listdir(dirname)
+            except OSError:
+                names = []
+            for name in names:
+                if name.endswith(self.extensions):
+                    self._stat(snapshot, os.path.join(dirname, name))
+        return snapshot
+
+    def _stat(self, snapshot, path):
+        try:
+            stat = os.stat(path)
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        except OSError:
+            pass
+
+    def wait(self, timeout):
+        "Wait up to timeout seconds; return True if a change occurred."
+        time.sleep(min(timeout, POLL_INTERVAL))
+        snapshot = self._snapshot()
+        changed = snapshot != self.last
+        self.last = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class Watcher(threading.Thread):
+    """A thread that reports changes to coverage data and sources.
+
+    filenames is a list of coverage data files to watch. If scanner is
+    provided, every source directory it finds in the project will also
+    be watched. on_change is invoked (on the watcher thread) once a
+    burst of changes has settled.
+    """
+    def __init__(self, filenames, on_change, scanner=None, debounce=DEBOUNCE):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.filenames = filenames
+        self.on_change = on_change
+        self.scanner = scanner
+        self.debounce = debounce
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        if self.scanner:
+            directories = [dirname for dirname, _, _ in self.scanner.walk()]
+            extensions = self.scanner.extensions
+        else:
+            directories = []
+            extensions = ()
+
+        libc = _load_libc()
+        monitor = None
+        if libc is not None:
+            try:
+                monitor = InotifyMonitor(libc, self.filenames, directories, extensions)
+            except OSError:
+                pass
+        if monitor is None:
+            monitor = PollingMonitor(self.filenames, directories, extensions)
+
+        try:
+            first_change = None
+            last_change = None
+            while not self._stopped.is_set():
+                if monitor.wait(self.debounce if first_change else POLL_INTERVAL):
+                    last_change = time.time()
+                    if first_change is None:
+                        first_change = last_change
+
+                # Once the writes have settled (or have gone on for
+                # too long), report the change.
+                if first_change is not None:
+                    now = time.time()
+                    if now - last_change >= self.debounce or now - first_change >= MAX_DEBOUNCE:
+                        first_change = None
+                        last_change = None
+                        self.on_change()
+        finally:
+            monitor.close()
@@ -1,10 +1,38 @@
 import os.path
+import time
+from array import array
+from bisect import bisect_left, bisect_right
 try:
+    import tkinter as tk
     from tkinter import ttk
 except ImportError:
+    import Tkinter as tk
     import ttk
 
-from tkreadonly import ReadOnlyCode
+from pygments import lex
+from pygments.lexers import guess_lexer_for_filename
+from tkreadonly import ReadOnlyCode, combine, text_set
+
+from duvet import timing
+from duvet.analysis import BUCKET_COLORS, branch_coverage_str, coverage_bucket, coverage_str, line_ranges
+from duvet.ranking import RANKINGS, Ranking
+from duvet.scanner import ProjectScanner
+from duvet.search import PathIndex
+from duvet.sources import CHUNK_LINES, SourceCache, read_text
+
+
+# When a filter matches at most this many files, the directories
+# containing them are scanned (in lazy mode) and expanded so that every
+# match can be seen. Larger result sets only show the matches that are
+# already on the tree, so a broad query doesn't scan the whole project.
+FILTER_OPEN_LIMIT = 200
+
+# The number of files listed in a ranking.
+RANKING_LIMIT = 100
+
+# The smallest range (in %) of coverage drawn on the full height of a
+# sparkline, so that tiny changes don't look like big swings.
+SPARKLINE_MIN_RANGE = 1.0
 
 
 def nodify(node):
@@ -12,16 +40,420 @@ def nodify(node):
     return node.replace('\\', '/')
 
 
+def configure_bucket_tags(tree):
+    "Set up the styles for the coverage buckets on a tree"
+    tree.tag_configure('bad', foreground='red')        # 0-70%
+    tree.tag_configure('poor', foreground='orange')    # 70-80%
+    tree.tag_configure('ok', foreground='blue')        # 80-90%
+    tree.tag_configure('good', foreground='cyan')      # 90-100%
+    tree.tag_configure('perfect', foreground='green')  # 100%
+
+
+def line_offsets(filename):
+    """Find the byte offset of the start of every line in a file.
+
+    Returns an array with one entry per line, plus a final entry
+    holding the size of the file.
+    """
+    offsets = array('L', [0])
+    position = 0
+    with open(filename, 'rb') as f:
+        for line in f:
+            position += len(line)
+            offsets.append(position)
+    return offsets
+
+
 class CodeView(ReadOnlyCode):
+    # The tags used to highlight coverage, in order of increasing priority.
+    COVERAGE_TAGS = ('excluded', 'partial', 'missing', 'new_missing')
+
+    # The largest number of ranges to tag in a single Tk call.
+    MAX_RANGES_PER_CALL = 1000
+
+    # Files larger than this (in bytes) are checked for their line count;
+    # files with more lines than WINDOW_THRESHOLD are displayed in a window
+    # of WINDOW_SIZE lines that moves as the view is scrolled.
+    WINDOW_CHECK_SIZE = 256 * 1024
+    WINDOW_THRESHOLD = 5000
+    WINDOW_SIZE = 600
+
+    # How often (in ms) to check whether the file on display has been
+    # tokenized, and the longest time (in s) to spend coloring it before
+    # handing control back to the Tk event loop.
+    TOKENIZE_POLL_INTERVAL = 20
+    COLOR_BATCH_TIME = 0.02
+
     def __init__(self, *args, **kwargs):
+        # The cache of loaded and tokenized source files.
+        self.sources = kwargs.pop('sources', None) or SourceCache()
         ReadOnlyCode.__init__(self, *args, **kwargs)
 
+        self.code.tag_configure('excluded', foreground='#75715e')
+        self.code.tag_configure('partial', background='#4f4520')
+        self.code.tag_configure('missing', background=self.style.highlight_color)
+        self.code.tag_configure('new_missing', background='#6b2222')
+
+        # The current line should be visible over coverage highlighting.
+        self.code.tag_raise('current_line')
+
+        # The coverage of the file on display, as (excluded, partial,
+        # missing, new_missing)
+        self._coverage = ((), (), (), ())
+
+        # If the file on display is windowed, the byte offset of each line,
+        # the lexer for the file, and the first and last lines in the window.
+        self._offsets = None
+        self._window_lexer = None
+        self._window = None
+        self._rerender = None
+
+        # The text on display; the tokenized source being colored, and
+        # the chunks of it that are still to be colored; and the pending
+        # Tk callback for tokenizing or coloring.
+        self._text = None
+        self._coloring = None
+        self._chunks_left = None
+        self._color_job = None
+
+    ######################################################
+    # Windowed display of large files
+    ######################################################
+
+    def _set_filename(self, value):
+        "Set the file being displayed by the view"
+        if self._filename == value:
+            return
+
+        offsets = None
+        if value and os.path.getsize(value) > self.WINDOW_CHECK_SIZE:
+            offsets = line_offsets(value)
+            if len(offsets) - 1 <= self.WINDOW_THRESHOLD:
+                offsets = None
+
+        self._coverage = ((), (), (), ())
+        self._stop_coloring()
+        if offsets is None:
+            if self._window is not None:
+                self._set_windowed(False)
+
+            if value:
+                self._show_file(value)
+            else:
+                # No file is selected; clear the view.
+                self.code.delete('1.0', tk.END)
+                self.lines.config(state=tk.NORMAL)
+                self.lines.delete('1.0', tk.END)
+                self.lines.config(state=tk.DISABLED)
+                self._filename = None
+                self._text = None
+                self._line = None
+        else:
+            if self._window is None:
+                self._set_windowed(True)
+            self._offsets = offsets
+            self._filename = value
+            self._text = None
+            self._line = None
+
+            if self.lexer:
+                self._window_lexer = self.lexer
+            else:
+                self._window_lexer = guess_lexer_for_filename(
+                    value, self._read_lines(1, min(self.n_lines, 100)), stripnl=False
+                )
+            self._render(1)
+
+    filename = property(ReadOnlyCode.filename.fget, _set_filename)
+
+    ######################################################
+    # Display and coloring of the full file
+    ######################################################
+
+    def _show_file(self, filename):
+        """Display the full content of a file.
+
+        The text is displayed immediately. If the file has already been
+        tokenized, it is colored straight away; otherwise, it is tokenized
+        in the background, and colored once that is done.
+        """
+        source = self.sources.cached(filename)
+        if source is not None:
+            text = source.text
+        else:
+            _, text = read_text(filename)
+
+        self.code.delete('1.0', tk.END)
+        self.code.insert('1.0', text)
+
+        line_count = int(self.code.index(tk.END).split('.')[0])
+        self.lines.config(state=tk.NORMAL)
+        self.lines.delete('1.0', tk.END)
+        self.lines.insert('1.0', '\n'.join('%5d' % i for i in range(1, line_count)))
+        self.lines.config(state=tk.DISABLED)
+
+        self._filename = filename
+        self._text = text
+        self._line = None
+
+        if source is not None:
+            self._start_coloring(source)
+        else:
+            self.sources.request(filename, self.lexer)
+            self._color_job = self.after(self.TOKENIZE_POLL_INTERVAL, self._poll_tokens)
+
+    def _poll_tokens(self):
+        "Check whether the file on display has been tokenized."
+        self._color_job = None
+        source = self.sources.cached(self._filename)
+        if source is not None:
+            # If the file has changed since it was displayed, the tokens
+            # don't match the text; leave the text uncolored.
+            if source.text == self._text:
+                self._start_coloring(source)
+        elif self.sources.pending(self._filename):
+            self._color_job = self.after(self.TOKENIZE_POLL_INTERVAL, self._poll_tokens)
+
+    def _start_coloring(self, source):
+        "Start coloring the text on display; the visible lines are colored first."
+        self._coloring = source
+        self._chunks_left = None
+        self._color_job = self.after_idle(self._color)
+
+    def _stop_coloring(self):
+        "Abandon any tokenizing or coloring of the file on display."
+        if self._color_job is not None:
+            self.after_cancel(self._color_job)
+            self._color_job = None
+        self._coloring = None
+        self._chunks_left = None
+
+    def _color(self):
+        "Color some chunks of the text on display."
+        self._color_job = None
+        chunks = self._coloring.chunks
+
+        # Decide the order once the view has scrolled to the current line.
+        if self._chunks_left is None:
+            first = int(self.code.index('@0,0').split('.')[0])
+            last = first + self._page_size()
+            visible = list(range((first - 1) // CHUNK_LINES, min(len(chunks), (last - 1) // CHUNK_LINES + 1)))
+            self._chunks_left = visible + [i for i in range(len(chunks)) if i not in visible]
+            self._chunks_left.reverse()
+
+        step = 2 * self.MAX_RANGES_PER_CALL
+        deadline = time.time() + self.COLOR_BATCH_TIME
+        while self._chunks_left and time.time() < deadline:
+            for tag, indices in chunks[self._chunks_left.pop()].items():
+                for i in range(0, len(indices), step):
+                    self.code.tag_add(tag, *indices[i:i + step])
+
+        if self._chunks_left:
+            self._color_job = self.after(1, self._color)
+        else:
+            self._coloring = None
+            self._chunks_left = None
+
+    @property
+    def n_lines(self):
+        "The number of lines in the (windowed) file on display"
+        return len(self._offsets) - 1
+
+    def _set_windowed(self, windowed):
+        "Switch between displaying the full file, and a window on the file"
+        if windowed:
+            self.code.config(yscrollcommand=self._on_text_scroll)
+            self.lines.config(yscrollcommand=self._on_text_scroll)
+            self.vScrollbar.config(command=self._on_scrollbar)
+            self._window = (1, 0)
+        else:
+            self.code.config(yscrollcommand=combine(text_set(self.lines), self.vScrollbar.set))
+            self.lines.config(yscrollcommand=combine(text_set(self.code), self.vScrollbar.set))
+            self.vScrollbar.config(command=combine(self.lines.yview, self.code.yview))
+            self._window = None
+            self._offsets = None
+            self._window_lexer = None
+
+    def _read_lines(self, first, last):
+        "Read lines first to last (inclusive) of the file on display"
+        with open(self._filename, 'rb') as f:
+            f.seek(self._offsets[first - 1])
+            content = f.read(self._offsets[last] - self._offsets[first - 1])
+        content = content.decode('utf-8', 'replace')
+        if content.endswith('\n'):
+            content = content[:-1]
+        return content
+
+    def _render(self, top):
+        """Render the window of lines around a line.
+
+        The window is positioned so that line `top` is at the top of the
+        view, with a margin of lines above and below so that small scrolls
+        don't need a new render.
+        """
+        margin = (self.WINDOW_SIZE - self._page_size()) // 2
+        first = max(1, min(top - margin, self.n_lines - self.WINDOW_SIZE + 1))
+        last = min(self.n_lines, first + self.WINDOW_SIZE - 1)
+
+        self.code.delete('1.0', tk.END)
+        for token, content in lex(self._read_lines(first, last), self._window_lexer):
+            self.code.insert(tk.END, content, str(token))
+
+        self.lines.config(state=tk.NORMAL)
+        self.lines.delete('1.0', tk.END)
+        self.lines.insert('1.0', '\n'.join('%5d' % i for i in range(first, last + 1)))
+        self.lines.config(state=tk.DISABLED)
+
+        self._window = (first, last)
+        self._apply_coverage()
+
+        if self._line and first <= self._line <= last:
+            self._tag_line(self._line)
+
+        self._view_line(top)
+
+    def _page_size(self):
+        "The number of lines that are visible in the view"
+        try:
+            top = int(self.code.index('@0,0').split('.')[0])
+            bottom = int(self.code.index('@0,%d' % self.code.winfo_height()).split('.')[0])
+            return max(1, bottom - top + 1)
+        except (ValueError, tk.TclError):
+            return 50
+
+    def _index(self, line):
+        "Convert a line number in the file into a text index in the window"
+        return '%s.0' % (line - self._window[0] + 1)
+
+    def _on_scrollbar(self, *args):
+        "Scroll the windowed view in response to the scrollbar"
+        page = self._page_size()
+        top = self._top_line()
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * self.n_lines) + 1
+        elif args[0] == 'scroll':
+            if args[2] == 'pages':
+                top = top + int(args[1]) * page
+            else:
+                top = top + int(args[1])
+        self._scroll_to(max(1, min(top, self.n_lines - page + 1)))
+
+    def _top_line(self):
+        "The line of the file at the top of the view"
+        return self._window[0] + int(self.code.index('@0,0').split('.')[0]) - 1
+
+    def _scroll_to(self, top):
+        "Scroll the windowed view so that `top` is the first visible line"
+        first, last = self._window
+        page = self._page_size()
+        if first <= top and top + page - 1 <= last:
+            self._view_line(top)
+        else:
+            self._render(top)
+
+    def _view_line(self, top):
+        "Scroll the window so that `top` is the first visible line"
+        first, last = self._window
+        fraction = float(top - first) / (last - first + 1)
+        self.code.yview(tk.MOVETO, fraction)
+        self.lines.yview(tk.MOVETO, fraction)
+
+    def _on_text_scroll(self, start, end):
+        """The text in the window has scrolled.
+
+        Keep the line numbers and the code in sync, and update the
+        scrollbar to reflect the position in the whole file. If the view
+        is close to the edge of the window, move the window.
+        """
+        first, last = self._window
+        size = last - first + 1
+        top = first + int(float(start) * size)
+        bottom = first + int(float(end) * size) - 1
+
+        self.lines.yview('moveto', start)
+        self.code.yview('moveto', start)
+        self.vScrollbar.set(float(top - 1) / self.n_lines, float(bottom) / self.n_lines)
+
+        margin = self._page_size()
+        if (top - first < margin and first > 1) or (last - bottom < margin and last < self.n_lines):
+            if self._rerender is None:
+                self._rerender = self.after_idle(self._on_rerender)
+
+    def _on_rerender(self):
+        "Move the window so that it is centered on the visible lines"
+        self._rerender = None
+        if self._window is not None:
+            self._render(self._top_line())
+
+    ######################################################
+    # Coverage and current line highlighting
+    ######################################################
+
     def highlight_missing(self, missing_lines):
-        for line in missing_lines:
-            self.code.tag_add('current_line',
-                '%s.0' % line,
-                '%s.0' % (line + 1)
-            )
+        self.highlight_coverage(missing_lines)
+
+    def highlight_coverage(self, missing, excluded=(), partial=(), new_missing=()):
+        """Highlight the coverage of the file on display.
+
+        Each argument is a LineSet (or a sorted list of line numbers);
+        new_missing are the missing lines that have changed (in diff mode).
+        Any existing highlighting is removed. Contiguous lines are tagged
+        as a single range, with many ranges tagged in each call to Tk. If
+        the file is windowed, only the lines in the window are highlighted.
+        """
+        self._coverage = (excluded, partial, missing, new_missing)
+        self._apply_coverage()
+
+    def _apply_coverage(self):
+        "Apply the coverage highlighting to the text on display"
+        if self._window:
+            first, last = self._window
+        else:
+            first, last = 1, None
+
+        for tag, lines in zip(self.COVERAGE_TAGS, self._coverage):
+            self.code.tag_remove(tag, '1.0', 'end')
+
+            # Only highlight the lines that are rendered.
+            if last is not None:
+                lines = lines[bisect_left(lines, first):bisect_right(lines, last)]
+
+            indices = []
+            for start, end in line_ranges(lines):
+                indices.append('%s.0' % (start - first + 1))
+                indices.append('%s.0' % (end - first + 2))
+
+            step = 2 * self.MAX_RANGES_PER_CALL
+            for i in range(0, len(indices), step):
+                self.code.tag_add(tag, *indices[i:i + step])
+
+    def _tag_line(self, line):
+        "Tag a line of the (windowed) file as the current line"
+        self.code.tag_add('current_line', self._index(line), self._index(line + 1))
+
+    def _set_line(self, value):
+        "Set the current line, scrolling to make it visible"
+        if self._window is None:
+            ReadOnlyCode.line.fset(self, value)
+            return
+
+        self.code.tag_remove('current_line', '1.0', tk.END)
+        self._line = value
+        if value:
+            first, last = self._window
+            if first <= value <= last:
+                self._tag_line(value)
+            else:
+                # Rendering will tag the current line.
+                self._render(max(1, value - self._page_size() // 2))
+            self.code.see(self._index(value))
+        elif self._window[0] != 1:
+            self._render(1)
+        else:
+            self.code.see('1.0')
+
+    line = property(ReadOnlyCode.line.fget, _set_line)
+
 
 class FileView(ttk.Treeview):
     def __init__(self, *args, **kwargs):
@@ -29,55 +461,165 @@ class FileView(ttk.Treeview):
         kwargs['selectmode'] = 'browse'
         self.normalizer = kwargs.pop('normalizer')
         self.root = kwargs.pop('root', None)
+        # The scanner used to find the content of the project; and if
+        # lazy, directories are only scanned when they are expanded.
+        self.scanner = kwargs.pop('scanner', None)
+        self.lazy = kwargs.pop('lazy', False)
+        # If not scanning, only files with coverage data are added.
+        self.scan = kwargs.pop('scan', True)
         ttk.Treeview.__init__(self, *args, **kwargs)
 
-        # self['columns'] = ('coverage', 'branch_coverage')
-        self['columns'] = ('coverage',)
+        # A sorted list of the children of each node, so that the
+        # insertion point for a new node can be found without a
+        # round trip to Tk.
+        self._children = {'': []}
+        self._parents = {}
+
+        # The coverage value and tags for each file, including files
+        # that aren't on the tree yet.
+        self._coverage = {}
+
+        # In lazy mode, the directories that haven't been scanned yet
+        # (mapped to their directory name), and the paths that must
+        # be added to each directory when it is scanned because they
+        # have coverage data.
+        self._unpopulated = {}
+        self._pending = {}
+
+        # The coverage counts for each file, and the total counts for
+        # each directory, as the arguments for a coverage `Numbers`.
+        # When a file changes, only the directories containing it
+        # need to be updated.
+        self._numbers = {}
+        self._rollups = {}
+
+        # An index of the paths of the files on the tree (or pending in
+        # lazy mode), for filtering. While a filter is applied, the
+        # children attached to each parent whose children have been
+        # filtered; the other children are detached, not deleted.
+        self.index = PathIndex()
+        self._query = ''
+        self._query_size = 0
+        self._filtered = {}
+
+        # The branch coverage column is only displayed once there is
+        # some branch coverage data to display.
+        self['columns'] = ('coverage', 'statements', 'missing', 'branch_coverage')
+        self['displaycolumns'] = ('coverage', 'statements', 'missing')
+        self._has_branches = False
         self.column('coverage', width=50, anchor='center')
-        # self.column('branch_coverage', width=50, anchor='center')
+        self.column('statements', width=50, anchor='e')
+        self.column('missing', width=50, anchor='e')
+        self.column('branch_coverage', width=50, anchor='center')
         self.heading('#0', text='File')
         self.heading('coverage', text='Cov')
-        # self.heading('branch_coverage', text='BCov')
+        self.heading('statements', text='Stmts')
+        self.heading('missing', text='Miss')
+        self.heading('branch_coverage', text='BCov')
 
         # Set up styles for line numbers
-        self.tag_configure('bad', foreground='red')        # 0-70%
-        self.tag_configure('poor', foreground='orange')    # 70-80%
-        self.tag_configure('ok', foreground='blue')        # 80-90%
-        self.tag_configure('good', foreground='cyan')      # 90-100%
-        self.tag_configure('perfect', foreground='green')  # 100%
-
+        configure_bucket_tags(self)
         self.tag_configure('directory', foreground='#999')
         self.tag_configure('non_code', foreground='gray')
 
         # Populate the file view
         if self.root:
-            for dirname, _, file_list in os.walk(self.root):
-                self._visitor(dirname, None, file_list)
-
-    def _visitor(self, dirname, data, filesindir):
-        prune = []
-        self.insert_dirname(dirname)
-        for filename in filesindir:
-            if os.path.isdir(os.path.join(dirname, filename)):
-                if filename in ('.git', '.hg', '_build') or filename.endswith('.egg-info'):
-                    prune.append(filename)
+            if self.scanner is None:
+                self.scanner = ProjectScanner(self.root)
+
+            if not self.scan:
+                self.insert_dirname(self.root)
+            elif self.lazy:
+                self.insert_dirname(self.root)
+                self._populate(nodify(self.root))
+                self.bind('<<TreeviewOpen>>', self.on_open)
             else:
-                name, ext = os.path.splitext(filename)
-                if not (ext in ('.pyc',) or filename.startswith('.')):
-                    root, ext = os.path.splitext(filename)
-                    if ext == '.py':
-                        self.insert_filename(dirname, filename, ext)
-                    else:
-                        prune.append(filename)
-                else:
-                    prune.append(filename)
+                with timing.span('scan'):
+                    for dirname, subdirs, filenames in self.scanner.walk():
+                        self.insert_dirname(dirname)
+                        for filename in filenames:
+                            self.insert_filename(dirname, filename)
+
+    def _populate(self, node):
+        "Scan a directory, adding its content to the tree."
+        with timing.span('scan', directory=self._unpopulated[node]):
+            self._populate_directory(node)
+
+    def _populate_directory(self, node):
+        dirname = self._unpopulated.pop(node)
+        if self.exists(self._placeholder(node)):
+            self.delete(self._placeholder(node))
+
+        # Add any content that has coverage data, whether or not
+        # it would be found by the scan.
+        for path, is_dir in self._pending.pop(node, ()):
+            if is_dir:
+                self.insert_dirname(path)
+            else:
+                self.insert_filename(dirname, os.path.basename(path))
+
+        subdirs, filenames = self.scanner.scan(dirname)
+        for subdir in subdirs:
+            self.insert_dirname(os.path.join(dirname, subdir))
+        for filename in filenames:
+            self.insert_filename(dirname, filename)
 
-        for filename in prune:
-            filesindir.remove(filename)
+    def _placeholder(self, node):
+        "The node ID of the placeholder child of an unscanned directory"
+        return node + '//placeholder'
+
+    def _add_pending(self, full_filename):
+        """Record that a file must be added to the tree when its directory is scanned.
+
+        Any directories between the file and the scanned part of the tree
+        are also recorded, so they'll be added as the tree is expanded.
+        The file's own directory must not have been scanned yet.
+        """
+        path = full_filename
+        is_dir = False
+        while True:
+            parent = os.path.dirname(path)
+            parent_node = nodify(parent)
+            if parent_node in self._children and parent_node not in self._unpopulated:
+                # The parent has already been scanned, so the directory
+                # can be added now; it will be scanned when expanded.
+                self.insert_dirname(path)
+                break
+
+            self._pending.setdefault(parent_node, set()).add((path, is_dir))
+            if parent_node in self._children or parent == path:
+                break
+            path = parent
+            is_dir = True
+
+    def _insert_sorted(self, parent, nodename, **kwargs):
+        "Insert a node into the tree, in sorted order under its parent"
+        # Establish the index at which to insert this child by finding
+        # how many of the (sorted) children would sort before it.
+        children = self._children[parent]
+        index = bisect_left(children, nodename)
+        children.insert(index, nodename)
+        self._children[nodename] = []
+        self._parents[nodename] = parent
+
+        # If this node has coverage data, display it.
+        try:
+            kwargs['values'], kwargs['tags'] = self._coverage[nodename]
+        except KeyError:
+            pass
+
+        # Now insert a new node at the index that was found.
+        self.insert(parent, index, nodename, **kwargs)
+
+        # If the parent's children are filtered, the index doesn't
+        # correspond to a position on the tree; hide the node until
+        # the filter is next applied.
+        if parent in self._filtered:
+            self.detach(nodename)
 
     def insert_dirname(self, dirname):
         "Ensure that a specific directory exists in the breakpoint tree"
-        if not self.exists(nodify(dirname)):
+        if nodify(dirname) not in self._children:
             nodename = nodify(dirname)
             parent, child = os.path.split(dirname)
             if self.root:
@@ -100,25 +642,30 @@ class FileView(ttk.Treeview):
                     base = nodify(parent)
                     path = nodify(child)
 
-            # Establish the index at which to insert this child.
-            # Do this by getting a list of children, sorting the list by name
-            # and then finding how many would sort less than the label for
-            # this node.
-            files = sorted(self.get_children(base), reverse=False)
-            index = len([item for item in files if item < nodify(dirname)])
-
-            # Now insert a new node at the index that was found.
-            self.insert(
-                base, index, nodename,
-                text=path,
-                open=True,
-                tags=['directory']
-            )
+            # In lazy mode, directories (other than the root) start out
+            # closed, with a placeholder so they can be expanded.
+            if self.lazy and nodename != nodify(self.root):
+                self._insert_sorted(
+                    base, nodename,
+                    text=path,
+                    open=False,
+                    tags=['directory']
+                )
+                self.insert(nodename, 'end', self._placeholder(nodename), text='...')
+            else:
+                self._insert_sorted(
+                    base, nodename,
+                    text=path,
+                    open=True,
+                    tags=['directory']
+                )
+            if self.lazy:
+                self._unpopulated[nodename] = dirname
 
     def insert_filename(self, dirname, filename, ext='.py'):
         "Ensure that a specific filename exists in the breakpoint tree"
         full_filename = os.path.join(dirname, filename)
-        if not self.exists(nodify(full_filename)):
+        if nodify(full_filename) not in self._children:
             # If self.root is defined, we're only displaying files under that root.
             # If the normalized version of the filename is the same as the
             # filename, then the file *isn't* under the root. Don't bother trying
@@ -128,26 +675,174 @@ class FileView(ttk.Treeview):
             if full_filename == self.normalizer(full_filename):
                 if self.root:
                     return
-                self.insert_dirname(dirname)
             else:
                 if self.root is None:
                     return
 
-            # Establish the index at which to insert this child.
-            # Do this by getting a list of children, sorting the list by name
-            # and then finding how many would sort less than the label for
-            # this node.
-            files = sorted(self.get_children(nodify(dirname)), reverse=False)
-            index = len([item for item in files if item < nodify(full_filename)])
-            # Now insert a new node at the index that was found.
-            self.insert(
-                nodify(dirname), index, nodify(os.path.join(dirname, filename)),
+            self.index.add(nodify(full_filename), self.normalizer(full_filename))
+
+            # In lazy mode, if the directory hasn't been scanned yet, the
+            # file will be added when it is.
+            if self.lazy and (nodify(dirname) not in self._children or nodify(dirname) in self._unpopulated):
+                self._add_pending(full_filename)
+                return
+
+            self.insert_dirname(dirname)
+
+            self._insert_sorted(
+                nodify(dirname), nodify(full_filename),
                 text=filename,
                 open=True,
                 tags=['file'] + ['code'] if ext == '.py' else ['non_code']
             )
 
 
+    def set_coverage(self, filename, coverage, tags, numbers=None):
+        """Set the coverage value and tags for a file.
+
+        numbers is the coverage `Numbers` for the file (if it has any);
+        they are added to the totals of the directories containing it.
+        If the file isn't on the tree yet, the coverage will be applied
+        when it is added.
+        """
+        if numbers is not None:
+            values = (coverage, numbers.n_statements, numbers.n_missing, branch_coverage_str(numbers))
+            if numbers.n_branches and not self._has_branches:
+                self._has_branches = True
+                self['displaycolumns'] = ('coverage', 'statements', 'missing', 'branch_coverage')
+        else:
+            values = (coverage, '', '', '')
+        self._set_values(nodify(filename), values, tags)
+        self._update_rollups(filename, numbers)
+
+    def _set_values(self, node, values, tags):
+        "Set the values and tags of a node, whether or not it is on the tree yet."
+        self._coverage[node] = (values, tags)
+        if node in self._children:
+            self.item(node, values=values, tags=tags)
+
+    def _update_rollups(self, filename, numbers):
+        """Update the totals of every directory containing a file.
+
+        Only the change in the file's counts is applied, so the cost
+        depends on the depth of the file, not the size of the tree.
+        """
+        node = nodify(filename)
+        old = self._numbers.pop(node, None)
+        new = tuple(numbers.init_args()) if numbers is not None else None
+        if new is not None:
+            self._numbers[node] = new
+        if old == new:
+            return
+
+        from coverage.results import Numbers
+
+        width = len(new or old)
+        delta = [n - o for n, o in zip(new or (0,) * width, old or (0,) * width)]
+
+        dirname = os.path.dirname(filename)
+        while True:
+            dir_node = nodify(dirname)
+            totals = self._rollups.get(dir_node, (0,) * width)
+            totals = tuple(t + d for t, d in zip(totals, delta))
+            self._rollups[dir_node] = totals
+
+            summary = Numbers(*totals)
+            if summary.n_statements:
+                self._set_values(
+                    dir_node,
+                    (coverage_str(summary), summary.n_statements, summary.n_missing, branch_coverage_str(summary)),
+                    [coverage_bucket(summary.pc_covered)]
+                )
+            else:
+                self._set_values(dir_node, ('', '', '', ''), ['directory'])
+
+            # Stop at the root of the tree (or of the filesystem).
+            parent = os.path.dirname(dirname)
+            if dirname == self.root or parent == dirname:
+                break
+            dirname = parent
+
+    def filter(self, query):
+        """Only display the files whose paths match a query.
+
+        Paths are matched as substrings or, if no path contains the query,
+        fuzzily (see `PathIndex`). An empty query displays every file.
+        """
+        query = query.strip()
+        if query == self._query and len(self.index) == self._query_size:
+            return
+        self._query = query
+        self._query_size = len(self.index)
+
+        if not query:
+            self._show_children(None)
+            return
+
+        with timing.span('filter', query=query):
+            matches = self.index.search(query)
+            reveal = len(matches) <= FILTER_OPEN_LIMIT
+            parents = self._parents
+            visible = set()
+            for node in matches:
+                if reveal and node not in parents:
+                    self._reveal(node)
+                while node in parents and node not in visible:
+                    visible.add(node)
+                    node = parents[node]
+
+            self._show_children(visible)
+            if reveal:
+                for node in visible:
+                    if self._children[node]:
+                        self.item(node, open=True)
+
+    def _reveal(self, node):
+        "In lazy mode, scan the directories containing a file, so it is added to the tree."
+        while node not in self._children:
+            # Find the closest directory that is on the tree.
+            dir_node = os.path.dirname(node)
+            while dir_node not in self._children:
+                parent = os.path.dirname(dir_node)
+                if parent == dir_node:
+                    return
+                dir_node = parent
+
+            if dir_node not in self._unpopulated:
+                return
+            self._populate(dir_node)
+
+    def _show_children(self, visible):
+        """Attach only the visible nodes to the tree.
+
+        If visible is None, every node is attached. Only the parents
+        whose visible children have changed are updated.
+        """
+        shown = {}
+        if visible is not None:
+            for node in visible:
+                shown.setdefault(self._parents[node], []).append(node)
+            shown.setdefault('', [])
+            for children in shown.values():
+                children.sort()
+
+        for parent in set(shown) | set(self._filtered):
+            children = shown.get(parent)
+            if children is None:
+                children = self._children[parent]
+                if parent in self._unpopulated:
+                    children = children + [self._placeholder(parent)]
+            if children != self._filtered.get(parent):
+                self.set_children(parent, *children)
+
+        self._filtered = shown
+
+    def on_open(self, event):
+        "When a directory is expanded for the first time, scan it."
+        node = self.focus()
+        if node in self._unpopulated:
+            self._populate(node)
+
     def selection_set(self, node):
         """Node names on the file tree are the filename.
 
@@ -155,3 +850,132 @@ class FileView(ttk.Treeview):
         in object IDs filenames cause problems with Tk.
         """
         ttk.Treeview.selection_set(self, nodify(node))
+
+
+class RankingView(ttk.Treeview):
+    """A list of the files with the worst coverage, worst first.
+
+    Files can be ranked by missing lines or by coverage percentage;
+    clicking on a column heading changes the ranking.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs['selectmode'] = 'browse'
+        self.normalizer = kwargs.pop('normalizer')
+        self.limit = kwargs.pop('limit', RANKING_LIMIT)
+        ttk.Treeview.__init__(self, *args, **kwargs)
+
+        # Every ranking is kept up to date, so switching is immediate.
+        self.rankings = dict((name, Ranking(key)) for name, _, key in RANKINGS)
+        self.order = RANKINGS[0][0]
+
+        # The text, values and tags of each ranked file; the files on
+        # display, and the files that have changed since the last refresh.
+        self._display = {}
+        self._shown = []
+        self._changed = set()
+
+        self['columns'] = ('coverage', 'statements', 'missing')
+        self.column('#0', width=200)
+        self.column('coverage', width=50, anchor='center')
+        self.column('statements', width=50, anchor='e')
+        self.column('missing', width=50, anchor='e')
+        self.heading('#0', text='File')
+        self.heading('statements', text='Stmts')
+        self._show_headings()
+
+        configure_bucket_tags(self)
+
+    def _show_headings(self):
+        "Label the headings that change the ranking, marking the current one."
+        for column, order, label in [('coverage', 'coverage', 'Cov'), ('missing', 'missing', 'Miss')]:
+            self.heading(
+                column,
+                text=label + (u' \u25bc' if order == self.order else ''),
+                command=lambda order=order: self.set_order(order)
+            )
+
+    def set_coverage(self, filename, coverage, tags, numbers=None):
+        """Set the coverage value and tags for a file.
+
+        The file is ranked if it has statements; the display isn't
+        updated until the next `refresh()`.
+        """
+        node = nodify(filename)
+        for ranking in self.rankings.values():
+            ranking.update(node, numbers)
+
+        if numbers is not None and numbers.n_statements:
+            self._display[node] = (
+                self.normalizer(filename),
+                (coverage, numbers.n_statements, numbers.n_missing),
+                tags
+            )
+        else:
+            self._display.pop(node, None)
+        self._changed.add(node)
+
+    def set_order(self, order):
+        "Change the ranking that is displayed."
+        self.order = order
+        self._show_headings()
+        self.refresh()
+
+    def refresh(self):
+        "Display the files at the top of the ranking, updating only the rows that have changed."
+        top = self.rankings[self.order].top(self.limit)
+        changed, self._changed = self._changed, set()
+        if top == self._shown and changed.isdisjoint(top):
+            return
+
+        shown = set(self._shown)
+        for node in top:
+            if node not in shown:
+                text, values, tags = self._display[node]
+                self.insert('', 'end', node, text=text, values=values, tags=tags)
+            elif node in changed:
+                text, values, tags = self._display[node]
+                self.item(node, values=values, tags=tags)
+
+        removed = shown.difference(top)
+        if removed:
+            self.delete(*removed)
+        if top != self._shown:
+            self.set_children('', *top)
+        self._shown = top
+
+
+class Sparkline(tk.Canvas):
+    """A small line chart of recent coverage percentages.
+
+    The line is drawn in the color of the most recent value's bucket,
+    with a dot marking the most recent value.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('width', 120)
+        kwargs.setdefault('height', 24)
+        kwargs.setdefault('highlightthickness', 0)
+        tk.Canvas.__init__(self, *args, **kwargs)
+        self.values = []
+
+    def set_values(self, values):
+        "Draw a new set of values, oldest first."
+        self.values = list(values)
+        self.delete('all')
+        if len(self.values) < 2:
+            return
+
+        width = int(self['width'])
+        height = int(self['height'])
+        low = min(self.values)
+        high = max(max(self.values), low + SPARKLINE_MIN_RANGE)
+        step = float(width - 4) / (len(self.values) - 1)
+
+        points = []
+        for i, value in enumerate(self.values):
+            points.append(2 + i * step)
+            points.append(height - 2 - (value - low) * (height - 4) / (high - low))
+
+        color = BUCKET_COLORS[coverage_bucket(self.values[-1])]
+        self.create_line(*points, fill=color)
+        x, y = points[-2:]
+        self.create_oval(x - 2, y - 2, x + 2, y + 2, fill=color, outline=color)
@@ -1,8 +1,41 @@
 #/usr/bin/env python
+import os
 import sys
 
 from setuptools import setup
-from duvet import VERSION
+from setuptools.command.build_py import build_py
+from setuptools.command.sdist import sdist
+from duvet import get_version
+
+VERSION = get_version()
+
+VERSION_FILE = '''# This file is generated by setup.py
+VERSION = %r
+'''
+
+
+def write_version(base_dir):
+    "Record the version, so it doesn't need to be computed at runtime."
+    with open(os.path.join(base_dir, 'duvet', '_version.py'), 'w') as f:
+        f.write(VERSION_FILE % VERSION)
+
+
+class BuildWithVersion(build_py):
+    def run(self):
+        build_py.run(self)
+        if not self.dry_run:
+            write_version(self.build_lib)
+
+
+class SdistWithVersion(sdist):
+    def make_release_tree(self, base_dir, files):
+        sdist.make_release_tree(self, base_dir, files)
+        if not self.dry_run:
+            # The release tree may hard link to the source tree.
+            target = os.path.join(base_dir, 'duvet', '_version.py')
+            if os.path.exists(target):
+                os.remove(target)
+            write_version(base_dir)
 
 try:
     readme = open('README.rst')
@@ -35,6 +68,10 @@ setup(
             'duvet = duvet.__main__:main',
         ]
     },
+    cmdclass={
+        'build_py': BuildWithVersion,
+        'sdist': SdistWithVersion,
+    },
     license='New BSD',
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -0,0 +1,28 @@
+import unittest
+
+from coverage.results import Numbers
+
+from duvet.analysis import branch_coverage_str, coverage_str, percent_str
+
+
+class PercentStrTest(unittest.TestCase):
+    def test_fixed_precision(self):
+        self.assertEqual(percent_str(9, 11), '81.8')
+        self.assertEqual(percent_str(1, 2), '50.0')
+        self.assertEqual(percent_str(0, 0), '100.0')
+
+    def test_never_rounded_to_0_or_100(self):
+        self.assertEqual(percent_str(0, 2000), '0.0')
+        self.assertEqual(percent_str(1, 2000), '0.1')
+        self.assertEqual(percent_str(1999, 2000), '99.9')
+        self.assertEqual(percent_str(2000, 2000), '100.0')
+
+    def test_coverage_str(self):
+        self.assertEqual(coverage_str(Numbers(1, 11, 0, 2)), '81.8')
+        # Branches count towards the total, as in coverage's reports.
+        self.assertEqual(coverage_str(Numbers(1, 6, 0, 1, 4, 1, 1)), '80.0')
+
+    def test_branch_coverage_str(self):
+        self.assertEqual(branch_coverage_str(Numbers(1, 10, 0, 0, 4, 1, 1)), '75.0')
+        self.assertEqual(branch_coverage_str(Numbers(1, 10, 0, 0)), '')
+        self.assertEqual(branch_coverage_str(None), '')
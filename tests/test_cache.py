@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from coverage.results import Numbers
+
+from duvet.analysis import FileResult
+from duvet.cache import AnalysisCache, config_hash, measured_hash
+from duvet.lines import LineSet
+
+
+class Config(object):
+    "The analysis options of a coverage configuration."
+    def __init__(self, exclude_list=(), partial_list=(), partial_always_list=()):
+        self.exclude_list = list(exclude_list)
+        self.partial_list = list(partial_list)
+        self.partial_always_list = list(partial_always_list)
+
+
+class HashTest(unittest.TestCase):
+    def test_measured_hash_ignores_order(self):
+        self.assertEqual(measured_hash([3, 1, 2]), measured_hash([1, 2, 3]))
+        self.assertNotEqual(measured_hash([1, 2]), measured_hash([1, 2, 3]))
+
+    def test_measured_hash_arcs(self):
+        self.assertEqual(measured_hash([(1, 2), (-1, 1)]), measured_hash([(-1, 1), (1, 2)]))
+        self.assertNotEqual(measured_hash([(1, 2)]), measured_hash([(2, 1)]))
+
+    def test_measured_hash_config(self):
+        self.assertNotEqual(measured_hash([1, 2], b'a'), measured_hash([1, 2], b'b'))
+
+    def test_config_hash(self):
+        base = config_hash(Config(['pragma: no cover']), False)
+        self.assertEqual(base, config_hash(Config(['pragma: no cover']), False))
+        self.assertNotEqual(base, config_hash(Config(['pragma: no cover', 'return']), False))
+        self.assertNotEqual(base, config_hash(Config(['pragma: no cover'], ['if x:']), False))
+        self.assertNotEqual(base, config_hash(Config(['pragma: no cover'], [], ['while True:']), False))
+        self.assertNotEqual(base, config_hash(Config(['pragma: no cover']), True))
+
+
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.normcase(os.path.join(self.directory, 'module.py'))
+        with open(self.filename, 'w') as f:
+            f.write('a = 1\nb = 2\nif a:\n    c = 3\n')
+        self.cache = AnalysisCache(os.path.join(self.directory, 'cache'))
+        self.result = FileResult(
+            self.filename,
+            statements=LineSet([1, 2, 3, 4]),
+            missing=LineSet([4]),
+            excluded=LineSet(),
+            partial=LineSet([3]),
+            numbers=Numbers(1, 4, 0, 1, 2, 1, 1),
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_missing_entry(self):
+        self.assertIsNone(self.cache.get(self.filename, [1, 2, 3]))
+
+    def test_round_trip(self):
+        self.cache.put(self.result, [1, 2, 3])
+        result = self.cache.get(self.filename, [1, 2, 3])
+        self.assertEqual(result.filename, self.filename)
+        self.assertEqual(result.statements, self.result.statements)
+        self.assertEqual(result.missing, self.result.missing)
+        self.assertEqual(result.excluded, self.result.excluded)
+        self.assertEqual(result.partial, self.result.partial)
+        self.assertEqual(result.numbers.init_args(), self.result.numbers.init_args())
+
+    def test_measured_lines_changed(self):
+        self.cache.put(self.result, [1, 2, 3])
+        self.assertIsNone(self.cache.get(self.filename, [1, 2, 3, 4]))
+
+    def test_config_changed(self):
+        self.cache.put(self.result, [1, 2, 3])
+        cache = AnalysisCache(self.cache.directory, config=config_hash(Config(['return']), False))
+        self.assertIsNone(cache.get(self.filename, [1, 2, 3]))
+
+    def test_source_changed(self):
+        self.cache.put(self.result, [1, 2, 3])
+        with open(self.filename, 'a') as f:
+            f.write('d = 4\n')
+        self.assertIsNone(self.cache.get(self.filename, [1, 2, 3]))
+
+    def test_source_touched(self):
+        self.cache.put(self.result, [1, 2, 3])
+        later = time.time() + 10
+        os.utime(self.filename, (later, later))
+        self.assertIsNotNone(self.cache.get(self.filename, [1, 2, 3]))
+
+    def test_unanalyzed_files_not_cached(self):
+        self.cache.put(self.result._replace(numbers=None), [1, 2, 3])
+        self.assertIsNone(self.cache.get(self.filename, [1, 2, 3]))
+
+    def test_prune(self):
+        self.cache.put(self.result, [1, 2, 3])
+        self.cache.max_size = 0
+        self.cache.prune()
+        self.assertIsNone(self.cache.get(self.filename, [1, 2, 3]))
@@ -0,0 +1,90 @@
+import unittest
+
+from coverage.results import Numbers
+
+from duvet.analysis import FileResult
+from duvet.diff import CoverageDiff, compare
+from duvet.lines import LineSet
+
+
+def result(filename, statements, missing):
+    "A result for a file with the given statement and missing lines."
+    return FileResult(
+        filename,
+        statements=LineSet(statements),
+        missing=LineSet(missing),
+        excluded=LineSet(),
+        partial=LineSet(),
+        numbers=Numbers(1, len(statements), 0, len(missing)),
+    )
+
+
+class CompareTest(unittest.TestCase):
+    def test_unchanged(self):
+        self.assertEqual(compare('a.py', result('a.py', [1, 2], [2]), result('a.py', [1, 2], [2])), None)
+
+    def test_added(self):
+        new = result('a.py', [1, 2], [2])
+        change = compare('a.py', None, new)
+        self.assertEqual(change.old, None)
+        self.assertTrue(change.new is new)
+        self.assertTrue(change.coverage_changed)
+        self.assertTrue(change.bucket_changed)
+        self.assertTrue(change.lines_changed)
+
+    def test_removed(self):
+        change = compare('a.py', result('a.py', [1, 2], [2]), None)
+        self.assertEqual(change.new, None)
+        self.assertTrue(change.coverage_changed)
+        self.assertTrue(change.lines_changed)
+
+    def test_percentage_changed(self):
+        # 90.0% and 95.0% are both "good".
+        old = result('a.py', list(range(1, 21)), [1, 2])
+        new = result('a.py', list(range(1, 21)), [1])
+        change = compare('a.py', old, new)
+        self.assertTrue(change.coverage_changed)
+        self.assertFalse(change.bucket_changed)
+        self.assertTrue(change.lines_changed)
+
+    def test_bucket_changed(self):
+        old = result('a.py', list(range(1, 11)), [1])
+        new = result('a.py', list(range(1, 11)), [1, 2, 3, 4])
+        change = compare('a.py', old, new)
+        self.assertTrue(change.coverage_changed)
+        self.assertTrue(change.bucket_changed)
+
+    def test_lines_changed(self):
+        # The same number of missing lines, so the percentage is the same.
+        change = compare('a.py', result('a.py', [1, 2], [1]), result('a.py', [1, 2], [2]))
+        self.assertFalse(change.coverage_changed)
+        self.assertFalse(change.bucket_changed)
+        self.assertTrue(change.lines_changed)
+
+
+class CoverageDiffTest(unittest.TestCase):
+    def test_diff(self):
+        previous = {
+            'same.py': result('same.py', [1, 2], [2]),
+            'changed.py': result('changed.py', [1, 2], [2]),
+            'removed.py': result('removed.py', [1], []),
+        }
+        diff = CoverageDiff(previous)
+        self.assertEqual(diff.update(result('same.py', [1, 2], [2])), None)
+        change = diff.update(result('changed.py', [1, 2], []))
+        self.assertEqual(change.filename, 'changed.py')
+        self.assertTrue(change.coverage_changed)
+        change = diff.update(result('added.py', [1], [1]))
+        self.assertEqual((change.filename, change.old), ('added.py', None))
+
+        removed, = diff.removed()
+        self.assertEqual(removed.filename, 'removed.py')
+        self.assertTrue(removed.old is previous['removed.py'])
+        self.assertEqual(removed.new, None)
+
+    def test_snapshot(self):
+        # Changes to the previous results don't affect the comparison.
+        previous = {'a.py': result('a.py', [1], [])}
+        diff = CoverageDiff(previous)
+        del previous['a.py']
+        self.assertEqual(len(diff.removed()), 1)
@@ -0,0 +1,131 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from coverage.results import Numbers
+
+from duvet.analysis import FileResult
+from duvet.gitdiff import changed_coverage, changed_lines, parse_diff
+from duvet.lines import LineSet
+
+
+ROOT = os.path.join(os.sep, 'repo')
+
+
+def path(name):
+    return os.path.normcase(os.path.join(ROOT, name))
+
+
+DIFF = '''diff --git a/doc.py b/doc.py
+index 1111111..2222222 100644
+--- a/doc.py
++++ b/doc.py
+@@ -3,0 +4,2 @@ def f():
++x = 1
++++ counter
+@@ -10 +12 @@ def g():
+-y = 1
++y = 2
+diff --git a/new.py b/new.py
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1,3 @@
++a = 1
++b = 2
++c = 3
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+index 4444444..0000000
+--- a/gone.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-a = 1
+-b = 2
+diff --git a/trimmed.py b/trimmed.py
+index 5555555..6666666 100644
+--- a/trimmed.py
++++ b/trimmed.py
+@@ -5,2 +4,0 @@
+--- removed
+-z = 1
+'''
+
+
+class ParseDiffTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_diff(DIFF, ROOT), {
+            path('doc.py'): LineSet([4, 5, 12]),
+            path('new.py'): LineSet([1, 2, 3]),
+            path('trimmed.py'): LineSet(),
+        })
+
+    def test_added_line_that_looks_like_a_header(self):
+        # "++ counter" is added as "+++ counter"; it isn't a new file.
+        changed = parse_diff(DIFF, ROOT)
+        self.assertFalse(path('counter') in changed)
+        self.assertTrue(12 in changed[path('doc.py')])
+
+    def test_empty(self):
+        self.assertEqual(parse_diff('', ROOT), {})
+
+
+class ChangedCoverageTest(unittest.TestCase):
+    def test_changed_coverage(self):
+        result = FileResult(
+            path('doc.py'),
+            statements=LineSet([1, 4, 5, 12]),
+            missing=LineSet([5, 12]),
+            excluded=LineSet(),
+            partial=LineSet(),
+            numbers=Numbers(1, 4, 0, 2),
+        )
+        changed = {path('doc.py'): LineSet([4, 5, 6, 12])}
+        self.assertEqual(changed_coverage(result, changed), (LineSet([4, 5, 12]), LineSet([5, 12])))
+        self.assertEqual(changed_coverage(result, {}), (LineSet(), LineSet()))
+
+
+def git(*args, **kwargs):
+    subprocess.check_call(('git',) + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+
+@unittest.skipIf(not hasattr(os, 'symlink'), 'Symlinks are not available')
+class ChangedLinesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repo = os.path.join(self.directory, 'repo')
+        os.mkdir(self.repo)
+        try:
+            git('init', '-q', self.repo)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.rmtree(self.directory)
+            self.skipTest('git is not available')
+        with open(os.path.join(self.repo, 'doc.py'), 'w') as f:
+            f.write('a = 1\n')
+        git('add', 'doc.py', cwd=self.repo)
+        git('-c', 'user.name=duvet', '-c', 'user.email=duvet@example.com', 'commit', '-q', '-m', 'Initial', cwd=self.repo)
+        with open(os.path.join(self.repo, 'doc.py'), 'a') as f:
+            f.write('b = 2\n')
+
+        # The project is opened through a symlink to the repository.
+        self.link = os.path.join(self.directory, 'link')
+        os.symlink(self.repo, self.link)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_symlinked_project(self):
+        changed = changed_lines('HEAD', self.link)
+        filename = os.path.join(self.link, 'doc.py')
+        result = FileResult(
+            filename,
+            statements=LineSet([1, 2]),
+            missing=LineSet([2]),
+            excluded=LineSet(),
+            partial=LineSet(),
+            numbers=Numbers(1, 2, 0, 1),
+        )
+        self.assertEqual(changed_coverage(result, changed), (LineSet([2]), LineSet([2])))
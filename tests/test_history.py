@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from duvet.history import FILE_RECORD, MAGIC, RUN_RECORD, History
+
+
+def totals(files):
+    "Add up the numbers of every file."
+    result = [0] * 7
+    for numbers in files.values():
+        result = [a + b for a, b in zip(result, numbers)]
+    return result
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history = History(os.path.join(self.directory, '.duvet_history'))
+        self.files = {
+            '/project/a.py': (1, 10, 0, 2, 0, 0, 0),
+            '/project/b.py': (1, 20, 1, 5, 4, 1, 2),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, files, timestamp=None):
+        return self.history.append(totals(files), files, timestamp=timestamp)
+
+    def test_empty(self):
+        self.assertEqual(len(self.history), 0)
+        self.assertEqual(self.history.runs(), [])
+        self.assertRaises(IndexError, self.history.snapshot, -1)
+
+    def test_append(self):
+        self.assertTrue(self.append(self.files, timestamp=1000.0))
+        self.assertEqual(len(self.history), 1)
+        run, = self.history.runs()
+        self.assertEqual(run.index, 0)
+        self.assertEqual(run.timestamp, 1000.0)
+        self.assertEqual(run.totals, (2, 30, 1, 7, 4, 1, 2))
+        self.assertEqual(self.history.snapshot(0), self.files)
+
+    def test_unchanged_run_not_recorded(self):
+        self.assertTrue(self.append(self.files))
+        # Numbers given as lists (as returned by init_args()) are the same.
+        files = dict((filename, list(numbers)) for filename, numbers in self.files.items())
+        self.assertFalse(self.append(files))
+        self.assertEqual(len(self.history), 1)
+
+    def test_snapshots(self):
+        self.append(self.files)
+        changed = dict(self.files)
+        changed['/project/a.py'] = (1, 10, 0, 0, 0, 0, 0)
+        changed['/project/c.py'] = (1, 5, 0, 5, 0, 0, 0)
+        del changed['/project/b.py']
+        self.append(changed)
+
+        self.assertEqual(self.history.snapshot(0), self.files)
+        self.assertEqual(self.history.snapshot(1), changed)
+        self.assertEqual(self.history.snapshot(-1), changed)
+        self.assertEqual(self.history.snapshot(-2), self.files)
+        self.assertRaises(IndexError, self.history.snapshot, 2)
+        self.assertRaises(IndexError, self.history.snapshot, -3)
+
+    def test_runs_last(self):
+        for missing in range(10):
+            files = {'/project/a.py': (1, 10, 0, missing, 0, 0, 0)}
+            self.append(files, timestamp=1000.0 + missing)
+        runs = self.history.runs(last=3)
+        self.assertEqual([run.index for run in runs], [7, 8, 9])
+        self.assertEqual([run.totals[3] for run in runs], [7, 8, 9])
+        self.assertEqual(len(self.history.runs(last=100)), 10)
+
+    def test_deltas(self):
+        self.append(self.files)
+        current = {
+            '/project/a.py': (1, 10, 0, 2, 0, 0, 0),
+            '/project/b.py': (1, 20, 1, 3, 4, 1, 2),
+            '/project/c.py': (1, 5, 0, 5, 0, 0, 0),
+        }
+        self.assertEqual(self.history.deltas(0, current), {
+            '/project/b.py': (self.files['/project/b.py'], current['/project/b.py']),
+            '/project/c.py': (None, current['/project/c.py']),
+        })
+        del current['/project/a.py']
+        self.assertEqual(
+            self.history.deltas(0, current)['/project/a.py'],
+            (self.files['/project/a.py'], None)
+        )
+
+    def test_reopen(self):
+        self.append(self.files)
+        history = History(self.history.directory)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history.snapshot(-1), self.files)
+        # New paths get new IDs after existing ones.
+        files = dict(self.files)
+        files['/project/c.py'] = (1, 1, 0, 0, 0, 0, 0)
+        self.assertTrue(history.append(totals(files), files))
+        self.assertEqual(History(self.history.directory).snapshot(-1), files)
+
+    def test_fixed_size_records(self):
+        self.append(self.files)
+        self.append({'/project/a.py': (1, 10, 0, 0, 0, 0, 0)})
+        runs = os.path.join(self.history.directory, 'runs')
+        files = os.path.join(self.history.directory, 'files')
+        self.assertEqual(os.path.getsize(runs), len(MAGIC) + 2 * RUN_RECORD.size)
+        self.assertEqual(os.path.getsize(files), len(MAGIC) + 3 * FILE_RECORD.size)
+
+    def test_interrupted_write(self):
+        self.append(self.files)
+        # A partial run record is ignored, and overwritten by the next run.
+        with open(os.path.join(self.history.directory, 'runs'), 'ab') as f:
+            f.write(b'\x00' * (RUN_RECORD.size // 2))
+        self.assertEqual(len(self.history), 1)
+
+        changed = {'/project/a.py': (1, 10, 0, 0, 0, 0, 0)}
+        self.assertTrue(self.append(changed))
+        self.assertEqual(len(self.history), 2)
+        self.assertEqual(self.history.snapshot(-1), changed)
+        self.assertEqual(self.history.snapshot(0), self.files)
+
+    def test_interrupted_path_write(self):
+        self.append(self.files)
+        # A partial path is ignored, and overwritten by the next new path.
+        with open(os.path.join(self.history.directory, 'paths'), 'ab') as f:
+            f.write(b'/project/partial')
+        history = History(self.history.directory)
+        self.assertEqual(history.snapshot(-1), self.files)
+
+        files = dict(self.files)
+        files['/project/c.py'] = (1, 1, 0, 0, 0, 0, 0)
+        self.assertTrue(history.append(totals(files), files))
+        self.assertEqual(History(self.history.directory).snapshot(-1), files)
+
+    def test_missing_files_log(self):
+        self.append(self.files)
+        os.remove(os.path.join(self.history.directory, 'files'))
+        self.assertEqual(self.history.snapshot(-1), {})
+        # An empty file can't be memory mapped either.
+        open(os.path.join(self.history.directory, 'files'), 'wb').close()
+        self.assertEqual(self.history.snapshot(-1), {})
@@ -0,0 +1,64 @@
+import pickle
+import unittest
+from array import array
+
+from duvet.lines import LineSet
+
+
+class LineSetTest(unittest.TestCase):
+    def test_sorted_and_unique(self):
+        lines = LineSet([5, 1, 3, 1, 5])
+        self.assertEqual(list(lines), [1, 3, 5])
+        self.assertEqual(len(lines), 3)
+
+    def test_empty(self):
+        lines = LineSet()
+        self.assertEqual(len(lines), 0)
+        self.assertEqual(list(lines), [])
+        self.assertFalse(1 in lines)
+
+    def test_contains(self):
+        lines = LineSet([2, 4, 6])
+        self.assertTrue(4 in lines)
+        self.assertFalse(3 in lines)
+        self.assertFalse(7 in lines)
+        self.assertFalse(0 in lines)
+
+    def test_from_sorted(self):
+        source = array('I', [1, 2, 3])
+        lines = LineSet.from_sorted(source)
+        self.assertTrue(lines.lines is source)
+        self.assertEqual(LineSet.from_sorted([1, 2, 3]), LineSet([3, 2, 1]))
+
+    def test_indexing(self):
+        lines = LineSet([10, 20, 30, 40])
+        self.assertEqual(lines[0], 10)
+        self.assertEqual(lines[-1], 40)
+        self.assertEqual(lines[1:3], LineSet([20, 30]))
+
+    def test_equality(self):
+        self.assertEqual(LineSet([1, 2]), LineSet([2, 1]))
+        self.assertNotEqual(LineSet([1, 2]), LineSet([1, 3]))
+        self.assertNotEqual(LineSet([1, 2]), [1, 2])
+
+    def test_between(self):
+        lines = LineSet([1, 5, 10, 15, 20])
+        self.assertEqual(lines.between(5, 15), LineSet([5, 10, 15]))
+        self.assertEqual(lines.between(6, 9), LineSet())
+        self.assertEqual(lines.between(0, 100), lines)
+
+    def test_difference(self):
+        lines = LineSet([1, 2, 3, 4, 5])
+        self.assertEqual(lines - LineSet([2, 4, 6]), LineSet([1, 3, 5]))
+        self.assertEqual(lines.difference([5, 1]), LineSet([2, 3, 4]))
+        self.assertEqual(lines - LineSet(), lines)
+
+    def test_pickle(self):
+        lines = LineSet([3, 1, 2])
+        self.assertEqual(pickle.loads(pickle.dumps(lines)), lines)
+
+    def test_intersection(self):
+        lines = LineSet([1, 2, 3, 4, 5])
+        self.assertEqual(lines & LineSet([2, 4, 6]), LineSet([2, 4]))
+        self.assertEqual(lines.intersection([5, 0, 1]), LineSet([1, 5]))
+        self.assertEqual(lines & LineSet(), LineSet())
@@ -0,0 +1,95 @@
+import random
+import unittest
+
+from coverage.results import Numbers
+
+from duvet import ranking
+from duvet.ranking import RANKINGS, Ranking, SortedList
+
+
+def numbers(statements, missing):
+    return Numbers(1, statements, 0, missing)
+
+
+class SortedListTest(unittest.TestCase):
+    def setUp(self):
+        # Use small blocks, so that blocks are split and emptied.
+        self.max_block_size = ranking.MAX_BLOCK_SIZE
+        ranking.MAX_BLOCK_SIZE = 4
+
+    def tearDown(self):
+        ranking.MAX_BLOCK_SIZE = self.max_block_size
+
+    def test_add_and_remove(self):
+        rng = random.Random(1)
+        items = SortedList()
+        expected = []
+        for _ in range(500):
+            if expected and rng.random() < 0.4:
+                item = rng.choice(expected)
+                expected.remove(item)
+                items.remove(item)
+            else:
+                item = rng.randint(0, 100)
+                expected.append(item)
+                items.add(item)
+            self.assertEqual(list(items), sorted(expected))
+            self.assertEqual(len(items), len(expected))
+
+    def test_head(self):
+        items = SortedList()
+        for item in [5, 3, 9, 1, 7]:
+            items.add(item)
+        self.assertEqual(items.head(3), [1, 3, 5])
+        self.assertEqual(items.head(10), [1, 3, 5, 7, 9])
+
+    def test_remove_missing(self):
+        items = SortedList()
+        self.assertRaises(ValueError, items.remove, 1)
+        items.add(1)
+        self.assertRaises(ValueError, items.remove, 2)
+
+
+class RankingTest(unittest.TestCase):
+    def ranking(self, name):
+        return Ranking(dict((n, key) for n, _, key in RANKINGS)[name])
+
+    def test_most_missing(self):
+        files = self.ranking('missing')
+        files.update('a.py', numbers(100, 10))
+        files.update('b.py', numbers(10, 5))
+        files.update('c.py', numbers(50, 20))
+        self.assertEqual(files.top(10), ['c.py', 'a.py', 'b.py'])
+        self.assertEqual(files.top(1), ['c.py'])
+
+    def test_lowest_coverage(self):
+        files = self.ranking('coverage')
+        files.update('a.py', numbers(100, 10))
+        files.update('b.py', numbers(10, 5))
+        files.update('c.py', numbers(50, 20))
+        self.assertEqual(files.top(10), ['b.py', 'c.py', 'a.py'])
+
+    def test_ties_broken_by_filename(self):
+        files = self.ranking('missing')
+        files.update('b.py', numbers(10, 5))
+        files.update('a.py', numbers(10, 5))
+        self.assertEqual(files.top(10), ['a.py', 'b.py'])
+
+    def test_update(self):
+        files = self.ranking('missing')
+        files.update('a.py', numbers(100, 10))
+        files.update('b.py', numbers(100, 5))
+        files.update('b.py', numbers(100, 50))
+        self.assertEqual(files.top(10), ['b.py', 'a.py'])
+        self.assertEqual(len(files), 2)
+
+    def test_remove(self):
+        files = self.ranking('missing')
+        files.update('a.py', numbers(100, 10))
+        files.update('b.py', numbers(100, 5))
+        files.update('a.py', None)
+        self.assertEqual(files.top(10), ['b.py'])
+        # Files with no statements aren't ranked.
+        files.update('b.py', numbers(0, 0))
+        self.assertEqual(files.top(10), [])
+        self.assertEqual(len(files), 0)
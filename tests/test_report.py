@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import coverage
+from coverage.results import Numbers
+
+from duvet.analysis import FileResult, filename_normalizer
+from duvet.lines import LineSet
+from duvet.report import FAIL_UNDER_STATUS, JSONReporter, TableReporter, main
+
+
+SOURCE = '''def add(a, b):
+    return a + b
+
+
+def subtract(a, b):
+    return a - b
+'''
+
+
+def result(filename, statements, missing):
+    return FileResult(
+        filename,
+        statements=LineSet(statements),
+        missing=LineSet(missing),
+        excluded=LineSet(),
+        partial=LineSet(),
+        numbers=Numbers(1, len(statements), 0, len(missing)),
+    )
+
+
+class ReporterTest(unittest.TestCase):
+    base = os.path.normcase(os.path.join(os.sep, 'project'))
+
+    def setUp(self):
+        self.output = StringIO()
+        self.normalizer = filename_normalizer(self.base)
+        self.covered = result(os.path.join(self.base, 'covered.py'), [1, 2, 5, 6], [])
+        self.partial = result(os.path.join(self.base, 'partial.py'), [1, 2, 3, 4], [3, 4])
+        self.missing = FileResult(os.path.join(self.base, 'gone.py'), LineSet(), LineSet(), LineSet(), LineSet(), None)
+
+    def json_lines(self):
+        return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+    def test_json(self):
+        reporter = JSONReporter(self.output, self.normalizer)
+        reporter.start(3)
+        for r in (self.covered, self.partial, self.missing):
+            reporter.file(r)
+        reporter.done(self.covered.numbers + self.partial.numbers)
+
+        lines = self.json_lines()
+        self.assertEqual(lines[0], {'files': 3})
+        self.assertEqual(lines[1]['file'], 'covered.py')
+        self.assertEqual(lines[1]['coverage'], 100.0)
+        self.assertEqual(lines[1]['bucket'], 'perfect')
+        self.assertEqual(lines[2]['missing'], 2)
+        self.assertEqual(lines[2]['missing_lines'], [[3, 4]])
+        self.assertEqual(lines[3], {'file': 'gone.py', 'bucket': 'nosource'})
+        self.assertEqual(lines[4]['total']['statements'], 8)
+        self.assertEqual(lines[4]['total']['coverage'], 75.0)
+        self.assertFalse('changed' in lines[4])
+
+    def test_json_diff(self):
+        reporter = JSONReporter(self.output, self.normalizer)
+        reporter.diff({self.partial.filename: LineSet([2, 3])})
+        reporter.start(2)
+        reporter.file(self.covered)
+        reporter.file(self.partial)
+        reporter.done(self.covered.numbers + self.partial.numbers)
+
+        lines = self.json_lines()
+        self.assertEqual(lines[1]['changed_statements'], 0)
+        self.assertEqual(lines[2]['changed_statements'], 2)
+        self.assertEqual(lines[2]['new_missing_lines'], [[3, 3]])
+        self.assertEqual(lines[3]['changed'], {'statements': 2, 'missing': 1, 'coverage': 50.0})
+
+    def test_table(self):
+        reporter = TableReporter(self.output, self.normalizer)
+        reporter.start(2)
+        reporter.file(self.partial)
+        reporter.file(self.missing)
+        reporter.done(self.partial.numbers)
+
+        lines = self.output.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Name'))
+        self.assertEqual(lines[1], '-' * len(lines[0]))
+        self.assertEqual(lines[4], lines[1])
+        self.assertEqual(lines[2].split()[:3], ['partial.py', '4', '2'])
+        self.assertEqual(lines[3].split(), ['gone.py', 'nosource'])
+        self.assertTrue(lines[5].startswith('TOTAL (1 files)'))
+
+    def test_table_diff(self):
+        reporter = TableReporter(self.output, self.normalizer)
+        reporter.diff({self.partial.filename: LineSet([2, 3])})
+        reporter.start(1)
+        reporter.file(self.partial)
+        reporter.done(self.partial.numbers)
+
+        lines = self.output.getvalue().splitlines()
+        self.assertTrue(lines[0].endswith('NewMiss'))
+        self.assertEqual(lines[1], '-' * len(lines[0]))
+        self.assertEqual(len(lines[2]), len(lines[0]))
+        self.assertEqual(lines[2].split()[-1], '1')
+        self.assertEqual(lines[-1], 'Changed statements: 2, not covered: 1 (50.0% covered)')
+
+
+class MainTest(unittest.TestCase):
+    "Run a report on a project with coverage data."
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = os.path.realpath(tempfile.mkdtemp())
+        filename = os.path.join(self.project, 'module.py')
+        with open(filename, 'w') as f:
+            f.write(SOURCE)
+
+        # Only add() was run.
+        try:
+            # coverage 5+
+            data = coverage.CoverageData(basename=os.path.join(self.project, '.coverage'))
+        except TypeError:
+            data = coverage.CoverageData()
+        data.add_lines({filename: dict.fromkeys([1, 2, 5])})
+        if hasattr(data, 'write_file'):
+            data.write_file(os.path.join(self.project, '.coverage'))
+        else:
+            data.write()
+
+        os.chdir(self.project)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def test_report(self):
+        output = StringIO()
+        self.assertEqual(main(['-f', 'json', '--no-cache'], output=output), 0)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(lines[0], {'files': 1})
+        self.assertEqual(lines[1]['file'], 'module.py')
+        self.assertEqual(lines[1]['missing_lines'][-1], [6, 6])
+        self.assertEqual(lines[2]['total']['files'], 1)
+        self.assertEqual(lines[2]['total']['coverage'], lines[1]['coverage'])
+
+    def test_fail_under(self):
+        self.assertEqual(main(['--no-cache', '--fail-under', '50'], output=StringIO()), 0)
+        self.assertEqual(main(['--no-cache', '--fail-under', '99'], output=StringIO()), FAIL_UNDER_STATUS)
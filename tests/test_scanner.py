@@ -0,0 +1,136 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from duvet.scanner import IgnoreRule, ProjectScanner, translate
+
+
+class TranslateTest(unittest.TestCase):
+    def assertMatches(self, pattern, path):
+        self.assertTrue(re.match(translate(pattern), path), '%r should match %r' % (pattern, path))
+
+    def assertNotMatches(self, pattern, path):
+        self.assertFalse(re.match(translate(pattern), path), '%r should not match %r' % (pattern, path))
+
+    def test_star(self):
+        self.assertMatches('*.py', 'module.py')
+        self.assertNotMatches('*.py', 'module.pyc')
+        self.assertNotMatches('*.py', 'pkg/module.py')
+
+    def test_question_mark(self):
+        self.assertMatches('file?.txt', 'file1.txt')
+        self.assertNotMatches('file?.txt', 'file/.txt')
+
+    def test_double_star(self):
+        self.assertMatches('**/build', 'build')
+        self.assertMatches('**/build', 'a/b/build')
+        self.assertMatches('docs/**', 'docs/a/b.rst')
+
+    def test_character_class(self):
+        self.assertMatches('[abc].py', 'b.py')
+        self.assertNotMatches('[abc].py', 'd.py')
+        self.assertMatches('[!abc].py', 'd.py')
+        self.assertNotMatches('[!abc].py', 'a.py')
+
+    def test_special_characters(self):
+        self.assertMatches('a+b.py', 'a+b.py')
+        self.assertNotMatches('a+b.py', 'aab.py')
+        self.assertMatches('[x', '[x')
+
+
+class IgnoreRuleTest(unittest.TestCase):
+    base = os.path.join(os.sep, 'project')
+
+    def path(self, *parts):
+        return os.path.join(self.base, *parts)
+
+    def test_name_pattern(self):
+        rule = IgnoreRule('*.pyc', self.base)
+        self.assertTrue(rule.matches(self.path('a', 'b.pyc'), 'b.pyc', False))
+        self.assertFalse(rule.matches(self.path('a', 'b.py'), 'b.py', False))
+
+    def test_directory_only(self):
+        rule = IgnoreRule('build/', self.base)
+        self.assertTrue(rule.matches(self.path('a', 'build'), 'build', True))
+        self.assertFalse(rule.matches(self.path('a', 'build'), 'build', False))
+
+    def test_anchored(self):
+        rule = IgnoreRule('/docs/build', self.base)
+        self.assertTrue(rule.matches(self.path('docs', 'build'), 'build', True))
+        self.assertFalse(rule.matches(self.path('src', 'docs', 'build'), 'build', True))
+        self.assertFalse(rule.matches(os.path.join(os.sep, 'other', 'docs', 'build'), 'build', True))
+
+    def test_negated(self):
+        rule = IgnoreRule('!keep.py', self.base)
+        self.assertTrue(rule.negated)
+        self.assertTrue(rule.matches(self.path('keep.py'), 'keep.py', False))
+
+
+class ProjectScannerTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path in [
+            'top.py',
+            'notes.txt',
+            'pkg/a.py',
+            'pkg/sub/b.py',
+            'pkg/generated.py',
+            'pkg/keep_generated.py',
+            '.hidden/c.py',
+            '__pycache__/d.py',
+            'build/e.py',
+            'myenv/pyvenv.cfg',
+            'myenv/lib/f.py',
+        ]:
+            self.write(path)
+        self.write('.gitignore', 'build/\n*generated.py\n!keep_*.py\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content=''):
+        filename = os.path.join(self.root, *path.split('/'))
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as f:
+            f.write(content)
+
+    def test_scan(self):
+        scanner = ProjectScanner(self.root)
+        subdirs, filenames = scanner.scan(self.root)
+        self.assertEqual(sorted(subdirs), ['pkg'])
+        self.assertEqual(filenames, ['top.py'])
+
+        subdirs, filenames = scanner.scan(os.path.join(self.root, 'pkg'))
+        self.assertEqual(subdirs, ['sub'])
+        self.assertEqual(sorted(filenames), ['a.py', 'keep_generated.py'])
+
+    def test_walk(self):
+        for threads in (1, 4):
+            scanner = ProjectScanner(self.root, threads=threads)
+            found = dict((dirname, sorted(filenames)) for dirname, _, filenames in scanner.walk())
+            self.assertEqual(found, {
+                self.root: ['top.py'],
+                os.path.join(self.root, 'pkg'): ['a.py', 'keep_generated.py'],
+                os.path.join(self.root, 'pkg', 'sub'): ['b.py'],
+            })
+
+    def test_extra_ignore(self):
+        scanner = ProjectScanner(self.root, ignore=['sub/'])
+        subdirs, _ = scanner.scan(os.path.join(self.root, 'pkg'))
+        self.assertEqual(subdirs, [])
+
+    def test_without_gitignore(self):
+        scanner = ProjectScanner(self.root, gitignore=False)
+        subdirs, _ = scanner.scan(self.root)
+        self.assertEqual(sorted(subdirs), ['build', 'pkg'])
+
+    def test_is_ignored(self):
+        scanner = ProjectScanner(self.root)
+        self.assertTrue(scanner.is_ignored(os.path.join(self.root, 'myenv'), True))
+        self.assertTrue(scanner.is_ignored(os.path.join(self.root, 'build'), True))
+        self.assertTrue(scanner.is_ignored(os.path.join(self.root, 'pkg', 'generated.py'), False))
+        self.assertFalse(scanner.is_ignored(os.path.join(self.root, 'pkg', 'keep_generated.py'), False))
+        self.assertFalse(scanner.is_ignored(os.path.join(self.root, 'pkg'), True))
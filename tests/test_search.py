@@ -0,0 +1,85 @@
+import unittest
+
+from duvet.search import PathIndex, char_mask
+
+
+PATHS = [
+    'duvet/view.py',
+    'duvet/widgets.py',
+    'duvet/search.py',
+    'docs/index.rst',
+    'tests/test_search.py',
+    'Setup.py',
+]
+
+
+class CharMaskTest(unittest.TestCase):
+    def test_subset(self):
+        mask = char_mask('duvet/widgets.py')
+        self.assertEqual(mask & char_mask('dvw'), char_mask('dvw'))
+
+    def test_fits_in_32_bits(self):
+        self.assertTrue(char_mask(''.join(chr(c) for c in range(32, 127))) < 2 ** 32)
+
+
+class PathIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = PathIndex()
+        for key, path in enumerate(PATHS):
+            self.index.add(key, path)
+
+    def search(self, query):
+        return sorted(PATHS[key] for key in self.index.search(query))
+
+    def test_size(self):
+        self.assertEqual(len(self.index), len(PATHS))
+        self.assertTrue(0 in self.index)
+        self.assertFalse(len(PATHS) in self.index)
+
+    def test_duplicate_key(self):
+        self.index.add(0, 'other/path.py')
+        self.assertEqual(len(self.index), len(PATHS))
+
+    def test_substring(self):
+        self.assertEqual(self.search('search'), ['duvet/search.py', 'tests/test_search.py'])
+        self.assertEqual(self.search('view'), ['duvet/view.py'])
+
+    def test_short_query(self):
+        self.assertEqual(self.search('rs'), ['docs/index.rst'])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(''), sorted(PATHS))
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.search('SETUP'), ['Setup.py'])
+        self.assertEqual(self.search('setup'), ['Setup.py'])
+
+    def test_fuzzy(self):
+        # No path contains "dvw", but one has those characters in order.
+        self.assertEqual(self.search('dvw'), ['duvet/view.py', 'duvet/widgets.py'])
+        self.assertEqual(self.search('dcsrst'), ['docs/index.rst'])
+
+    def test_substring_preferred(self):
+        # "py" is a substring of every .py path; fuzzy matches aren't added.
+        self.assertEqual(self.search('py'), sorted(p for p in PATHS if 'py' in p.lower()))
+
+    def test_no_match(self):
+        self.assertEqual(self.search('zzz'), [])
+        self.assertEqual(self.search('zz'), [])
+
+    def test_incremental(self):
+        # Extending a query gives the same results as a fresh search.
+        for query in ['d', 'du', 'duv', 'duve', 'duvew', 'duvewi', 's', 'se', 'sx']:
+            fresh = PathIndex()
+            for key, path in enumerate(PATHS):
+                fresh.add(key, path)
+            self.assertEqual(
+                sorted(self.index.search(query)),
+                sorted(fresh.search(query)),
+                'Incremental search for %r differs' % query
+            )
+
+    def test_add_after_search(self):
+        self.assertEqual(self.index.search('lines'), [])
+        self.index.add('lines', 'duvet/lines.py')
+        self.assertEqual(self.index.search('lines'), ['lines'])
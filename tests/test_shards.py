@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import coverage
+
+from duvet.shards import ShardedData, find_data_files, merge_data, new_data
+
+
+def write_data_file(path, lines):
+    "Write a coverage data file, measuring lines ({filename: [line, ...]})."
+    try:
+        # coverage 5+
+        data = coverage.CoverageData(basename=path)
+        data.add_lines(lines)
+        data.write()
+    except TypeError:
+        data = coverage.CoverageData()
+        data.add_lines(lines)
+        data.write_file(path)
+
+
+class MergeDataTest(unittest.TestCase):
+    def test_merge_lines(self):
+        merged = new_data()
+        for lines in ([1, 2], [2, 3]):
+            data = new_data()
+            data.add_lines({'/project/a.py': dict.fromkeys(lines)})
+            merge_data(merged, data)
+        self.assertEqual(sorted(merged.lines('/project/a.py')), [1, 2, 3])
+
+    def test_merge_arcs_with_aliases(self):
+        from coverage.files import PathAliases
+        aliases = PathAliases()
+        aliases.add('/ci/project/', '/project/')
+
+        merged = new_data()
+        data = new_data()
+        data.add_arcs({
+            '/ci/project/a.py': dict.fromkeys([(-1, 1), (1, -1)]),
+            '/project/a.py': dict.fromkeys([(1, 2)]),
+        })
+        merge_data(merged, data, aliases)
+        self.assertEqual(list(merged.measured_files()), ['/project/a.py'])
+        self.assertEqual(sorted(merged.arcs('/project/a.py')), [(-1, 1), (1, -1), (1, 2)])
+
+
+class ShardedDataTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.directory, '.coverage')
+        self.sharded = ShardedData(threads=1)
+        self.mtime = 1000000000
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def shard(self, name, lines):
+        "Write a parallel data file, with a new modification time."
+        path = os.path.join(self.directory, '.coverage.%s' % name)
+        write_data_file(path, lines)
+        self.mtime += 10
+        os.utime(path, (self.mtime, self.mtime))
+        return path
+
+    def load(self):
+        "Load the shards, returning the lines measured in each file."
+        cov = coverage.Coverage(data_file=self.data_file, config_file=False)
+        self.sharded.load(cov)
+        return dict(
+            (filename, sorted(cov.data.lines(filename)))
+            for filename in cov.data.measured_files()
+        )
+
+    def test_find_data_files(self):
+        self.shard('host.1', {'/project/a.py': [1]})
+        write_data_file(self.data_file, {'/project/a.py': [2]})
+        open(os.path.join(self.directory, '.coveragerc'), 'w').close()
+        self.assertEqual(
+            [os.path.basename(path) for path in find_data_files(self.data_file)],
+            ['.coverage', '.coverage.host.1']
+        )
+
+    def test_merge(self):
+        self.shard('host.1', {'/project/a.py': [1, 2]})
+        self.shard('host.2', {'/project/a.py': [2, 3], '/project/b.py': [1]})
+        self.assertEqual(self.load(), {'/project/a.py': [1, 2, 3], '/project/b.py': [1]})
+
+    def test_new_shard_merged_incrementally(self):
+        self.shard('host.1', {'/project/a.py': [1]})
+        self.load()
+        merged = self.sharded.merged
+
+        self.shard('host.2', {'/project/a.py': [2], '/project/b.py': [1]})
+        self.assertEqual(self.load(), {'/project/a.py': [1, 2], '/project/b.py': [1]})
+        # The new shard was merged into the existing data.
+        self.assertTrue(self.sharded.merged is merged)
+
+    def test_unchanged_shards_not_read(self):
+        self.shard('host.1', {'/project/a.py': [1]})
+        self.load()
+        data = self.sharded.files[os.path.join(self.directory, '.coverage.host.1')][1]
+        self.load()
+        self.assertTrue(self.sharded.files[os.path.join(self.directory, '.coverage.host.1')][1] is data)
+
+    def test_modified_shard_merged_again(self):
+        self.shard('host.1', {'/project/a.py': [1, 2, 3]})
+        self.shard('host.2', {'/project/b.py': [1]})
+        self.load()
+        merged = self.sharded.merged
+
+        # Lines that are no longer measured must be dropped.
+        self.shard('host.1', {'/project/a.py': [1]})
+        self.assertEqual(self.load(), {'/project/a.py': [1], '/project/b.py': [1]})
+        self.assertFalse(self.sharded.merged is merged)
+
+    def test_removed_shard_merged_again(self):
+        self.shard('host.1', {'/project/a.py': [1]})
+        path = self.shard('host.2', {'/project/a.py': [2], '/project/b.py': [1]})
+        self.load()
+        merged = self.sharded.merged
+
+        os.remove(path)
+        self.assertEqual(self.load(), {'/project/a.py': [1]})
+        self.assertFalse(self.sharded.merged is merged)
+        self.assertEqual(list(self.sharded.files), [os.path.join(self.directory, '.coverage.host.1')])
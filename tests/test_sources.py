@@ -0,0 +1,130 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from pygments.lexer import RegexLexer
+from pygments.token import Name, String, Text
+
+from duvet import sources
+from duvet.sources import Source, SourceCache, file_stamp, tokenize
+
+
+class WordLexer(RegexLexer):
+    "A lexer with a token for each character of a word, and multi-line <<strings>>."
+    flags = re.DOTALL
+    tokens = {
+        'root': [
+            (r'<<.*?>>', String),
+            (r'\w', Name),
+            (r'\s+', Text),
+        ]
+    }
+
+
+def lexer():
+    return WordLexer(stripnl=False)
+
+
+class TokenizeTest(unittest.TestCase):
+    def setUp(self):
+        self.chunk_lines = sources.CHUNK_LINES
+        sources.CHUNK_LINES = 2
+
+    def tearDown(self):
+        sources.CHUNK_LINES = self.chunk_lines
+
+    def test_adjacent_ranges_merged(self):
+        self.assertEqual(tokenize('ab c\n', lexer()), [{
+            'Token.Name': ['1.0', '1.2', '1.3', '1.4'],
+            'Token.Text': ['1.2', '1.3', '1.4', '2.0'],
+        }])
+
+    def test_chunk_boundaries(self):
+        chunks = tokenize('a\nb\nc\n', lexer())
+        self.assertEqual(chunks, [
+            {
+                'Token.Name': ['1.0', '1.1', '2.0', '2.1'],
+                # The newline at the end of line 2 starts in the first chunk.
+                'Token.Text': ['1.1', '2.0', '2.1', '3.0'],
+            },
+            {
+                'Token.Name': ['3.0', '3.1'],
+                'Token.Text': ['3.1', '4.0'],
+            },
+        ])
+
+    def test_multiline_token_across_chunks(self):
+        chunks = tokenize('a <<x\ny\nz\nw\nv>> b\n', lexer())
+        self.assertEqual(len(chunks), 3)
+        # The string belongs to the chunk it starts in; the chunk it
+        # covers entirely has no ranges of its own.
+        self.assertEqual(chunks[0]['Token.Literal.String'], ['1.2', '5.3'])
+        self.assertEqual(chunks[1], {})
+        self.assertEqual(chunks[2], {
+            'Token.Name': ['5.4', '5.5'],
+            'Token.Text': ['5.3', '5.4', '5.5', '6.0'],
+        })
+
+
+class SourceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def source(self, name, size):
+        "A cached source for a (real) file, with the given size."
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as f:
+            f.write(name)
+        return Source(filename, file_stamp(filename), name, [], size)
+
+    def names(self, cache):
+        return [os.path.basename(filename) for filename in cache._entries]
+
+    def test_least_recently_used_discarded(self):
+        cache = SourceCache(max_bytes=30)
+        for name in ['a', 'b', 'c']:
+            cache._put(self.source(name, 10))
+        self.assertEqual(cache.size, 30)
+
+        cache._put(self.source('d', 10))
+        self.assertEqual(self.names(cache), ['b', 'c', 'd'])
+        self.assertEqual(cache.size, 30)
+
+    def test_use_refreshes_entry(self):
+        cache = SourceCache(max_bytes=30)
+        entries = [self.source(name, 10) for name in ['a', 'b', 'c']]
+        for source in entries:
+            cache._put(source)
+
+        self.assertTrue(cache.cached(entries[0].filename) is entries[0])
+        cache._put(self.source('d', 10))
+        self.assertEqual(self.names(cache), ['c', 'a', 'd'])
+
+    def test_large_entry_discards_several(self):
+        cache = SourceCache(max_bytes=30)
+        for name in ['a', 'b', 'c']:
+            cache._put(self.source(name, 10))
+        cache._put(self.source('d', 25))
+        self.assertEqual(self.names(cache), ['d'])
+        self.assertEqual(cache.size, 25)
+
+    def test_entry_over_budget_not_cached(self):
+        cache = SourceCache(max_bytes=30)
+        cache._put(self.source('a', 10))
+        cache._put(self.source('b', 31))
+        self.assertEqual(self.names(cache), ['a'])
+
+    def test_changed_file_discarded(self):
+        cache = SourceCache(max_bytes=30)
+        source = self.source('a', 10)
+        cache._put(source)
+        with open(source.filename, 'a') as f:
+            f.write('more')
+        self.assertEqual(cache.cached(source.filename), None)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
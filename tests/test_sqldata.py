@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import coverage
+
+from duvet.sqldata import SqliteData, is_sqlite, numbits_to_lines
+
+
+class NumbitsTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(numbits_to_lines(b''), [])
+        self.assertEqual(numbits_to_lines(b'\x00\x00'), [])
+
+    def test_low_bit_first(self):
+        self.assertEqual(numbits_to_lines(b'\x01'), [0])
+        self.assertEqual(numbits_to_lines(b'\x02'), [1])
+        self.assertEqual(numbits_to_lines(b'\x80'), [7])
+
+    def test_later_bytes(self):
+        self.assertEqual(numbits_to_lines(b'\x00\x01'), [8])
+        self.assertEqual(numbits_to_lines(b'\x06\x00\x81'), [1, 2, 16, 23])
+
+    def test_every_bit(self):
+        self.assertEqual(numbits_to_lines(b'\xff\xff'), list(range(16)))
+
+
+class IsSqliteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_is_sqlite(self):
+        path = os.path.join(self.directory, '.coverage')
+        with open(path, 'wb') as f:
+            f.write(b'!coverage.py: This is a private format')
+        self.assertFalse(is_sqlite(path))
+        self.assertFalse(is_sqlite(os.path.join(self.directory, 'missing')))
+
+
+@unittest.skipIf(coverage.version_info < (5,), 'coverage 5+ is needed to write a SQLite data file')
+class SqliteDataTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, '.coverage')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, lines=None, arcs=None):
+        "Write a SQLite data file, and open it."
+        data = coverage.CoverageData(basename=self.path)
+        if lines is not None:
+            data.add_lines(lines)
+        if arcs is not None:
+            data.add_arcs(arcs)
+        data.write()
+        self.assertTrue(is_sqlite(self.path))
+
+        data = SqliteData(self.path)
+        self.addCleanup(data.close)
+        return data
+
+    def test_lines(self):
+        data = self.open(lines={'/project/a.py': [1, 2, 17], '/project/b.py': [3]})
+        self.assertFalse(data.has_arcs())
+        self.assertEqual(sorted(data.measured_files()), ['/project/a.py', '/project/b.py'])
+        self.assertEqual(data.lines('/project/a.py'), [1, 2, 17])
+        self.assertEqual(data.arcs('/project/a.py'), None)
+        self.assertEqual(data.lines('/project/c.py'), None)
+
+    def test_arcs(self):
+        data = self.open(arcs={'/project/a.py': [(-1, 1), (1, 2), (2, -1)]})
+        self.assertTrue(data.has_arcs())
+        self.assertEqual(sorted(data.arcs('/project/a.py')), [(-1, 1), (1, 2), (2, -1)])
+        self.assertEqual(data.lines('/project/a.py'), [1, 2])
+        self.assertEqual(data.arcs('/project/c.py'), None)
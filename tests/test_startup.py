@@ -0,0 +1,19 @@
+import unittest
+
+try:
+    import tkinter
+except ImportError:
+    try:
+        import Tkinter as tkinter
+    except ImportError:
+        tkinter = None
+
+from benchmarks.startup import DEFERRED_MODULES, measure_startup
+
+
+@unittest.skipIf(tkinter is None, 'Tk is not available')
+class StartupTest(unittest.TestCase):
+    def test_deferred_modules_not_imported(self):
+        _, modules = measure_startup()
+        imported = [module for module in DEFERRED_MODULES if module in modules]
+        self.assertEqual(imported, [], 'Imported at startup: %s' % ', '.join(imported))